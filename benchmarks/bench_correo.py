@@ -0,0 +1,54 @@
+"""
+Benchmark: envío de correos con una conexión SMTP por mensaje vs. sesiones
+reutilizadas del pool, contra un servidor SMTP local (tests/fake_smtp.py).
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_correo.py [mensajes]
+"""
+
+import os
+import smtplib
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+from fake_smtp import FakeSMTPServer  # noqa: E402
+from services import mail_service  # noqa: E402
+
+
+def main(n: int = 500) -> None:
+    certs_dir = tempfile.mkdtemp()
+    with open(os.path.join(certs_dir, "certificado_1.pdf"), "wb") as fh:
+        fh.write(b"%PDF-1.4 " + os.urandom(30_000))
+    mail_service.CERTS_DIR = certs_dir
+
+    with FakeSMTPServer() as server:
+        # Antes: conexión + login por cada mensaje
+        start = time.perf_counter()
+        for _ in range(n):
+            msg = mail_service.build_message("cliente@example.com", ["certificado_1.pdf"])
+            with smtplib.SMTP("127.0.0.1", server.port) as conn:
+                conn.login("user", "pw")
+                conn.send_message(msg)
+        per_message = time.perf_counter() - start
+
+        # Ahora: sesiones del pool
+        pool = mail_service.SMTPPool("127.0.0.1", server.port, "user", "pw", use_ssl=False)
+        start = time.perf_counter()
+        for _ in range(n):
+            pool.send(mail_service.build_message("cliente@example.com", ["certificado_1.pdf"]))
+        pooled = time.perf_counter() - start
+        pool.close()
+
+    print(f"{n} mensajes (sin TLS; con TLS remoto la diferencia es mayor)")
+    print(f"  conexión por mensaje: {per_message:7.3f} s  {n / per_message:8.1f} msg/s")
+    print(f"  pool de sesiones:     {pooled:7.3f} s  {n / pooled:8.1f} msg/s")
+    print(f"  sesiones abiertas por el pool: {pool.stats()['connections']}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,69 @@
+"""
+Benchmark: detección de desviaciones fila por fila vs. por lotes.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_desviaciones.py [filas]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+def main(n: int = 100_000) -> None:
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    db.init_db()
+
+    from services.certificate_service import (
+        KNOWN_PARAMS,
+        build_desviaciones,
+        detect_devs_batch,
+    )
+    from services.client_service import save_client_specs
+
+    # 20 clientes con límites propios, el resto usa los defaults
+    for client_id in range(1, 21):
+        save_client_specs(
+            client_id,
+            {
+                "alveografo": {"W": {"inf": 150.0, "sup": 320.0}},
+                "farinografo": {"estabilidad": {"inf": 4.0, "sup": 12.0}},
+            },
+        )
+
+    rng = random.Random(0)
+    pairs = [
+        (
+            rng.randint(1, 40),
+            {p: round(rng.uniform(0, 400), 2) for p in KNOWN_PARAMS},
+        )
+        for _ in range(n)
+    ]
+
+    start = time.perf_counter()
+    loop = [build_desviaciones(c, r, "") for c, r in pairs]
+    loop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = detect_devs_batch(pairs)
+    batch_s = time.perf_counter() - start
+
+    mismatches = sum(
+        (", ".join(d) if d else "") != (t if has else "")
+        for d, (has, t) in zip(batch, loop)
+    )
+    print(f"filas:        {n}")
+    print(f"fila a fila:  {loop_s:.3f} s")
+    print(f"por lotes:    {batch_s:.3f} s")
+    print(f"aceleración:  {loop_s / batch_s:.1f}x")
+    print(f"diferencias:  {mismatches}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
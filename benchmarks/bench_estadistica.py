@@ -0,0 +1,105 @@
+"""
+Benchmark: métricas SPC de statistics_service sobre 1M de mediciones.
+
+Carga 125 000 inspecciones sintéticas × 8 parámetros (1 000 000 de filas en
+PARAMETRO_ANALISIS) repartidas en 4 equipos y mide:
+
+- spc_report(): lectura por columna + métricas de los 32 grupos
+  (parámetro × equipo).
+- spc_metrics() sobre un arreglo de 1M de valores, contra una versión en
+  Python puro de la EWMA y de las reglas de Western Electric (medida sobre
+  una muestra y extrapolada).
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_estadistica.py [inspecciones]
+"""
+
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+ENCABEZADO = "Lote,Fecha,Equipo,W,P,L,P/L,Absorción de agua,Tiempo de desarrollo,Estabilidad,MTI"
+EQUIPOS = 4
+
+
+def _csv(n: int) -> str:
+    random.seed(0)
+    filas = [ENCABEZADO]
+    for i in range(n):
+        filas.append(
+            f"L{i:06d},20{20 + i * 5 // n}-{1 + i % 12:02d}-{1 + i % 28:02d},{1 + i % EQUIPOS},"
+            f"{random.gauss(280, 25):.1f},{random.gauss(80, 8):.1f},"
+            f"{random.gauss(100, 10):.1f},{random.gauss(0.8, 0.08):.2f},"
+            f"{random.gauss(58, 1.5):.1f},{random.gauss(2.5, 0.4):.1f},"
+            f"{random.gauss(9, 1.2):.1f},{random.gauss(40, 6):.0f}"
+        )
+    return "\n".join(filas) + "\n"
+
+
+def _referencia(valores, centro, sigma, lam=0.2):
+    """EWMA y reglas de Western Electric recorriendo la serie punto por punto."""
+    z, suavizada = centro, []
+    for v in valores:
+        z = lam * v + (1 - lam) * z
+        suavizada.append(z)
+    violaciones = [0, 0, 0, 0]
+    for i in range(len(valores)):
+        zs = [(v - centro) / sigma for v in valores[max(0, i - 7):i + 1]]
+        if abs(zs[-1]) > 3:
+            violaciones[0] += 1
+        for regla, (umbral, ancho, minimo) in enumerate(((2, 3, 2), (1, 5, 4), (0, 8, 8)), start=1):
+            ventana = zs[-ancho:]
+            if len(ventana) == ancho and (
+                sum(v > umbral for v in ventana) >= minimo
+                or sum(v < -umbral for v in ventana) >= minimo
+            ):
+                violaciones[regla] += 1
+    return suavizada, violaciones
+
+
+def main(n: int = 125_000) -> None:
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    db.init_db()
+
+    import numpy as np
+
+    from services.import_service import import_inspections
+    from services.statistics_service import spc_metrics, spc_report, western_electric
+
+    reporte = import_inspections(io.StringIO(_csv(n)), id_laboratorista=1)
+    assert reporte["importadas"] == n and reporte["con_error"] == 0
+
+    inicio = time.perf_counter()
+    grupos = spc_report()
+    t_reporte = time.perf_counter() - inicio
+    mediciones = sum(g["n"] for g in grupos)
+
+    valores = np.random.default_rng(0).normal(280, 25, 1_000_000)
+    inicio = time.perf_counter()
+    metricas = spc_metrics(valores, 180, 350, subgrupo=1)
+    t_vector = time.perf_counter() - inicio
+
+    muestra = valores[:50_000].tolist()
+    inicio = time.perf_counter()
+    _, violaciones = _referencia(muestra, metricas["media"], metricas["sigma_dentro"])
+    t_python = (time.perf_counter() - inicio) * valores.size / len(muestra)
+
+    # Mismas violaciones que la versión vectorizada sobre la muestra
+    reglas = western_electric(muestra, metricas["media"], metricas["sigma_dentro"])
+    assert violaciones == [r["violaciones"] for r in reglas.values()]
+
+    print(f"{n} inspecciones, {mediciones} mediciones, {len(grupos)} grupos")
+    print(f"  spc_report()              {t_reporte:8.2f} s   {mediciones / t_reporte:12.0f} mediciones/s")
+    print(f"  spc_metrics() 1M valores  {t_vector:8.2f} s")
+    print(f"  EWMA + reglas en Python   {t_python:8.2f} s   (estimado con {len(muestra)})")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
@@ -0,0 +1,100 @@
+"""
+Benchmark: exportación CSV de certificados.
+
+Carga N certificados sintéticos (con resultados_analisis agrupados por
+categoría) y compara la memoria pico y el tiempo de:
+
+- export_service.export_certificates_csv: cursor con fetchmany y CSV por bloques.
+- Materializar la tabla con list_certificates() y escribir el CSV después.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_exportacion.py [certificados]
+"""
+
+import csv
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+def _cargar(n: int) -> None:
+    random.seed(0)
+    with db.db_connection() as conn:
+        conn.executemany(
+            "INSERT INTO CLIENTE (id_cliente, nombre, contrasena) VALUES (?, ?, '')",
+            [(i, f"Cliente {i}") for i in range(1, 201)],
+        )
+        conn.executemany(
+            """
+            INSERT INTO CERTIFICADO_CALIDAD (
+                id_cliente, id_inspeccion, secuencia_inspeccion, orden_compra,
+                cantidad_solicitada, cantidad_entregada, numero_factura, fecha_envio,
+                fecha_caducidad, resultados_analisis, compara_referencias, desviaciones,
+                destinatario_correo
+            ) VALUES (?, ?, '1', ?, 100, 100, ?, ?, ?, ?, '', '', 'qa@example.com')
+            """,
+            (
+                (
+                    random.randint(1, 200), i, f"OC-{i}", f"F-{i}",
+                    f"20{19 + i * 5 // n}-{1 + i % 12:02d}-{1 + i % 28:02d}", "2030-01-01",
+                    json.dumps({
+                        "alveografo": {"W": random.uniform(150, 400), "P": random.uniform(40, 120)},
+                        "farinografo": {"estabilidad": random.uniform(3, 15)},
+                    }),
+                )
+                for i in range(n)
+            ),
+        )
+
+
+def _materializado() -> int:
+    from services.certificate_service import list_certificates
+    from services.parameters_service import flatten_parametros
+
+    certificados = list_certificates()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for cert in certificados:
+        plano = flatten_parametros(cert["resultados_analisis"])
+        writer.writerow(list(cert.values()) + list(plano.values()))
+    return len(buffer.getvalue())
+
+
+def _streaming() -> int:
+    from services.export_service import export_certificates_csv
+
+    return sum(len(bloque) for bloque in export_certificates_csv())
+
+
+def main(n: int = 200_000) -> None:
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    db.init_db()
+    _cargar(n)
+
+    print(f"{n} certificados")
+    for nombre, funcion in (("materializado", _materializado), ("streaming", _streaming)):
+        inicio = time.perf_counter()
+        tamano = funcion()
+        segundos = time.perf_counter() - inicio
+        # Segunda pasada solo para la memoria: tracemalloc hace lento el código
+        tracemalloc.start()
+        funcion()
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(
+            f"  {nombre:<14} {segundos:6.2f} s   pico {pico / 2**20:8.1f} MiB"
+            f"   ({tamano / 2**20:.0f} MiB de CSV)"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
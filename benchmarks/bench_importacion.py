@@ -0,0 +1,71 @@
+"""
+Benchmark: importación masiva de inspecciones desde CSV.
+
+Genera una exportación sintética del alveógrafo + farinógrafo (8 parámetros
+por fila) y mide la carga con import_service.import_inspections contra la
+alta una por una con create_inspection (como el formulario).
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_importacion.py [filas]
+"""
+
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+ENCABEZADO = "Lote,Fecha,W,P,L,P/L,Absorción de agua,Tiempo de desarrollo,Estabilidad,MTI"
+
+
+def _csv(n: int) -> str:
+    random.seed(0)
+    filas = [ENCABEZADO]
+    for i in range(n):
+        filas.append(
+            f"L{i:06d},2024-{1 + i % 12:02d}-{1 + i % 28:02d},"
+            f"{random.uniform(150, 400):.1f},{random.uniform(40, 120):.1f},"
+            f"{random.uniform(50, 150):.1f},{random.uniform(0.3, 2.0):.2f},"
+            f"{random.uniform(52, 64):.1f},{random.uniform(1, 8):.1f},"
+            f"{random.uniform(3, 15):.1f},{random.uniform(10, 90):.0f}"
+        )
+    return "\n".join(filas) + "\n"
+
+
+def main(n: int = 100_000) -> None:
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    db.init_db()
+
+    from services.import_service import import_inspections
+    from services.inspection_service import create_inspection
+
+    texto = _csv(n)
+
+    inicio = time.perf_counter()
+    reporte = import_inspections(io.StringIO(texto), id_laboratorista=1)
+    por_lotes = time.perf_counter() - inicio
+    assert reporte["importadas"] == n and reporte["con_error"] == 0
+
+    # Referencia: una inspección (y su transacción) por fila
+    muestra = min(n, 2_000)
+    inicio = time.perf_counter()
+    parametros = {
+        "W": 300.0, "P": 80.0, "L": 100.0, "relacion_P_L": 0.8, "absorcion_de_agua": 58.0,
+        "tiempo_de_desarrollo": 2.5, "estabilidad": 9.0, "indice_de_tolerancia": 40.0,
+    }
+    for i in range(muestra):
+        create_inspection(f"U{i}", "2024-01-01", None, None, None, parametros, 1)
+    una_por_una = (time.perf_counter() - inicio) / muestra
+
+    print(f"{n} filas × 8 parámetros")
+    print(f"  por lotes     {por_lotes:8.2f} s   {n / por_lotes:10.0f} filas/s")
+    print(f"  una por una   {una_por_una * n:8.2f} s   {1 / una_por_una:10.0f} filas/s (estimado con {muestra})")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
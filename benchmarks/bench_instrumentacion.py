@@ -0,0 +1,52 @@
+"""
+Benchmark: costo de la instrumentación de consultas de db.py.
+
+Ejecuta N búsquedas por clave primaria (la consulta más barata posible, el
+peor caso para el overhead relativo) con conexiones sqlite3 normales y
+con TimedConnection, que mide cada execute() y fetchall().
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_instrumentacion.py [consultas]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+def _medir(factory, n: int) -> float:
+    conn = sqlite3.connect(db.DB_PATH, factory=factory)
+    conn.row_factory = sqlite3.Row
+    inicio = time.perf_counter()
+    for i in range(n):
+        conn.execute("SELECT * FROM INSPECCION WHERE id_inspeccion = ?", (i % 1000,)).fetchall()
+    segundos = time.perf_counter() - inicio
+    conn.close()
+    return segundos
+
+
+def main(n: int = 200_000) -> None:
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    db.init_db()
+    with db.db_connection() as conn:
+        conn.executemany(
+            "INSERT INTO INSPECCION (id_inspeccion, numero_lote, fecha) VALUES (?, ?, '2024-01-01')",
+            [(i, f"L{i}") for i in range(1000)],
+        )
+
+    normal = _medir(sqlite3.Connection, n)
+    medida = _medir(db.TimedConnection, n)
+    print(f"{n} consultas por clave primaria")
+    print(f"  sqlite3.Connection  {normal / n * 1e6:6.2f} µs/consulta")
+    print(f"  TimedConnection     {medida / n * 1e6:6.2f} µs/consulta")
+    print(f"  overhead            {(medida - normal) / n * 1e6:6.2f} µs/consulta")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
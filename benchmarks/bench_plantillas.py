@@ -0,0 +1,72 @@
+"""
+Benchmark: nombre del cliente en las tablas de certificados.
+
+Compara el patrón anterior de certifications.html / dashboard.html (recorrer
+todos los clientes dentro del bucle de certificados, O(certificados × clientes))
+con el actual, donde la consulta ya trae nombre_cliente por JOIN.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_plantillas.py [certificados] [clientes]
+"""
+
+import random
+import sys
+import time
+
+from jinja2 import Environment
+
+# Fila de la tabla tal como estaba antes
+ANTERIOR = """
+{%- for cert in certificados %}
+<tr><td>{{ cert.id_certificado }}</td><td>
+  {%- for cli in clientes %}
+    {%- if cli.id_cliente == cert.id_cliente %}{{ cli.nombre }}{% endif %}
+  {%- endfor %}
+</td><td>{{ cert.id_inspeccion }}</td><td>{{ cert.fecha_envio }}</td></tr>
+{%- endfor %}
+"""
+
+# Fila de la tabla actual
+ACTUAL = """
+{%- for cert in certificados %}
+<tr><td>{{ cert.id_certificado }}</td><td>{{ cert.nombre_cliente or '' }}</td>
+<td>{{ cert.id_inspeccion }}</td><td>{{ cert.fecha_envio }}</td></tr>
+{%- endfor %}
+"""
+
+
+def main(n_certs: int = 10_000, n_clients: int = 1_000) -> None:
+    random.seed(0)
+    clientes = [{"id_cliente": i, "nombre": f"Cliente {i}"} for i in range(1, n_clients + 1)]
+    certificados = []
+    for i in range(1, n_certs + 1):
+        id_cliente = random.randint(1, n_clients)
+        certificados.append({
+            "id_certificado": i,
+            "id_cliente": id_cliente,
+            "nombre_cliente": f"Cliente {id_cliente}",
+            "id_inspeccion": i,
+            "fecha_envio": "2024-01-01",
+        })
+
+    env = Environment(autoescape=True)
+    resultados = {}
+    for nombre, fuente in (("anterior", ANTERIOR), ("actual", ACTUAL)):
+        plantilla = env.from_string(fuente)
+        inicio = time.perf_counter()
+        html = plantilla.render(certificados=certificados, clientes=clientes)
+        resultados[nombre] = (time.perf_counter() - inicio, html)
+
+    # Ambas versiones deben producir las mismas filas
+    normalizar = lambda html: "".join(html.split())  # noqa: E731
+    assert normalizar(resultados["anterior"][1]) == normalizar(resultados["actual"][1])
+
+    print(f"{n_certs} certificados, {n_clients} clientes")
+    for nombre, (segundos, _) in resultados.items():
+        print(f"  {nombre:<9} {segundos * 1000:10.1f} ms")
+    print(f"  mejora    {resultados['anterior'][0] / resultados['actual'][0]:10.0f}x")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,60 @@
+"""
+Benchmark: snapshot Parquet de la historia de QA.
+
+Importa N inspecciones sintéticas × 8 parámetros y mide:
+
+- La primera corrida de snapshot_service.write_snapshot (copia completa).
+- Una corrida incremental después de importar 1 000 inspecciones más.
+- spc_report() leyendo las mediciones de data.db contra el snapshot.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_snapshot.py [inspecciones]
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+from bench_estadistica import _csv  # noqa: E402
+
+
+def _medir(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def main(n: int = 125_000) -> None:
+    tmp = tempfile.mkdtemp()
+    db.DB_PATH = os.path.join(tmp, "bench.db")
+    db.init_db()
+
+    from services import snapshot_service
+    from services.import_service import import_inspections
+    from services.statistics_service import spc_report
+
+    snapshot_service.SNAPSHOT_DIR = os.path.join(tmp, "snapshots")
+    import_inspections(io.StringIO(_csv(n)), id_laboratorista=1)
+
+    t_completo, escritas = _medir(snapshot_service.write_snapshot)
+    import_inspections(io.StringIO(_csv(1_000)), id_laboratorista=1)
+    t_incremental, nuevas = _medir(snapshot_service.write_snapshot)
+
+    t_sqlite, desde_db = _medir(spc_report)
+    t_parquet, desde_snapshot = _medir(lambda: spc_report(snapshot=True))
+    assert [g["n"] for g in desde_db] == [g["n"] for g in desde_snapshot]
+
+    print(f"{n} inspecciones, {escritas['mediciones']} mediciones")
+    print(f"  snapshot completo     {t_completo:8.2f} s   {escritas}")
+    print(f"  snapshot incremental  {t_incremental:8.2f} s   {nuevas}")
+    print(f"  spc_report() SQLite   {t_sqlite:8.2f} s")
+    print(f"  spc_report() Parquet  {t_parquet:8.2f} s")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
@@ -1,8 +1,15 @@
 # db.py
 import sqlite3
+import importlib.util
 import os
+import queue
+import re
+import threading
+import time
 from contextlib import contextmanager
 
+import metrics
+
 # Default to a persistent file-based database.
 # When testing/developing, you can override this via an environment variable.
 DB_PATH = os.environ.get("DB_PATH", "data.db")
@@ -10,6 +17,532 @@ DB_PATH = os.environ.get("DB_PATH", "data.db")
 # Path to the SQL schema file
 SQL_FILE_PATH = "./harina.sql"
 
+# Versioned migrations applied on top of the base schema, named NNNN_name.sql
+# (plain DDL/DML) or NNNN_name.py (defines `upgrade(conn)` for data imports
+# and backfills; it must not call executescript, which would commit early).
+MIGRATIONS_DIR = "./migrations"
+BASE_SCHEMA_VERSION = 0
+_MIGRATION_RE = re.compile(r"^(\d+)_[\w\-]+\.(sql|py)$")
+
+# Connection pool settings.
+# POOL_SIZE is the maximum number of open connections per database file;
+# POOL_TIMEOUT is how many seconds a caller waits for a free connection.
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+
+# PRAGMA profile applied once to every new pooled connection.
+# WAL lets dashboard readers proceed while a certificate insert is writing;
+# synchronous=NORMAL is durable under WAL except on power loss mid-checkpoint.
+# busy_timeout goes first so the switch to WAL waits on other writers.
+PRAGMA_PROFILE = {
+    "busy_timeout": int(os.environ.get("DB_BUSY_TIMEOUT", "5000")),  # ms
+    "journal_mode": os.environ.get("DB_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("DB_SYNCHRONOUS", "NORMAL"),
+    "cache_size": int(os.environ.get("DB_CACHE_SIZE", "-16000")),  # KiB when negative
+    "mmap_size": int(os.environ.get("DB_MMAP_SIZE", str(128 * 1024 * 1024))),
+    "temp_store": os.environ.get("DB_TEMP_STORE", "MEMORY"),
+}
+
+# Keyset pagination for list views: default rows per page and the ceiling
+# applied to any ?limit= a caller asks for.
+PAGE_SIZE = int(os.environ.get("PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", "500"))
+
+# Statement instrumentation: every execute() on a pooled connection is timed
+# into `metrics`, and statements slower than SLOW_QUERY_MS (execute plus
+# fetchall/fetchmany) are logged with their parameters and query plan.
+INSTRUMENT_QUERIES = os.environ.get("DB_INSTRUMENT", "1") != "0"
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))  # 0 disables the log
+
+# Parameters of statements touching these columns are never logged.
+_SENSITIVE_SQL = re.compile(r"contrasena|password", re.IGNORECASE)
+_MAX_LOGGED_PARAM = 200  # characters kept of each text parameter
+
+# Seconds between background WAL checkpoints (0 disables the job).
+CHECKPOINT_INTERVAL = float(os.environ.get("DB_CHECKPOINT_INTERVAL", "300"))
+
+# Symbolic PRAGMA values are reported back by SQLite as integers.
+_PRAGMA_ENUMS = {
+    "synchronous": {"OFF": 0, "NORMAL": 1, "FULL": 2, "EXTRA": 3},
+    "temp_store": {"DEFAULT": 0, "FILE": 1, "MEMORY": 2},
+}
+_CHECKPOINT_MODES = {"PASSIVE", "FULL", "RESTART", "TRUNCATE"}
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes available in time."""
+
+
+def _loggable_params(sql: str, params):
+    """Parameters of a slow statement as stored in the log (redacted, truncated)."""
+    if params is None:
+        return None
+    if _SENSITIVE_SQL.search(sql):
+        return "<redacted>"
+
+    def short(value):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return f"<{len(value)} bytes>"
+        if isinstance(value, str) and len(value) > _MAX_LOGGED_PARAM:
+            return value[:_MAX_LOGGED_PARAM] + "..."
+        return value
+
+    if isinstance(params, dict):
+        return {key: short(value) for key, value in params.items()}
+    return [short(value) for value in params]
+
+
+def _query_plan(conn: sqlite3.Connection, sql: str, params) -> list[str] | None:
+    """EXPLAIN QUERY PLAN details, run without instrumentation."""
+    try:
+        rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    except sqlite3.Error:
+        return None
+    return [row[3] for row in rows]
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    Cursor that reports how long each statement takes to `metrics`.
+
+    The time of a statement is its execute() call plus any fetchall() or
+    fetchmany() that follows; row-by-row iteration is not timed to keep it
+    free of Python overhead. Once a statement crosses SLOW_QUERY_MS it is
+    logged, and its entry keeps being updated while it is fetched.
+    """
+
+    _sql = None
+    _params = None
+    _elapsed = 0.0
+    _slow = None
+
+    def _track(self, seconds: float) -> None:
+        self._elapsed += seconds
+        if self._slow is not None:
+            self._slow["seconds"] = round(self._elapsed, 6)
+        elif SLOW_QUERY_MS and self._elapsed * 1000 >= SLOW_QUERY_MS:
+            self._log_slow()
+
+    def _log_slow(self) -> None:
+        plan = None
+        if self._params is not None:  # Not for executemany/executescript
+            plan = _query_plan(self.connection, self._sql, self._params)
+        self._slow = {
+            "sql": " ".join(self._sql.split()),
+            "params": _loggable_params(self._sql, self._params),
+            "seconds": round(self._elapsed, 6),
+            "plan": plan,
+            "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        metrics.record_slow_query(self._slow)
+
+    def _run(self, method, sql, params, arg):
+        self._sql, self._params, self._elapsed, self._slow = sql, params, 0.0, None
+        start = time.perf_counter()
+        try:
+            return method(*arg)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.record_execute(elapsed)
+            self._track(elapsed)
+
+    def execute(self, sql, parameters=(), /):
+        return self._run(super().execute, sql, parameters, (sql, parameters))
+
+    def executemany(self, sql, seq_of_parameters, /):
+        return self._run(super().executemany, sql, None, (sql, seq_of_parameters))
+
+    def executescript(self, sql_script, /):
+        return self._run(super().executescript, sql_script, None, (sql_script,))
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.record_fetch(elapsed)
+            self._track(elapsed)
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.record_fetch(elapsed)
+            self._track(elapsed)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors (including the execute() shortcuts) are TimedCursor."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute() would create a plain cursor internally
+    def execute(self, sql, parameters=(), /):
+        return super().cursor(TimedCursor).execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        return super().cursor(TimedCursor).executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script, /):
+        return super().cursor(TimedCursor).executescript(sql_script)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections for a single database file.
+
+    Idle connections are kept in a LIFO queue so the most recently used
+    (and therefore page-cache warm) connection is handed out first.
+    Connections are created lazily up to `size`; once that limit is reached
+    callers block until another thread returns one.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        size: int = POOL_SIZE,
+        timeout: float = POOL_TIMEOUT,
+        pragmas: dict | None = None,
+    ):
+        self.path = path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.pragmas = dict(PRAGMA_PROFILE if pragmas is None else pragmas)
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=self.size)
+        self._lock = threading.Lock()
+        self._open = 0
+        self._closed = False
+        self._stats = {"hits": 0, "waits": 0, "creations": 0, "discards": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        # check_same_thread=False: a connection may be released by one
+        # thread and later acquired by another, but never used concurrently.
+        conn = sqlite3.connect(
+            self.path,
+            uri=self.path.startswith("file:"),
+            check_same_thread=False,
+            factory=TimedConnection if INSTRUMENT_QUERIES else sqlite3.Connection,
+        )
+        conn.row_factory = sqlite3.Row  # Allows accessing columns by name
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn: sqlite3.Connection) -> bool:
+        try:
+            # Uninstrumented: pool housekeeping is not an application query
+            sqlite3.Connection.execute(conn, "SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._open -= 1
+            self._stats["discards"] += 1
+
+    def acquire(self) -> sqlite3.Connection:
+        """Return a healthy connection, creating or waiting for one if needed."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+                with self._lock:
+                    self._stats["hits"] += 1
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._open < self.size
+                    if can_create:
+                        self._open += 1
+                        self._stats["creations"] += 1
+                    else:
+                        self._stats["waits"] += 1
+                if can_create:
+                    try:
+                        return self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._open -= 1
+                        raise
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise PoolTimeout(
+                        f"No database connection available after {self.timeout}s"
+                    ) from None
+
+            if self._is_healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Reset a connection and hand it back to the pool."""
+        if self._closed:
+            self._discard(conn)
+            return
+        try:
+            # Reset-on-return: drop any unfinished transaction and restore the
+            # defaults that callers are allowed to tweak (e.g. row_factory).
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._discard(conn)
+
+    def close(self) -> None:
+        """Close every idle connection; in-use ones are closed on release."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "open": self._open,
+                "idle": self._idle.qsize(),
+                "size": self.size,
+            }
+
+
+def apply_pragmas(conn: sqlite3.Connection, pragmas: dict) -> None:
+    """Apply a PRAGMA profile to a freshly opened connection."""
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def _normalize_pragma(name: str, value):
+    if isinstance(value, str):
+        if name in _PRAGMA_ENUMS:
+            return _PRAGMA_ENUMS[name].get(value.upper(), value)
+        return value.lower()
+    return value
+
+
+def active_pragmas(conn: sqlite3.Connection | None = None) -> dict:
+    """
+    Read back the current value of every PRAGMA in the profile.
+    Uses a pooled connection unless one is given.
+    """
+    if conn is None:
+        with db_connection() as pooled:
+            return active_pragmas(pooled)
+    return {
+        name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+        for name in get_pool().pragmas
+    }
+
+
+def verify_pragmas(conn: sqlite3.Connection | None = None) -> dict:
+    """
+    Compare the live settings against the profile.
+
+    Returns a dict {pragma: (expected, actual)} with only the mismatches,
+    so an empty dict means the profile is fully in effect. Note that
+    in-memory databases always report journal_mode 'memory'.
+    """
+    active = active_pragmas(conn)
+    mismatches = {}
+    for name, value in get_pool().pragmas.items():
+        expected = _normalize_pragma(name, value)
+        actual = _normalize_pragma(name, active[name])
+        if expected != actual:
+            mismatches[name] = (expected, actual)
+    return mismatches
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Return the pool for the current DB_PATH.
+
+    DB_PATH may be reassigned at runtime (the test suite does this), so the
+    pool is rebuilt whenever the configured path no longer matches.
+    """
+    global _pool
+    pool = _pool
+    if pool is not None and pool.path == DB_PATH:
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.path != DB_PATH:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DB_PATH, POOL_SIZE, POOL_TIMEOUT, PRAGMA_PROFILE)
+        return _pool
+
+
+def close_pool() -> None:
+    """Close all pooled connections (e.g. on shutdown or after tests)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def pool_stats() -> dict:
+    """Counters for the active pool: hits, waits, creations, discards, open, idle."""
+    return get_pool().stats()
+
+
+def data_version(name: str, conn: sqlite3.Connection | None = None) -> int:
+    """
+    Current value of the VERSION_DATOS counter `name` (0 if never bumped).
+
+    Counters are bumped by triggers or by bump_data_version() whenever the
+    underlying data changes, so in-process caches in every worker can detect
+    stale entries with one primary-key read instead of re-running queries.
+    """
+    if conn is None:
+        with db_connection() as pooled:
+            return data_version(name, pooled)
+    row = conn.execute(
+        "SELECT version FROM VERSION_DATOS WHERE nombre = ?", (name,)
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def bump_data_version(name: str, conn: sqlite3.Connection | None = None) -> None:
+    """Increment the VERSION_DATOS counter `name` (within `conn`'s transaction if given)."""
+    if conn is None:
+        with db_connection() as pooled:
+            return bump_data_version(name, pooled)
+    conn.execute(
+        """
+        INSERT INTO VERSION_DATOS (nombre, version) VALUES (?, 1)
+        ON CONFLICT (nombre) DO UPDATE SET version = version + 1
+        """,
+        (name,),
+    )
+
+
+def keyset_page(
+    conn: sqlite3.Connection,
+    select_sql: str,
+    key: str,
+    params: tuple = (),
+    *,
+    where: list[str] | None = None,
+    after: int | None = None,
+    before: int | None = None,
+    limit: int = PAGE_SIZE,
+) -> dict:
+    """
+    One page of `select_sql` ordered by the integer column `key`, newest first.
+
+    `select_sql` is a SELECT ... FROM ... [JOIN ...] without WHERE, ORDER BY
+    or LIMIT; extra filters go in `where` (ANDed, bound with `params`).
+    `after` returns the rows just older than that key, `before` the rows just
+    newer, so every page is a single index range scan whatever the offset.
+
+    Returns {"items", "next", "prev", "limit"}; next/prev are the cursors to
+    pass back as after/before, or None at either end of the listing.
+    """
+    limit = max(1, min(int(limit or PAGE_SIZE), MAX_PAGE_SIZE))
+    conditions = list(where or ())
+    args = list(params)
+    if after is not None:
+        conditions.append(f"{key} < ?")
+        args.append(after)
+    elif before is not None:
+        conditions.append(f"{key} > ?")
+        args.append(before)
+    sql = select_sql
+    if conditions:
+        sql += " WHERE " + " AND ".join(f"({c})" for c in conditions)
+    # Walking backwards reads ascending from the cursor, then flips the page
+    order = "ASC" if before is not None and after is None else "DESC"
+    sql += f" ORDER BY {key} {order} LIMIT ?"
+    args.append(limit + 1)  # One extra row tells whether another page exists
+
+    rows = [dict(r) for r in conn.execute(sql, args).fetchall()]
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if order == "ASC":
+        rows.reverse()
+
+    column = key.rsplit(".", 1)[-1]
+    first = rows[0][column] if rows else None
+    last = rows[-1][column] if rows else None
+    if order == "ASC":
+        has_next, has_prev = True, more
+    else:
+        has_next, has_prev = more, after is not None
+    return {
+        "items": rows,
+        "next": last if has_next and rows else None,
+        "prev": first if has_prev and rows else None,
+        "limit": limit,
+    }
+
+
+def checkpoint(mode: str = "PASSIVE") -> dict:
+    """
+    Run a WAL checkpoint and return SQLite's (busy, log, checkpointed) counters.
+    PASSIVE never blocks readers or writers; TRUNCATE also resets the WAL file.
+    """
+    mode = mode.upper()
+    if mode not in _CHECKPOINT_MODES:
+        raise ValueError(f"Unknown checkpoint mode: {mode}")
+    with db_connection() as conn:
+        busy, log, checkpointed = conn.execute(
+            f"PRAGMA wal_checkpoint({mode})"
+        ).fetchone()
+    return {"busy": busy, "log": log, "checkpointed": checkpointed}
+
+
+_checkpoint_stop: threading.Event | None = None
+
+
+def start_checkpoint_job(interval: float = CHECKPOINT_INTERVAL) -> bool:
+    """
+    Start a daemon thread that checkpoints the WAL every `interval` seconds,
+    keeping the -wal file from growing between SQLite's auto-checkpoints.
+    Returns False if the job is disabled or already running.
+    """
+    global _checkpoint_stop
+    if interval <= 0 or _checkpoint_stop is not None:
+        return False
+    stop = threading.Event()
+    _checkpoint_stop = stop
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                checkpoint("PASSIVE")
+            except sqlite3.Error as e:
+                print(f"⚠️ WARNING: WAL checkpoint failed: {e}")
+
+    threading.Thread(target=run, name="wal-checkpoint", daemon=True).start()
+    return True
+
+
+def stop_checkpoint_job() -> None:
+    """Signal the background checkpoint thread to exit."""
+    global _checkpoint_stop
+    if _checkpoint_stop is not None:
+        _checkpoint_stop.set()
+        _checkpoint_stop = None
+
 
 @contextmanager
 def db_connection():
@@ -20,20 +553,91 @@ def db_connection():
             cursor = conn.cursor()
             cursor.execute("SQL_QUERY")
             result = cursor.fetchall()
+
+    Connections are drawn from a shared pool instead of being opened and
+    closed on every call. Changes are committed when the block exits
+    normally and rolled back if it raises.
     """
-    conn = sqlite3.connect(DB_PATH, uri=DB_PATH.startswith("file:"))
-    conn.row_factory = sqlite3.Row  # Allows accessing columns by name
+    pool = get_pool()
+    conn = pool.acquire()
     try:
         yield conn  # Return the connection for use
         conn.commit()  # Commit changes automatically
     finally:
-        conn.close()  # Close connection automatically
+        pool.release(conn)  # Roll back leftovers and return to the pool
+
+
+def _list_migrations() -> list[tuple[int, str]]:
+    """Return (version, filename) for every `NNNN_name.sql` in MIGRATIONS_DIR, in order."""
+    if not os.path.isdir(MIGRATIONS_DIR):
+        return []
+    migrations = []
+    for name in os.listdir(MIGRATIONS_DIR):
+        match = _MIGRATION_RE.match(name)
+        if match:
+            migrations.append((int(match.group(1)), name))
+    return sorted(migrations)
+
+
+def _applied_versions(conn: sqlite3.Connection) -> set[int]:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            aplicado_en TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    return {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+
+
+def _apply_script(conn: sqlite3.Connection, version: int, name: str, path: str) -> None:
+    """Run one migration and record it in schema_version inside a single transaction."""
+    try:
+        if path.endswith(".py"):
+            spec = importlib.util.spec_from_file_location(f"migration_{version:04d}", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            conn.execute("BEGIN")
+            module.upgrade(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, nombre) VALUES (?, ?)",
+                (version, name),
+            )
+            conn.commit()
+        else:
+            with open(path, "r", encoding="utf-8") as sql_file:
+                sql_script = sql_file.read()
+            conn.executescript(
+                "BEGIN;\n"
+                f"{sql_script}\n;\n"
+                "INSERT INTO schema_version (version, nombre) "
+                f"VALUES ({int(version)}, '{name.replace(chr(39), chr(39) * 2)}');\n"
+                "COMMIT;"
+            )
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    print(f"Migración aplicada: {version:04d} {name}")
+
+
+def pending_migrations() -> list[tuple[int, str]]:
+    """List the migrations in MIGRATIONS_DIR not yet recorded in schema_version."""
+    with db_connection() as conn:
+        applied = _applied_versions(conn)
+    return [m for m in _list_migrations() if m[0] not in applied]
 
 
 def init_db():
     """
-    Reads the SQL schema from `harina.sql` and executes it.
-    Ensures tables are created in the database.
+    Brings the database schema up to date.
+
+    The base schema in `harina.sql` is recorded as version 0 and only runs
+    on a database that has not been initialized yet. After that, every
+    `NNNN_name.sql` file in `migrations/` whose version is missing from
+    schema_version is applied in order, so a normal startup executes no DDL.
     Uses `db_connection()` to automatically handle connection management.
     """
     if not os.path.exists(SQL_FILE_PATH):
@@ -43,7 +647,14 @@ def init_db():
         return
 
     with db_connection() as conn:  # Automatically handles open/close
-        with open(SQL_FILE_PATH, "r", encoding="utf-8") as sql_file:
-            sql_script = sql_file.read()
+        applied = _applied_versions(conn)
+        conn.commit()
+
+        if BASE_SCHEMA_VERSION not in applied:
+            _apply_script(
+                conn, BASE_SCHEMA_VERSION, os.path.basename(SQL_FILE_PATH), SQL_FILE_PATH
+            )
 
-        conn.executescript(sql_script)  # Execute the entire SQL script
+        for version, name in _list_migrations():
+            if version not in applied:
+                _apply_script(conn, version, name, os.path.join(MIGRATIONS_DIR, name))
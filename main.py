@@ -1,5 +1,5 @@
 # Importación de módulos de Flask necesarios para vistas, formularios, sesiones y autenticación
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response
 from flask_login import (
     LoginManager,
     UserMixin,
@@ -12,27 +12,30 @@ from functools import wraps
 from flask import abort
 from datetime import date
 
+import os, json, io, time, hmac
 
-# Bibliotecas para mandar certificados
-from xhtml2pdf import pisa  # falta en requirements
-from io import BytesIO
-import os, json
+import click
+from werkzeug.serving import is_running_from_reloader
 
 # Inicialización de base de datos y servicios (lógica de negocio)
-from db import init_db, db_connection
+from db import init_db, db_connection, start_checkpoint_job, stop_checkpoint_job, get_pool, PAGE_SIZE
+import metrics
 
 from services.user_service import (
     create_user,
     get_user,
     list_users,
+    list_users_page,
     update_user,
     delete_user,
+    get_user_cached,
     authenticate_user,
 )
 from services.client_service import (
     create_client,
     get_client,
-    list_clients,
+    list_clients_page,
+    list_client_names,
     update_client,
     deactivate_client,
     delete_client,
@@ -47,33 +50,47 @@ from services.address_service import (
 
 from services.inspection_service import (
     create_inspection,
-    list_inspections,
+    list_inspections_page,
     update_inspection,
     delete_inspection,
     get_all_inspections,
     get_inspection,
+    is_admin,
 )
 from services.equipment_service import (
     create_equipment,
     list_equipment,
+    list_equipment_page,
     update_equipment,
     deactivate_equipment,
     delete_equipment,
 )
 from services.certificate_service import (
-    list_certificates,
+    list_certificates_page,
     delete_certificate,
     create_certificate,
+    get_certificate,
+    filter_own_certificates,
     build_desviaciones,  # ← añade esto
 )
 
-from services.mail_service import send_certificate
+from services.parameters_service import get_inspection_parameters
 from services import dashboard_service
+from services import emission_service
+from services import pdf_store
+from services import import_service
+from services import export_service
 
 
 # Inicializa la aplicación Flask
 app = Flask(__name__)
 
+# Latencia por ruta y consultas por petición, expuestas en /metrics
+metrics.init_app(app)
+
+# Token opcional para que Prometheus lea /metrics sin sesión de Admin
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
 # Configura el manejador de login
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -89,10 +106,10 @@ class User(UserMixin):
         self.nombre = nombre
 
 
-# Carga los datos del usuario desde la base de datos usando su ID
+# Carga los datos del usuario (desde la caché de user_service si está vigente)
 @login_manager.user_loader
 def load_user(user_id):
-    user_data = get_user(user_id)
+    user_data = get_user_cached(user_id)
     if user_data:
         return User(
             id_usuario=user_data["id_usuario"],
@@ -126,9 +143,59 @@ def role_required(*roles):
     return decorator
 
 
+def page_args():
+    """
+    Cursores de paginación de la petición: ?after=<id> (siguiente página),
+    ?before=<id> (página anterior) y ?limit=<n>.
+    """
+    return {
+        "after": request.args.get("after", type=int),
+        "before": request.args.get("before", type=int),
+        "limit": request.args.get("limit", default=PAGE_SIZE, type=int),
+    }
+
+
+def export_args():
+    """
+    Filtros de las exportaciones CSV: ?desde=&hasta= (fechas ISO),
+    ?id_cliente= y ?id_laboratorista=, más el usuario que exporta.
+    """
+    return {
+        "desde": request.args.get("desde") or None,
+        "hasta": request.args.get("hasta") or None,
+        "id_cliente": request.args.get("id_cliente", type=int),
+        "id_laboratorista": request.args.get("id_laboratorista", type=int),
+        "user_id": current_user.id,
+        "rol": current_user.rol,
+    }
+
+
+def csv_download(chunks, nombre: str):
+    """Respuesta en streaming de un CSV generado por export_service."""
+    return Response(
+        chunks,
+        mimetype="text/csv",
+        headers={
+            "Content-Disposition": f"attachment; filename={nombre}_{date.today():%Y%m%d}.csv"
+        },
+    )
+
+
 # Inicializa la base de datos
 init_db()
 
+
+def start_background_jobs():
+    """
+    Arranca los hilos de fondo: el checkpoint periódico del WAL (para que data.db-wal no
+    crezca sin límite) y los workers que generan y envían los PDFs de certificados.
+    No se llama al importar el módulo: cada worker de gunicorn, comando de la CLI o sesión
+    de pruebas los levantaría de nuevo. Los arranca `python main.py` o `flask run-workers`.
+    """
+    start_checkpoint_job()
+    emission_service.start_workers()
+
+
 # Redirige la raíz a la pantalla de inicio de sesión
 @app.route("/")
 def home():
@@ -175,67 +242,38 @@ def logout():
 def dashboard_view():
     # Obtener el parámetro de meses de la URL o usar 12 por defecto
     months = request.args.get("months", default=12, type=int)
-    
+    # Modo de gráficas: "client" (navegador) o "server" (matplotlib)
+    charts = request.args.get("charts", dashboard_service.DASHBOARD_CHARTS)
+    if charts not in ("client", "server"):
+        charts = dashboard_service.DASHBOARD_CHARTS
+
     # Obtener los datos del dashboard específicos para el periodo seleccionado
-    dash = dashboard_service.generate_dashboard(current_user, months=months)
-    
+    dash = dashboard_service.generate_dashboard(
+        current_user, months=months, render_charts=(charts == "server")
+    )
+
     # Establecer el período seleccionado para el frontend
     dash['selected_months'] = months
-    
+    dash['chart_mode'] = charts
+
     # Obtener los certificados con desviaciones para el periodo seleccionado
     with db_connection() as conn:
         is_manager = dashboard_service._is_manager(current_user.rol)
-        
-        # Consulta SQL para obtener certificados con desviaciones
-        sql = """
-            SELECT c.*, i.id_laboratorista 
-            FROM CERTIFICADO_CALIDAD AS c
-            JOIN INSPECCION AS i USING (id_inspeccion)
-            WHERE c.fecha_envio >= date('now', ?)
-            AND LENGTH(TRIM(c.desviaciones)) > 0
-        """
-        
-        params = [f"-{months} months"]
-        
-        # Aplicar filtro por usuario si no es gerente
-        if not is_manager:
-            sql += " AND i.id_laboratorista = ?"
-            params.append(current_user.id)
-            
-        # Ejecutar la consulta
-        certificados_con_desviaciones = conn.execute(sql, params).fetchall()
-        
-        # Obtener los clientes para mostrar sus nombres
-        clientes = conn.execute("SELECT id_cliente, nombre FROM CLIENTE").fetchall()
-    
-    # Añadir los certificados y clientes al contexto
+        # Ya traen el nombre del cliente (nombre_cliente) desde el JOIN
+        certificados_con_desviaciones = dashboard_service.deviated_certificates(
+            conn, user_id=current_user.id, is_manager=is_manager, months=months
+        )
+
+    # Añadir los certificados al contexto
     dash['certificados'] = certificados_con_desviaciones
-    dash['clientes'] = clientes
-    
+
     return render_template("dashboard.html", **dash)
 
 @app.route("/dashboard/data")
 @login_required
 def dashboard_data():
     months = request.args.get("months", default=12, type=int)
-    is_manager = dashboard_service._is_manager(current_user.rol)
-    
-    with db_connection() as conn:
-        data = {
-            "certificados": dashboard_service.count_certificados(
-                conn,
-                user_id=current_user.id,
-                is_manager=is_manager,
-                months=months
-            ),
-            "desviaciones": dashboard_service.count_desviaciones(
-                conn,
-                user_id=current_user.id,
-                is_manager=is_manager,
-                months=months
-            )
-        }
-    return jsonify(data)
+    return jsonify(dashboard_service.dashboard_data(current_user, months=months))
 
 # -----------------------------------
 # CLIENTES
@@ -283,8 +321,8 @@ def register_client():
 @app.route("/clients")
 @login_required
 def list_clients_route():
-    clients = list_clients()
-    return render_template("clients.html", clients=clients)
+    page = list_clients_page(**page_args())
+    return render_template("clients.html", clients=page["items"], page=page)
 
 
 # Edición de cliente existente
@@ -497,9 +535,9 @@ def register_inspection():
 @app.route("/inspections")
 @login_required
 def list_inspections_route():
-    inspections = list_inspections()
-    print(inspections)  # Debug: Check what's being returned
-    return render_template("inspections.html", inspections=inspections)
+    page = list_inspections_page(**page_args())
+    inspections = page["items"]
+    return render_template("inspections.html", inspections=inspections, page=page)
 
 
 # Edición de inspección
@@ -542,23 +580,67 @@ def delete_inspection_route(id):
     return redirect(url_for("list_inspections_route"))
 
 
+# Importación masiva desde exportaciones CSV/TSV del alveógrafo / farinógrafo
+@app.route("/inspections/import", methods=["POST"])
+@login_required
+@role_required("Admin", "Gerencia de laboratorio", "Gerencia de Control de Calidad")
+def import_inspections_route():
+    archivo = request.files.get("archivo")
+    if not archivo or not archivo.filename:
+        flash("Seleccione un archivo CSV o TSV.", "danger")
+        return redirect(url_for("list_inspections_route"))
+
+    # Se lee en streaming: el archivo no se carga completo en memoria
+    stream = io.TextIOWrapper(archivo.stream, encoding="utf-8-sig", newline="")
+    try:
+        reporte = import_service.import_inspections(
+            stream,
+            id_laboratorista=current_user.id,
+            id_equipo=request.form.get("id_equipo", type=int),
+            tipo_inspeccion=request.form.get("tipo_inspeccion") or None,
+            # Solo un Admin puede importar filas a nombre de otro laboratorista
+            forzar_laboratorista=not is_admin(current_user.rol),
+        )
+    except (ValueError, UnicodeDecodeError) as e:
+        if request.accept_mimetypes.best == "application/json":
+            return jsonify({"error": str(e)}), 400
+        flash(f"No se pudo importar el archivo: {e}", "danger")
+        return redirect(url_for("list_inspections_route"))
+
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify(reporte)
+
+    flash(f"{reporte['importadas']} inspecciones importadas.", "success")
+    if reporte["con_error"]:
+        detalle = "; ".join(f"fila {e['fila']}: {e['error']}" for e in reporte["errores"][:10])
+        flash(f"{reporte['con_error']} filas con error: {detalle}", "warning")
+    return redirect(url_for("list_inspections_route"))
+
+
+# Exportación CSV de inspecciones (en streaming, memoria constante)
+@app.route("/inspections/export", methods=["GET"])
+@login_required
+def export_inspections_route():
+    return csv_download(export_service.export_inspections_csv(**export_args()), "inspecciones")
+
+
 # -----------------------------------
 # CERTIFICADOS
 # -----------------------------------
 # Eliminación de certificados
-@login_required
 @app.route("/certificates/delete/<int:id>", methods=["POST"])
+@login_required
 def delete_certificate_route(id):
-    from services.certificate_service import delete_certificate
-
+    # Los laboratoristas solo eliminan certificados de sus propias inspecciones
+    if get_certificate(id, user_id=current_user.id, rol=current_user.rol) is None:
+        abort(404)
     delete_certificate(id)
     return redirect(url_for("certifications"))  # Usa 'certifications' como me dijiste
 
 
 # Crear certificados
-# Crear certificados
-@login_required
 @app.route("/certifications/create", methods=["GET", "POST"])
+@login_required
 def create_certificate_route():
     # 1. Leer datos del formulario
     form = request.form
@@ -579,94 +661,108 @@ def create_certificate_route():
 
     has_devs, auto_text = build_desviaciones(
         id_cliente=id_cli,
-        resultados=inspeccion["parametros_analizados"],
+        resultados=get_inspection_parameters(id_inspeccion),
         user_text=user_text,
     )
     desviaciones_final = auto_text if has_devs else user_text
 
-    # 3. Insertar en la base de datos
+    # 3. Insertar el certificado y encolar la generación del PDF y el envío
+    #    por correo en la misma transacción: o quedan ambos o ninguno. Los
+    #    workers de emission_service lo procesan sin bloquear esta petición
     try:
-        cert_id = create_certificate(
-            id_cliente=id_cli,
-            id_inspeccion=id_inspeccion,
-            secuencia_inspeccion=form.get("secuencia_inspeccion", ""),
-            orden_compra=form.get("orden_compra", ""),
-            cantidad_solicitada=float(form.get("cantidad_solicitada") or 0),
-            cantidad_entregada=float(form.get("cantidad_entregada") or 0),
-            numero_factura=form.get("numero_factura", ""),
-            fecha_envio=form.get("fecha_envio", ""),
-            fecha_caducidad=form.get("fecha_caducidad", ""),
-            resultados_analisis=inspeccion["parametros_analizados"],
-            compara_referencias=form.get("compara_referencias", ""),
-            desviaciones=desviaciones_final,
-            destinatario_correo=form.get("destinatario_correo", ""),
-        )
+        with db_connection() as conn:
+            cert_id = create_certificate(
+                id_cliente=id_cli,
+                id_inspeccion=id_inspeccion,
+                secuencia_inspeccion=form.get("secuencia_inspeccion", ""),
+                orden_compra=form.get("orden_compra", ""),
+                cantidad_solicitada=float(form.get("cantidad_solicitada") or 0),
+                cantidad_entregada=float(form.get("cantidad_entregada") or 0),
+                numero_factura=form.get("numero_factura", ""),
+                fecha_envio=form.get("fecha_envio", ""),
+                fecha_caducidad=form.get("fecha_caducidad", ""),
+                resultados_analisis=inspeccion["parametros_analizados"],
+                compara_referencias=form.get("compara_referencias", ""),
+                desviaciones=desviaciones_final,
+                destinatario_correo=form.get("destinatario_correo", ""),
+                conn=conn,
+            )
+            emission_service.enqueue_emission(cert_id, conn)
     except Exception as e:
         flash(f"Error al crear certificado: {e}", "danger")
         return redirect(url_for("certifications"))
 
-    # 4. Preparar datos para el PDF
-    cert = {
-        "id_certificado": cert_id,
-        "id_cliente": id_cli,
-        "id_inspeccion": id_inspeccion,
-        "secuencia_inspeccion": form.get("secuencia_inspeccion", ""),
-        "orden_compra": form.get("orden_compra", ""),
-        "cantidad_solicitada": form.get("cantidad_solicitada", ""),
-        "cantidad_entregada": form.get("cantidad_entregada", ""),
-        "numero_factura": form.get("numero_factura", ""),
-        "fecha_envio": form.get("fecha_envio", ""),
-        "fecha_caducidad": form.get("fecha_caducidad", ""),
-        "resultados_analisis": inspeccion["parametros_analizados"],
-        "compara_referencias": form.get("compara_referencias", ""),
-        "desviaciones": desviaciones_final,
-        "destinatario_correo": form.get("destinatario_correo", ""),
-    }
+    emission_service.wake_workers()
+    flash(
+        f"Certificado #{cert_id} registrado; el PDF se generará y enviará en segundo plano",
+        "success",
+    )
+    return redirect(url_for("certifications"))
 
-    # 5. Generar PDF
-    html = render_template("certificado_pdf.html", cert=cert)
-    pdf_dir = os.path.join(os.path.dirname(__file__), "services", "certificados")
-    os.makedirs(pdf_dir, exist_ok=True)
-    pdf_filename = f"certificado_{cert_id}.pdf"
-    pdf_path = os.path.join(pdf_dir, pdf_filename)
-    with open(pdf_path, "wb") as pdf_file:
-        pisa.CreatePDF(BytesIO(html.encode("utf-8")), dest=pdf_file)
 
-    # 6. Enviar correo con el PDF
-    try:
-        send_certificate(cert["destinatario_correo"], pdf_filename)
-        flash(f"Certificado #{cert_id} emitido y enviado por correo", "success")
-    except Exception as e:
-        flash(
-            f"Certificado #{cert_id} emitido, pero fallo al enviar correo: {e}",
-            "warning",
-        )
+# Estado de emisión de certificados (consultado periódicamente por la UI)
+@app.route("/certifications/emission", methods=["GET"])
+@login_required
+def certifications_emission_status():
+    ids = [int(i) for i in request.args.get("ids", "").split(",") if i.strip().isdigit()]
+    ids = filter_own_certificates(ids, current_user.id, current_user.rol)
+    status = emission_service.emission_status(ids)
+    return jsonify({str(k): v for k, v in status.items()})
+
 
+# Reenviar un certificado existente (reutiliza el PDF guardado si no cambió)
+@app.route("/certifications/<int:id>/resend", methods=["POST"])
+@login_required
+def resend_certificate_route(id):
+    if get_certificate(id, user_id=current_user.id, rol=current_user.rol) is None:
+        abort(404)
+    try:
+        emission_service.resend_certificate(id)
+        flash(f"Certificado #{id} en cola para reenvío", "success")
+    except LookupError as e:
+        flash(str(e), "danger")
     return redirect(url_for("certifications"))
 
 
+# Descargar el PDF de un certificado
+@app.route("/certifications/<int:id>/pdf", methods=["GET"])
+@login_required
+def certificate_pdf_route(id):
+    # Los laboratoristas solo acceden a certificados de sus propias inspecciones
+    cert = get_certificate(id, user_id=current_user.id, rol=current_user.rol)
+    if cert is None:
+        abort(404)
+    pdf = pdf_store.render_cached([cert])[0]
+    if isinstance(pdf, Exception):
+        flash(f"No se pudo generar el PDF: {pdf}", "danger")
+        return redirect(url_for("certifications"))
+    return Response(
+        pdf,
+        mimetype="application/pdf",
+        headers={"Content-Disposition": f"inline; filename=certificado_{id}.pdf"},
+    )
+
+
+# Exportación CSV de certificados (en streaming, memoria constante)
+@app.route("/certifications/export", methods=["GET"])
+@login_required
+def export_certificates_route():
+    return csv_download(export_service.export_certificates_csv(**export_args()), "certificados")
+
+
 @app.route("/certifications", methods=["GET"])
 @login_required
 def certifications():
     """Endpoint for viewing and creating certificates"""
     try:
-        # 1) Base data
-        certificados     = list_certificates()
-        raw_inspecciones = get_all_inspections()
-        clientes         = list_clients()
-
-        # 2) Convert inspections to dicts (no JSON parsing here; we'll re-fetch for detection)
-        inspecciones = [dict(r) for r in raw_inspecciones]
-
-        # 3) Restrict to owner if non-admin
-        if current_user.rol.lower() != "admin":
-            own_ids = {
-                i["id_inspeccion"]
-                for i in inspecciones
-                if i.get("id_laboratorista") == current_user.id
-            }
-            inspecciones = [i for i in inspecciones if i["id_inspeccion"] in own_ids]
-            certificados = [c for c in certificados   if c["id_inspeccion"]  in own_ids]
+        # 1) Base data, already restricted in SQL to the user's own
+        #    inspections unless they are an admin
+        page         = list_certificates_page(
+            **page_args(), user_id=current_user.id, rol=current_user.rol
+        )
+        certificados = page["items"]
+        inspecciones = get_all_inspections(current_user.id, current_user.rol)
+        clientes     = list_client_names()
 
         # 4) Pre-parse certificate blobs for the table view
         for cert in certificados:
@@ -694,6 +790,11 @@ def certifications():
             else:
                 cert["configuracion_json_parsed"] = {}
 
+        # 4b) Estado de emisión (PDF + correo) de cada certificado
+        emisiones = emission_service.emission_status(
+            [c["id_certificado"] for c in certificados]
+        )
+
         # 5) Defaults & URL params
         desviaciones_generadas = ""
         inspeccion_seleccionada = None
@@ -703,15 +804,13 @@ def certifications():
         selected_inspection_id = request.args.get("id_inspeccion")
         selected_client_id     = request.args.get("id_cliente")
 
-        inspecciones_sorted = sorted(
-            inspecciones,
-            key=lambda x: (x.get("fecha", ""), x["id_inspeccion"]),
-            reverse=True
-        )
+        inspecciones_sorted = inspecciones  # ORDER BY fecha DESC, id_inspeccion DESC
 
         # 6) Auto-deviation detection
         if selected_inspection_id:
             inspeccion_seleccionada = int(selected_inspection_id)
+            if not any(i["id_inspeccion"] == inspeccion_seleccionada for i in inspecciones):
+                inspeccion_seleccionada = None  # Not one of the user's inspections
             if not selected_client_id:
                 # infer client from inspection row if available
                 for insp in inspecciones_sorted:
@@ -722,24 +821,9 @@ def certifications():
         if selected_client_id:
             cliente_seleccionado = int(selected_client_id)
 
-        print(f"DEBUG – Selected inspection: {inspeccion_seleccionada}")
-        print(f"DEBUG – Selected client:    {cliente_seleccionado}")
-
         if inspeccion_seleccionada and cliente_seleccionado:
-            # Re-fetch the raw JSON directly from the DB for this inspection
-            row = get_inspection(inspeccion_seleccionada)
-            raw_pa = row.get("parametros_analizados")
-            try:
-                if isinstance(raw_pa, str):
-                    resultados = json.loads(raw_pa)
-                elif isinstance(raw_pa, dict):
-                    resultados = raw_pa
-                else:
-                    resultados = {}
-            except Exception:
-                resultados = {}
-
-            print(f"DEBUG – DB-fetched resultados: {resultados}")
+            # Measured values for this inspection, read from PARAMETRO_ANALISIS
+            resultados = get_inspection_parameters(inspeccion_seleccionada)
 
             # Build deviations
             has_deviations, deviations = build_desviaciones(
@@ -749,12 +833,13 @@ def certifications():
             )
             if has_deviations:
                 desviaciones_generadas = deviations
-                print(f"DEBUG – Auto-detected deviations: {deviations}")
 
         # 7) Render
         return render_template(
             "certifications.html",
             certificados            = certificados,
+            emisiones               = emisiones,
+            page                    = page,
             inspecciones            = inspecciones_sorted,
             clientes                = clientes,
             desviaciones_generadas  = desviaciones_generadas.strip(),
@@ -812,8 +897,8 @@ def register_equipment():
 @app.route("/equipment")
 @login_required
 def list_equipment_route():
-    equipos = list_equipment()
-    return render_template("equipment.html", equipos=equipos)
+    page = list_equipment_page(**page_args())
+    return render_template("equipment.html", equipos=page["items"], page=page)
 
 
 # Edición de equipo
@@ -922,8 +1007,8 @@ def register_user():
 @login_required
 @role_required("Admin", "Gerencia de Control de Calidad", "Gerencia de laboratorio")
 def list_users_route():
-    users = list_users()
-    return render_template("users.html", users=users)
+    page = list_users_page(**page_args())
+    return render_template("users.html", users=page["items"], page=page)
 
 
 # Actualización de usuario
@@ -934,7 +1019,7 @@ def update_user_route(user_id):
     try:
         # Recoger datos del formulario
         mail = request.form["mail"]
-        contrasena = request.form["contrasena"]
+        contrasena = request.form.get("contrasena") or None  # Vacía: conserva la actual
         rol = request.form["rol"]
         nombre = request.form["nombre"]
 
@@ -970,6 +1055,119 @@ def delete_user_route(user_id):
     return redirect(url_for("list_users_route"))
 
 
+# -----------------------------------
+# COMANDOS DE MANTENIMIENTO (flask --app main <comando>)
+# -----------------------------------
+
+@app.cli.command("rebuild-rollup")
+def rebuild_rollup_command():
+    """Reconstruye ESTADISTICA_DIARIA a partir de los certificados."""
+    filas = dashboard_service.rebuild_daily_stats()
+    print(f"ESTADISTICA_DIARIA reconstruida: {filas} filas")
+
+
+@app.cli.command("import-inspections")
+@click.argument("archivo", type=click.Path(exists=True, dir_okay=False))
+@click.option("--laboratorista", type=int, help="id_laboratorista para filas sin esa columna.")
+@click.option("--equipo", type=int, help="id_equipo para filas sin esa columna.")
+@click.option("--tipo", help="tipo_inspeccion para filas sin esa columna.")
+def import_inspections_command(archivo, laboratorista, equipo, tipo):
+    """Importa inspecciones desde una exportación CSV/TSV del alveógrafo o farinógrafo."""
+    inicio = time.perf_counter()
+    try:
+        # newline="" para que el módulo csv maneje los saltos de línea dentro de campos
+        with open(archivo, newline="", encoding="utf-8-sig") as stream:
+            reporte = import_service.import_inspections(
+                stream, id_laboratorista=laboratorista, id_equipo=equipo, tipo_inspeccion=tipo
+            )
+    except (ValueError, UnicodeDecodeError) as e:
+        raise click.ClickException(str(e))
+    segundos = time.perf_counter() - inicio
+    for error in reporte["errores"]:
+        print(f"fila {error['fila']}: {error['error']}")
+    print(
+        f"{reporte['importadas']} inspecciones importadas, {reporte['con_error']} filas con error "
+        f"({reporte['importadas'] / max(segundos, 1e-9):.0f} filas/s)"
+    )
+
+
+@app.cli.command("snapshot")
+@click.option("--dir", "directorio", help="Raíz de los snapshots (SNAPSHOT_DIR por defecto).")
+@click.option("--rebuild", is_flag=True, help="Reescribe el snapshot completo.")
+def snapshot_command(directorio, rebuild):
+    """Copia a Parquet las filas nuevas de certificados, inspecciones y mediciones."""
+    from services import snapshot_service
+
+    inicio = time.perf_counter()
+    try:
+        escritas = snapshot_service.write_snapshot(directorio, rebuild=rebuild)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    resumen = ", ".join(f"{tabla}: {filas}" for tabla, filas in escritas.items())
+    print(f"Snapshot actualizado ({resumen}) en {time.perf_counter() - inicio:.1f} s")
+
+
+@app.cli.command("run-workers")
+def run_workers_command():
+    """Procesa la cola de emisión de certificados y el checkpoint del WAL hasta Ctrl-C."""
+    start_background_jobs()
+    print(f"{emission_service.EMISSION_WORKERS} workers de emisión en marcha (Ctrl-C para salir)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emission_service.stop_workers()
+        stop_checkpoint_job()
+
+
+# -----------------------------------
+# MÉTRICAS
+# -----------------------------------
+def metrics_access(f):
+    """Solo Admin, o un scraper con 'Authorization: Bearer <METRICS_TOKEN>'."""
+
+    @wraps(f)
+    def wrapped(*args, **kwargs):
+        auth = request.headers.get("Authorization", "")
+        if METRICS_TOKEN and hmac.compare_digest(auth, f"Bearer {METRICS_TOKEN}"):
+            return f(*args, **kwargs)
+        if not current_user.is_authenticated:
+            return login_manager.unauthorized()
+        if not is_admin(current_user.rol):
+            abort(403)
+        return f(*args, **kwargs)
+
+    return wrapped
+
+
+# Métricas en formato de texto de Prometheus
+@app.route("/metrics", methods=["GET"])
+@metrics_access
+def metrics_route():
+    pool = get_pool().stats()
+    extra = metrics.series(
+        "db_pool_connections", "Pooled SQLite connections by state.",
+        {"open": pool["open"], "idle": pool["idle"], "max": pool["size"]}, "state",
+    ) + metrics.series(
+        "db_pool_events_total", "Pool acquisitions served from idle, waits and new connections.",
+        {"hits": pool["hits"], "waits": pool["waits"], "creations": pool["creations"]}, "event",
+        kind="counter",
+    )
+    return Response(metrics.render(extra), mimetype="text/plain; version=0.0.4")
+
+
+# Consultas lentas registradas (SQL, parámetros y EXPLAIN QUERY PLAN)
+@app.route("/metrics/slow-queries", methods=["GET"])
+@metrics_access
+def slow_queries_route():
+    return jsonify(metrics.slow_queries())
+
+
 # Punto de entrada del servidor
 if __name__ == "__main__":
+    # Con debug=True el reloader ejecuta el servidor en un proceso hijo; solo ese levanta los hilos
+    if is_running_from_reloader():
+        start_background_jobs()
     app.run(debug=True)
@@ -0,0 +1,244 @@
+# metrics.py
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+
+- Per-route request latency histograms and request counters by status.
+- Database statement timings, recorded by db.py's instrumented
+  connections, plus the number of statements and database time of each
+  request.
+- A bounded log of slow statements (SQL, parameters, EXPLAIN QUERY PLAN).
+
+Everything is kept in memory per process; with several workers each one
+exposes its own numbers, as with any Prometheus client library.
+"""
+
+import bisect
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+
+# Upper bounds (seconds) of the latency buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# How many slow statements are kept (oldest are dropped first).
+SLOW_QUERY_LOG_SIZE = int(os.environ.get("SLOW_QUERY_LOG_SIZE", "100"))
+
+PREFIX = "harina_"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, total in items:
+            lines.append(f"{self.name}{_labels(self.labels, values)} {_format(total)}")
+        return lines
+
+
+class Histogram:
+    """Histogram with fixed buckets, optionally split by labels."""
+
+    def __init__(self, name: str, help_text: str, buckets: tuple, labels: tuple = ()):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.labels = labels
+        # label values -> [count per bucket (last is +Inf), sum]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def snapshot(self, *label_values) -> dict | None:
+        """{"count", "sum", "buckets": {le: cumulative count}} of one series."""
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                return None
+            counts, total = list(series[0]), series[1]
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            cumulative[bound] = running
+        return {"count": running, "sum": total, "buckets": cumulative}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            keys = sorted(self._series)
+        for values in keys:
+            snap = self.snapshot(*values)
+            for bound, count in snap["buckets"].items():
+                le = "+Inf" if bound == float("inf") else _format(bound)
+                labels = _labels(self.labels, values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {_format(snap['sum'])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {snap['count']}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route.",
+    LATENCY_BUCKETS, ("endpoint", "method"),
+)
+REQUESTS = Counter(
+    "http_requests_total", "Requests by route and status code.",
+    ("endpoint", "method", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "Database statements executed per request.",
+    COUNT_BUCKETS, ("endpoint",),
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Database time (execute and fetch) per request.",
+    LATENCY_BUCKETS, ("endpoint",),
+)
+QUERY_LATENCY = Histogram(
+    "db_execute_seconds", "Duration of execute(), executemany() and executescript() calls.",
+    QUERY_BUCKETS,
+)
+SLOW_QUERIES = Counter("db_slow_queries_total", "Statements slower than the slow-query threshold.")
+
+_REGISTRY = (
+    REQUEST_LATENCY, REQUESTS, REQUEST_QUERIES, REQUEST_DB_TIME,
+    QUERY_LATENCY, SLOW_QUERIES,
+)
+
+_slow_log: deque = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+_slow_lock = threading.Lock()
+
+# [statements, database seconds, endpoint] of the request running in this context.
+_request: contextvars.ContextVar[list | None] = contextvars.ContextVar("request_db", default=None)
+
+
+def record_execute(seconds: float) -> None:
+    """Called by db.py after every statement."""
+    QUERY_LATENCY.observe(seconds)
+    current = _request.get()
+    if current is not None:
+        current[0] += 1
+        current[1] += seconds
+
+
+def record_fetch(seconds: float) -> None:
+    """Called by db.py after fetchall()/fetchmany(); counts toward the request's database time."""
+    current = _request.get()
+    if current is not None:
+        current[1] += seconds
+
+
+def record_slow_query(entry: dict) -> None:
+    """Keep a slow statement; `entry` may be updated later as fetching continues."""
+    current = _request.get()
+    entry["endpoint"] = current[2] if current is not None else None
+    SLOW_QUERIES.inc()
+    with _slow_lock:
+        _slow_log.append(entry)
+
+
+def slow_queries() -> list[dict]:
+    """Logged slow statements, most recent first."""
+    with _slow_lock:
+        return [dict(entry) for entry in reversed(_slow_log)]
+
+
+def begin_request(endpoint: str | None = None) -> None:
+    _request.set([0, 0.0, endpoint])
+
+
+def request_db_stats() -> tuple[int, float]:
+    """(statements, database seconds) of the current request so far."""
+    current = _request.get()
+    return (current[0], current[1]) if current is not None else (0, 0.0)
+
+
+def end_request(endpoint: str, method: str, status: int, seconds: float) -> None:
+    queries, db_seconds = request_db_stats()
+    _request.set(None)
+    REQUEST_LATENCY.observe(seconds, endpoint, method)
+    REQUESTS.inc(endpoint, method, str(status))
+    REQUEST_QUERIES.observe(queries, endpoint)
+    REQUEST_DB_TIME.observe(db_seconds, endpoint)
+
+
+def init_app(app) -> None:
+    """Time every request of a Flask app."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+        begin_request(request.endpoint)
+
+    @app.after_request
+    def _stop_timer(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            end_request(
+                request.endpoint or "unmatched",
+                request.method,
+                response.status_code,
+                time.perf_counter() - start,
+            )
+        return response
+
+
+def series(name: str, help_text: str, values: dict, label: str, kind: str = "gauge") -> list[str]:
+    """
+    Lines of a metric kept elsewhere (e.g. the connection pool's own
+    counters), with one series per {label value: value}.
+    """
+    name = PREFIX + name
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for key, value in values.items():
+        lines.append(f"{name}{_labels((label,), (key,))} {_format(value)}")
+    return lines
+
+
+def render(extra: list[str] | None = None) -> str:
+    """All metrics in Prometheus text format (version 0.0.4)."""
+    lines = []
+    for metric in _REGISTRY:
+        lines += metric.render()
+    lines += extra or []
+    return "\n".join(lines) + "\n"
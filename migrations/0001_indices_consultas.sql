@@ -0,0 +1,20 @@
+-- Índices para las rutas de acceso más frecuentes.
+-- USUARIO(mail) ya tiene índice implícito por la restricción UNIQUE, así que
+-- authenticate_user (mail + contrasena) se resuelve con una búsqueda puntual.
+
+-- Dashboard: filtro por fecha_envio + JOIN con INSPECCION + conteo de desviaciones.
+-- Incluir id_inspeccion y desviaciones hace que el índice sea cubriente.
+CREATE INDEX IF NOT EXISTS idx_certificado_fecha_envio
+    ON CERTIFICADO_CALIDAD (fecha_envio, id_inspeccion, desviaciones);
+
+-- Certificados de una inspección (filtro por dueño en /certifications).
+CREATE INDEX IF NOT EXISTS idx_certificado_inspeccion
+    ON CERTIFICADO_CALIDAD (id_inspeccion);
+
+-- Inspecciones de un laboratorista; id_inspeccion cubre el JOIN.
+CREATE INDEX IF NOT EXISTS idx_inspeccion_laboratorista
+    ON INSPECCION (id_laboratorista, id_inspeccion);
+
+-- Direcciones de un cliente, ya ordenadas por id_direccion.
+CREATE INDEX IF NOT EXISTS idx_direccion_cliente
+    ON DIRECCION_CLIENTE (id_cliente, id_direccion);
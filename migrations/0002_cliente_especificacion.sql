@@ -0,0 +1,38 @@
+-- Especificaciones por cliente (antes en services/specs.json).
+-- Una fila por (cliente, instrumento, parámetro); la PK es el índice de búsqueda.
+CREATE TABLE IF NOT EXISTS CLIENTE_ESPECIFICACION (
+    id_cliente INTEGER NOT NULL,
+    instrumento TEXT NOT NULL,  -- 'alveografo' | 'farinografo'
+    parametro TEXT NOT NULL,
+    inf REAL,
+    sup REAL,
+    PRIMARY KEY (id_cliente, instrumento, parametro),
+    FOREIGN KEY (id_cliente) REFERENCES CLIENTE(id_cliente)
+) WITHOUT ROWID;
+
+-- Contadores de versión para invalidar cachés en memoria entre workers.
+CREATE TABLE IF NOT EXISTS VERSION_DATOS (
+    nombre TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_especificacion_insert
+AFTER INSERT ON CLIENTE_ESPECIFICACION
+BEGIN
+    INSERT INTO VERSION_DATOS (nombre, version) VALUES ('especificaciones', 1)
+    ON CONFLICT (nombre) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_especificacion_update
+AFTER UPDATE ON CLIENTE_ESPECIFICACION
+BEGIN
+    INSERT INTO VERSION_DATOS (nombre, version) VALUES ('especificaciones', 1)
+    ON CONFLICT (nombre) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_especificacion_delete
+AFTER DELETE ON CLIENTE_ESPECIFICACION
+BEGIN
+    INSERT INTO VERSION_DATOS (nombre, version) VALUES ('especificaciones', 1)
+    ON CONFLICT (nombre) DO UPDATE SET version = version + 1;
+END;
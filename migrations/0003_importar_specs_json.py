@@ -0,0 +1,41 @@
+"""
+Importa una sola vez services/specs.json a CLIENTE_ESPECIFICACION.
+
+Solo se importan clientes que existen en esta base de datos, para no
+arrastrar especificaciones de otros entornos. La lógica está copiada aquí
+(y no importada de client_service) para que la migración no cambie si el
+servicio cambia.
+"""
+
+import json
+import os
+
+SPECS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "services", "specs.json")
+
+
+def upgrade(conn):
+    if not os.path.exists(SPECS_PATH):
+        return
+    with open(SPECS_PATH, "r", encoding="utf-8") as f:
+        try:
+            specs = json.load(f)
+        except json.JSONDecodeError:
+            return
+
+    existing = {row[0] for row in conn.execute("SELECT id_cliente FROM CLIENTE")}
+    conn.executemany(
+        """
+        INSERT INTO CLIENTE_ESPECIFICACION (id_cliente, instrumento, parametro, inf, sup)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (id_cliente, instrumento, parametro)
+        DO UPDATE SET inf = excluded.inf, sup = excluded.sup
+        WHERE inf IS NOT excluded.inf OR sup IS NOT excluded.sup
+        """,
+        [
+            (int(client_id), instrumento, parametro, limites.get("inf"), limites.get("sup"))
+            for client_id, config in specs.items()
+            if client_id.isdigit() and int(client_id) in existing
+            for instrumento, params in config.items()
+            for parametro, limites in params.items()
+        ],
+    )
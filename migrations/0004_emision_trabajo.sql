@@ -0,0 +1,22 @@
+-- Cola persistente de emisión de certificados (render del PDF + envío por correo).
+CREATE TABLE IF NOT EXISTS EMISION_TRABAJO (
+    id_trabajo INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_certificado INTEGER NOT NULL,
+    etapa TEXT NOT NULL DEFAULT 'render',       -- 'render' | 'envio'
+    estado TEXT NOT NULL DEFAULT 'pendiente',   -- 'pendiente' | 'en_proceso' | 'enviado' | 'fallido'
+    intentos INTEGER NOT NULL DEFAULT 0,
+    ultimo_error TEXT,
+    archivo_pdf TEXT,
+    disponible_en TEXT NOT NULL DEFAULT (datetime('now')),
+    creado_en TEXT NOT NULL DEFAULT (datetime('now')),
+    actualizado_en TEXT NOT NULL DEFAULT (datetime('now')),
+    FOREIGN KEY (id_certificado) REFERENCES CERTIFICADO_CALIDAD(id_certificado)
+);
+
+-- Los workers toman el siguiente trabajo pendiente y disponible.
+CREATE INDEX IF NOT EXISTS idx_emision_pendientes
+    ON EMISION_TRABAJO (estado, disponible_en, id_trabajo);
+
+-- Estado de emisión por certificado (polling desde la UI).
+CREATE INDEX IF NOT EXISTS idx_emision_certificado
+    ON EMISION_TRABAJO (id_certificado, id_trabajo);
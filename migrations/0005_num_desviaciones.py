@@ -0,0 +1,36 @@
+"""
+Agrega CERTIFICADO_CALIDAD.num_desviaciones (conteo de desviaciones del texto
+separado por comas) y lo calcula para los certificados existentes.
+
+El índice del dashboard se recrea incluyendo la nueva columna para que la
+agregación 1 / 2 / 3+ siga resolviéndose solo con el índice.
+
+El conteo está copiado aquí (y no importado de certificate_service) para
+que la migración no cambie si el servicio cambia.
+"""
+
+
+def _count_devs(desviaciones: str | None) -> int:
+    """Elementos no vacíos del texto de desviaciones separado por comas."""
+    return len([x for x in (desviaciones or "").split(",") if x.strip()])
+
+
+def upgrade(conn):
+    conn.execute(
+        "ALTER TABLE CERTIFICADO_CALIDAD "
+        "ADD COLUMN num_desviaciones INTEGER NOT NULL DEFAULT 0"
+    )
+    rows = conn.execute(
+        "SELECT id_certificado, desviaciones FROM CERTIFICADO_CALIDAD"
+    ).fetchall()
+    counts = [(_count_devs(row[1]), row[0]) for row in rows]
+    conn.executemany(
+        "UPDATE CERTIFICADO_CALIDAD SET num_desviaciones = ? WHERE id_certificado = ?",
+        [pair for pair in counts if pair[0]],
+    )
+
+    conn.execute("DROP INDEX IF EXISTS idx_certificado_fecha_envio")
+    conn.execute(
+        "CREATE INDEX idx_certificado_fecha_envio ON CERTIFICADO_CALIDAD "
+        "(fecha_envio, id_inspeccion, num_desviaciones, desviaciones)"
+    )
@@ -0,0 +1,32 @@
+-- Contador 'certificados' en VERSION_DATOS: cambia cada vez que se crea,
+-- edita o elimina un certificado, o cuando una inspección cambia de
+-- laboratorista. El dashboard lo usa como parte de la llave de su caché de
+-- gráficas, así todos los workers detectan gráficas desactualizadas.
+
+CREATE TRIGGER IF NOT EXISTS trg_certificado_insert
+AFTER INSERT ON CERTIFICADO_CALIDAD
+BEGIN
+    INSERT INTO VERSION_DATOS (nombre, version) VALUES ('certificados', 1)
+    ON CONFLICT (nombre) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_certificado_update
+AFTER UPDATE ON CERTIFICADO_CALIDAD
+BEGIN
+    INSERT INTO VERSION_DATOS (nombre, version) VALUES ('certificados', 1)
+    ON CONFLICT (nombre) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_certificado_delete
+AFTER DELETE ON CERTIFICADO_CALIDAD
+BEGIN
+    INSERT INTO VERSION_DATOS (nombre, version) VALUES ('certificados', 1)
+    ON CONFLICT (nombre) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_inspeccion_laboratorista
+AFTER UPDATE OF id_laboratorista ON INSPECCION
+BEGIN
+    INSERT INTO VERSION_DATOS (nombre, version) VALUES ('certificados', 1)
+    ON CONFLICT (nombre) DO UPDATE SET version = version + 1;
+END;
@@ -0,0 +1,219 @@
+-- Resumen diario de certificados por (día, laboratorista, cliente).
+-- El dashboard lee estas filas en lugar de recorrer CERTIFICADO_CALIDAD.
+--
+-- dia:               fecha_envio tal cual ('' si es NULL).
+-- id_laboratorista:  el de la inspección del certificado (0 si es NULL).
+-- con_desviaciones:  certificados con texto en desviaciones.
+-- desv_0..desv_3mas: histograma de num_desviaciones.
+--
+-- Igual que el JOIN del dashboard, solo cuentan los certificados cuya
+-- inspección existe. Los triggers de abajo lo mantienen al día; si alguna
+-- vez se desincroniza, `flask --app main rebuild-rollup` lo reconstruye.
+
+CREATE TABLE IF NOT EXISTS ESTADISTICA_DIARIA (
+    dia TEXT NOT NULL,
+    id_laboratorista INTEGER NOT NULL,
+    id_cliente INTEGER NOT NULL,
+    certificados INTEGER NOT NULL DEFAULT 0,
+    con_desviaciones INTEGER NOT NULL DEFAULT 0,
+    desv_0 INTEGER NOT NULL DEFAULT 0,
+    desv_1 INTEGER NOT NULL DEFAULT 0,
+    desv_2 INTEGER NOT NULL DEFAULT 0,
+    desv_3mas INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, id_laboratorista, id_cliente)
+) WITHOUT ROWID;
+
+-- Vista para los dashboards de un laboratorista
+CREATE INDEX IF NOT EXISTS idx_estadistica_laboratorista
+    ON ESTADISTICA_DIARIA (id_laboratorista, dia);
+
+-- Carga inicial
+INSERT INTO ESTADISTICA_DIARIA
+SELECT IFNULL(c.fecha_envio, ''), IFNULL(i.id_laboratorista, 0), c.id_cliente,
+       COUNT(*),
+       SUM(IFNULL(LENGTH(TRIM(c.desviaciones)) > 0, 0)),
+       SUM(c.num_desviaciones = 0), SUM(c.num_desviaciones = 1),
+       SUM(c.num_desviaciones = 2), SUM(c.num_desviaciones >= 3)
+FROM CERTIFICADO_CALIDAD AS c
+JOIN INSPECCION AS i USING (id_inspeccion)
+GROUP BY 1, 2, 3;
+
+-- ---------------------------------------------------------------------------
+-- Certificados
+-- ---------------------------------------------------------------------------
+
+CREATE TRIGGER IF NOT EXISTS trg_estadistica_certificado_insert
+AFTER INSERT ON CERTIFICADO_CALIDAD
+BEGIN
+    INSERT INTO ESTADISTICA_DIARIA
+    SELECT IFNULL(NEW.fecha_envio, ''), IFNULL(i.id_laboratorista, 0), NEW.id_cliente,
+           1,
+           IFNULL(LENGTH(TRIM(NEW.desviaciones)) > 0, 0),
+           NEW.num_desviaciones = 0, NEW.num_desviaciones = 1,
+           NEW.num_desviaciones = 2, NEW.num_desviaciones >= 3
+    FROM INSPECCION AS i
+    WHERE i.id_inspeccion = NEW.id_inspeccion
+    ON CONFLICT (dia, id_laboratorista, id_cliente) DO UPDATE SET
+        certificados = certificados + excluded.certificados,
+        con_desviaciones = con_desviaciones + excluded.con_desviaciones,
+        desv_0 = desv_0 + excluded.desv_0,
+        desv_1 = desv_1 + excluded.desv_1,
+        desv_2 = desv_2 + excluded.desv_2,
+        desv_3mas = desv_3mas + excluded.desv_3mas;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_estadistica_certificado_delete
+AFTER DELETE ON CERTIFICADO_CALIDAD
+BEGIN
+    UPDATE ESTADISTICA_DIARIA SET
+        certificados = certificados - 1,
+        con_desviaciones = con_desviaciones - IFNULL(LENGTH(TRIM(OLD.desviaciones)) > 0, 0),
+        desv_0 = desv_0 - (OLD.num_desviaciones = 0),
+        desv_1 = desv_1 - (OLD.num_desviaciones = 1),
+        desv_2 = desv_2 - (OLD.num_desviaciones = 2),
+        desv_3mas = desv_3mas - (OLD.num_desviaciones >= 3)
+    WHERE dia = IFNULL(OLD.fecha_envio, '')
+      AND id_cliente = OLD.id_cliente
+      AND id_laboratorista = (
+          SELECT IFNULL(id_laboratorista, 0) FROM INSPECCION
+          WHERE id_inspeccion = OLD.id_inspeccion
+      );
+    DELETE FROM ESTADISTICA_DIARIA
+    WHERE dia = IFNULL(OLD.fecha_envio, '') AND id_cliente = OLD.id_cliente
+      AND certificados <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_estadistica_certificado_update
+AFTER UPDATE OF fecha_envio, id_cliente, id_inspeccion, desviaciones, num_desviaciones
+ON CERTIFICADO_CALIDAD
+BEGIN
+    UPDATE ESTADISTICA_DIARIA SET
+        certificados = certificados - 1,
+        con_desviaciones = con_desviaciones - IFNULL(LENGTH(TRIM(OLD.desviaciones)) > 0, 0),
+        desv_0 = desv_0 - (OLD.num_desviaciones = 0),
+        desv_1 = desv_1 - (OLD.num_desviaciones = 1),
+        desv_2 = desv_2 - (OLD.num_desviaciones = 2),
+        desv_3mas = desv_3mas - (OLD.num_desviaciones >= 3)
+    WHERE dia = IFNULL(OLD.fecha_envio, '')
+      AND id_cliente = OLD.id_cliente
+      AND id_laboratorista = (
+          SELECT IFNULL(id_laboratorista, 0) FROM INSPECCION
+          WHERE id_inspeccion = OLD.id_inspeccion
+      );
+    DELETE FROM ESTADISTICA_DIARIA
+    WHERE dia = IFNULL(OLD.fecha_envio, '') AND id_cliente = OLD.id_cliente
+      AND certificados <= 0;
+
+    INSERT INTO ESTADISTICA_DIARIA
+    SELECT IFNULL(NEW.fecha_envio, ''), IFNULL(i.id_laboratorista, 0), NEW.id_cliente,
+           1,
+           IFNULL(LENGTH(TRIM(NEW.desviaciones)) > 0, 0),
+           NEW.num_desviaciones = 0, NEW.num_desviaciones = 1,
+           NEW.num_desviaciones = 2, NEW.num_desviaciones >= 3
+    FROM INSPECCION AS i
+    WHERE i.id_inspeccion = NEW.id_inspeccion
+    ON CONFLICT (dia, id_laboratorista, id_cliente) DO UPDATE SET
+        certificados = certificados + excluded.certificados,
+        con_desviaciones = con_desviaciones + excluded.con_desviaciones,
+        desv_0 = desv_0 + excluded.desv_0,
+        desv_1 = desv_1 + excluded.desv_1,
+        desv_2 = desv_2 + excluded.desv_2,
+        desv_3mas = desv_3mas + excluded.desv_3mas;
+END;
+
+-- ---------------------------------------------------------------------------
+-- Inspecciones: el laboratorista de un certificado viene de su inspección
+-- ---------------------------------------------------------------------------
+
+CREATE TRIGGER IF NOT EXISTS trg_estadistica_inspeccion_insert
+AFTER INSERT ON INSPECCION
+BEGIN
+    INSERT INTO ESTADISTICA_DIARIA
+    SELECT IFNULL(c.fecha_envio, ''), IFNULL(NEW.id_laboratorista, 0), c.id_cliente,
+           COUNT(*),
+           SUM(IFNULL(LENGTH(TRIM(c.desviaciones)) > 0, 0)),
+           SUM(c.num_desviaciones = 0), SUM(c.num_desviaciones = 1),
+           SUM(c.num_desviaciones = 2), SUM(c.num_desviaciones >= 3)
+    FROM CERTIFICADO_CALIDAD AS c
+    WHERE c.id_inspeccion = NEW.id_inspeccion
+    GROUP BY 1, 3
+    ON CONFLICT (dia, id_laboratorista, id_cliente) DO UPDATE SET
+        certificados = certificados + excluded.certificados,
+        con_desviaciones = con_desviaciones + excluded.con_desviaciones,
+        desv_0 = desv_0 + excluded.desv_0,
+        desv_1 = desv_1 + excluded.desv_1,
+        desv_2 = desv_2 + excluded.desv_2,
+        desv_3mas = desv_3mas + excluded.desv_3mas;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_estadistica_inspeccion_delete
+AFTER DELETE ON INSPECCION
+BEGIN
+    UPDATE ESTADISTICA_DIARIA SET
+        certificados = ESTADISTICA_DIARIA.certificados - agg.certificados,
+        con_desviaciones = ESTADISTICA_DIARIA.con_desviaciones - agg.con_desviaciones,
+        desv_0 = ESTADISTICA_DIARIA.desv_0 - agg.desv_0,
+        desv_1 = ESTADISTICA_DIARIA.desv_1 - agg.desv_1,
+        desv_2 = ESTADISTICA_DIARIA.desv_2 - agg.desv_2,
+        desv_3mas = ESTADISTICA_DIARIA.desv_3mas - agg.desv_3mas
+    FROM (
+        SELECT IFNULL(c.fecha_envio, '') AS dia, c.id_cliente,
+               COUNT(*) AS certificados,
+               SUM(IFNULL(LENGTH(TRIM(c.desviaciones)) > 0, 0)) AS con_desviaciones,
+               SUM(c.num_desviaciones = 0) AS desv_0, SUM(c.num_desviaciones = 1) AS desv_1,
+               SUM(c.num_desviaciones = 2) AS desv_2, SUM(c.num_desviaciones >= 3) AS desv_3mas
+        FROM CERTIFICADO_CALIDAD AS c
+        WHERE c.id_inspeccion = OLD.id_inspeccion
+        GROUP BY 1, 2
+    ) AS agg
+    WHERE ESTADISTICA_DIARIA.dia = agg.dia
+      AND ESTADISTICA_DIARIA.id_cliente = agg.id_cliente
+      AND ESTADISTICA_DIARIA.id_laboratorista = IFNULL(OLD.id_laboratorista, 0);
+    DELETE FROM ESTADISTICA_DIARIA
+    WHERE id_laboratorista = IFNULL(OLD.id_laboratorista, 0) AND certificados <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_estadistica_inspeccion_laboratorista
+AFTER UPDATE OF id_laboratorista ON INSPECCION
+WHEN IFNULL(OLD.id_laboratorista, 0) <> IFNULL(NEW.id_laboratorista, 0)
+BEGIN
+    UPDATE ESTADISTICA_DIARIA SET
+        certificados = ESTADISTICA_DIARIA.certificados - agg.certificados,
+        con_desviaciones = ESTADISTICA_DIARIA.con_desviaciones - agg.con_desviaciones,
+        desv_0 = ESTADISTICA_DIARIA.desv_0 - agg.desv_0,
+        desv_1 = ESTADISTICA_DIARIA.desv_1 - agg.desv_1,
+        desv_2 = ESTADISTICA_DIARIA.desv_2 - agg.desv_2,
+        desv_3mas = ESTADISTICA_DIARIA.desv_3mas - agg.desv_3mas
+    FROM (
+        SELECT IFNULL(c.fecha_envio, '') AS dia, c.id_cliente,
+               COUNT(*) AS certificados,
+               SUM(IFNULL(LENGTH(TRIM(c.desviaciones)) > 0, 0)) AS con_desviaciones,
+               SUM(c.num_desviaciones = 0) AS desv_0, SUM(c.num_desviaciones = 1) AS desv_1,
+               SUM(c.num_desviaciones = 2) AS desv_2, SUM(c.num_desviaciones >= 3) AS desv_3mas
+        FROM CERTIFICADO_CALIDAD AS c
+        WHERE c.id_inspeccion = NEW.id_inspeccion
+        GROUP BY 1, 2
+    ) AS agg
+    WHERE ESTADISTICA_DIARIA.dia = agg.dia
+      AND ESTADISTICA_DIARIA.id_cliente = agg.id_cliente
+      AND ESTADISTICA_DIARIA.id_laboratorista = IFNULL(OLD.id_laboratorista, 0);
+    DELETE FROM ESTADISTICA_DIARIA
+    WHERE id_laboratorista = IFNULL(OLD.id_laboratorista, 0) AND certificados <= 0;
+
+    INSERT INTO ESTADISTICA_DIARIA
+    SELECT IFNULL(c.fecha_envio, ''), IFNULL(NEW.id_laboratorista, 0), c.id_cliente,
+           COUNT(*),
+           SUM(IFNULL(LENGTH(TRIM(c.desviaciones)) > 0, 0)),
+           SUM(c.num_desviaciones = 0), SUM(c.num_desviaciones = 1),
+           SUM(c.num_desviaciones = 2), SUM(c.num_desviaciones >= 3)
+    FROM CERTIFICADO_CALIDAD AS c
+    WHERE c.id_inspeccion = NEW.id_inspeccion
+    GROUP BY 1, 3
+    ON CONFLICT (dia, id_laboratorista, id_cliente) DO UPDATE SET
+        certificados = certificados + excluded.certificados,
+        con_desviaciones = con_desviaciones + excluded.con_desviaciones,
+        desv_0 = desv_0 + excluded.desv_0,
+        desv_1 = desv_1 + excluded.desv_1,
+        desv_2 = desv_2 + excluded.desv_2,
+        desv_3mas = desv_3mas + excluded.desv_3mas;
+END;
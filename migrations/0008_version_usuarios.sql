@@ -0,0 +1,17 @@
+-- Contador 'usuarios' en VERSION_DATOS: cambia cuando se edita o elimina un
+-- usuario. La caché del user_loader de cada worker lo revisa para no seguir
+-- sirviendo un rol o una cuenta que ya cambió en otro proceso.
+
+CREATE TRIGGER IF NOT EXISTS trg_usuario_update
+AFTER UPDATE ON USUARIO
+BEGIN
+    INSERT INTO VERSION_DATOS (nombre, version) VALUES ('usuarios', 1)
+    ON CONFLICT (nombre) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_usuario_delete
+AFTER DELETE ON USUARIO
+BEGIN
+    INSERT INTO VERSION_DATOS (nombre, version) VALUES ('usuarios', 1)
+    ON CONFLICT (nombre) DO UPDATE SET version = version + 1;
+END;
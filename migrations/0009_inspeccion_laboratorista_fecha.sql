@@ -0,0 +1,5 @@
+-- Selector de inspecciones de /certifications para un laboratorista:
+-- WHERE id_laboratorista = ? ORDER BY fecha DESC, id_inspeccion DESC
+-- se resuelve recorriendo este índice en orden, sin ordenar en memoria.
+CREATE INDEX IF NOT EXISTS idx_inspeccion_laboratorista_fecha
+    ON INSPECCION (id_laboratorista, fecha, id_inspeccion);
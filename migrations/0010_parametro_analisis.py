@@ -0,0 +1,106 @@
+"""
+Usa PARAMETRO_ANALISIS como almacenamiento relacional de los parámetros de
+cada inspección (hasta ahora solo vivían en el JSON parametros_analizados).
+
+- Reconstruye la tabla con id_equipo_laboratorio opcional: hay inspecciones
+  sin equipo y sus parámetros también deben guardarse.
+- idx_parametro_inspeccion (parametro_analizado, id_inspeccion, valor) para
+  consultar un parámetro en todas las inspecciones solo con el índice.
+- Trigger que borra los parámetros al borrar su inspección.
+- Rellena los parámetros de las inspecciones existentes desde el JSON.
+
+La conversión del JSON a filas está copiada aquí (y no importada de
+parameters_service) para que la migración no cambie si el servicio cambia.
+"""
+
+import json
+
+CATEGORIAS = ("farinografo", "alveografo")
+
+
+def _flatten(parametros) -> dict:
+    """parametros_analizados (JSON plano o agrupado por categoría) como {parámetro: valor}."""
+    try:
+        parametros = json.loads(parametros)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    if not isinstance(parametros, dict):
+        return {}
+    if any(cat in parametros for cat in CATEGORIAS):
+        flat = {}
+        for cat in CATEGORIAS:
+            if isinstance(parametros.get(cat), dict):
+                flat.update(parametros[cat])
+        return flat
+    return parametros
+
+
+def _valor(value) -> float | None:
+    """Valor numérico del parámetro, o None si no es un número."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def upgrade(conn):
+    conn.execute(
+        """
+        CREATE TABLE PARAMETRO_ANALISIS_NUEVA (
+            id_parametro INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_inspeccion INTEGER NOT NULL,
+            id_equipo_laboratorio INTEGER,
+            parametro_analizado TEXT NOT NULL,
+            valor REAL,
+            FOREIGN KEY (id_inspeccion) REFERENCES INSPECCION(id_inspeccion),
+            FOREIGN KEY (id_equipo_laboratorio) REFERENCES EQUIPO_LABORATORIO(id_equipo)
+        )
+        """
+    )
+    conn.execute(
+        "INSERT INTO PARAMETRO_ANALISIS_NUEVA SELECT id_parametro, id_inspeccion, "
+        "id_equipo_laboratorio, parametro_analizado, valor FROM PARAMETRO_ANALISIS"
+    )
+    conn.execute("DROP TABLE PARAMETRO_ANALISIS")
+    conn.execute("ALTER TABLE PARAMETRO_ANALISIS_NUEVA RENAME TO PARAMETRO_ANALISIS")
+
+    conn.execute(
+        "CREATE INDEX idx_parametro_inspeccion ON PARAMETRO_ANALISIS "
+        "(parametro_analizado, id_inspeccion, valor)"
+    )
+    conn.execute(
+        "CREATE INDEX idx_parametro_por_inspeccion ON PARAMETRO_ANALISIS (id_inspeccion)"
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER trg_inspeccion_borra_parametros
+        AFTER DELETE ON INSPECCION
+        BEGIN
+            DELETE FROM PARAMETRO_ANALISIS WHERE id_inspeccion = OLD.id_inspeccion;
+        END
+        """
+    )
+
+    # Solo inspecciones que aún no tienen filas cargadas a mano
+    rows = conn.execute(
+        """
+        SELECT id_inspeccion, id_equipo, parametros_analizados
+        FROM INSPECCION AS i
+        WHERE parametros_analizados IS NOT NULL
+        AND NOT EXISTS (
+            SELECT 1 FROM PARAMETRO_ANALISIS AS p WHERE p.id_inspeccion = i.id_inspeccion
+        )
+        """
+    ).fetchall()
+    conn.executemany(
+        "INSERT INTO PARAMETRO_ANALISIS "
+        "(id_inspeccion, id_equipo_laboratorio, parametro_analizado, valor) "
+        "VALUES (?, ?, ?, ?)",
+        [
+            (row[0], row[1], str(nombre), _valor(valor))
+            for row in rows
+            for nombre, valor in _flatten(row[2]).items()
+        ],
+    )
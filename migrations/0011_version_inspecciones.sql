@@ -0,0 +1,19 @@
+-- El contador 'certificados' de VERSION_DATOS también cambia cuando se crea
+-- o elimina una inspección: las gráficas del dashboard unen los
+-- certificados con INSPECCION (alcance por laboratorista) y ESTADISTICA_DIARIA
+-- se ajusta en esos mismos eventos, así que las gráficas en caché dejan de
+-- ser válidas aunque ningún certificado haya cambiado.
+
+CREATE TRIGGER IF NOT EXISTS trg_inspeccion_insert
+AFTER INSERT ON INSPECCION
+BEGIN
+    INSERT INTO VERSION_DATOS (nombre, version) VALUES ('certificados', 1)
+    ON CONFLICT (nombre) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_inspeccion_delete
+AFTER DELETE ON INSPECCION
+BEGIN
+    INSERT INTO VERSION_DATOS (nombre, version) VALUES ('certificados', 1)
+    ON CONFLICT (nombre) DO UPDATE SET version = version + 1;
+END;
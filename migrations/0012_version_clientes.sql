@@ -0,0 +1,17 @@
+-- Contador 'clientes' en VERSION_DATOS: cambia cuando se edita o elimina un
+-- cliente. El JSON del dashboard incluye el nombre de cada cliente, así que
+-- su caché se invalida con este contador además de con 'certificados'.
+
+CREATE TRIGGER IF NOT EXISTS trg_cliente_update
+AFTER UPDATE ON CLIENTE
+BEGIN
+    INSERT INTO VERSION_DATOS (nombre, version) VALUES ('clientes', 1)
+    ON CONFLICT (nombre) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cliente_delete
+AFTER DELETE ON CLIENTE
+BEGIN
+    INSERT INTO VERSION_DATOS (nombre, version) VALUES ('clientes', 1)
+    ON CONFLICT (nombre) DO UPDATE SET version = version + 1;
+END;
@@ -5,64 +5,147 @@ Proporciona operaciones CRUD para la gestión de registros de certificación en
 Este servicio permite recuperar todos los IDs de certificados y obtener información según parámetros específicos.
 """
 
-from db import db_connection
+from db import db_connection, data_version, keyset_page, PAGE_SIZE
 import sqlite3
 import os, json   # ← añade esto
+import threading
+import time
+
+from services.inspection_service import is_admin
+from services.parameters_service import flatten_parametros
 
 # --------------------------------------------------------------------
 #  Helpers para comparar resultados vs. especificaciones de cliente
 # --------------------------------------------------------------------
-SPEC_PATH = os.path.join(os.path.dirname(__file__), "specs.json")
 DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "parametros_default.json")
 
-def _load_refs_json(client_id: int) -> dict:
-    """Load client-specific or default parameters"""
+# Caché en memoria de especificaciones por cliente.
+# Se invalida explícitamente cuando client_service guarda límites nuevos y,
+# para cambios hechos por otros workers, cuando cambia el contador
+# 'especificaciones' de VERSION_DATOS (lo incrementan los triggers de
+# CLIENTE_ESPECIFICACION) o el mtime de parametros_default.json. Esa
+# revisión se hace como máximo cada SPEC_CACHE_CHECK_INTERVAL segundos.
+SPEC_CACHE_CHECK_INTERVAL = 2.0
+
+_spec_cache: dict[int, dict] = {}
+_spec_cache_lock = threading.Lock()
+_spec_cache_stamp: tuple = (None, None)
+_spec_cache_checked_at = 0.0
+_spec_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _file_mtime(path: str):
     try:
-        # First try to load client-specific parameters from specs.json
-        with open(SPEC_PATH, "r", encoding="utf-8") as fh:
-            specs = json.load(fh)
-        
-        client_specs = specs.get(str(client_id), {})
-        
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def invalidate_spec_cache(client_id: int | None = None) -> None:
+    """Descarta las especificaciones en caché de un cliente (o de todos)."""
+    global _spec_cache_checked_at
+    with _spec_cache_lock:
+        if client_id is None:
+            _spec_cache.clear()
+            _spec_cache_checked_at = 0.0
+        else:
+            _spec_cache.pop(int(client_id), None)
+        _spec_cache_stats["invalidations"] += 1
+
+
+def spec_cache_stats() -> dict:
+    """Contadores de la caché de especificaciones: hits, misses, invalidations, size."""
+    with _spec_cache_lock:
+        return {**_spec_cache_stats, "size": len(_spec_cache)}
+
+
+def _check_spec_sources() -> None:
+    """Vacía la caché si otro proceso cambió las especificaciones o los defaults."""
+    global _spec_cache_stamp, _spec_cache_checked_at
+    now = time.monotonic()
+    if now - _spec_cache_checked_at < SPEC_CACHE_CHECK_INTERVAL:
+        return
+    stamp = (data_version("especificaciones"), _file_mtime(DEFAULT_PATH))
+    with _spec_cache_lock:
+        _spec_cache_checked_at = now
+        if stamp != _spec_cache_stamp:
+            if _spec_cache:
+                _spec_cache_stats["invalidations"] += 1
+            _spec_cache.clear()
+            _spec_cache_stamp = stamp
+
+
+def _read_refs(client_id: int) -> dict | None:
+    """Load client-specific parameters from CLIENTE_ESPECIFICACION, or the defaults"""
+    try:
+        with db_connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT instrumento, parametro, inf, sup
+                FROM CLIENTE_ESPECIFICACION
+                WHERE id_cliente = ?
+                """,
+                (client_id,),
+            ).fetchall()
+
+        if rows:
+            client_specs: dict = {}
+            for row in rows:
+                client_specs.setdefault(row["instrumento"], {})[row["parametro"]] = {
+                    "inf": row["inf"],
+                    "sup": row["sup"],
+                }
+            return client_specs
+
         # If no client-specific parameters found, load defaults
-        if not client_specs:
-            with open(DEFAULT_PATH, "r", encoding="utf-8") as f:
-                defaults = json.load(f)
-            return defaults
-        
-        return client_specs
+        with open(DEFAULT_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
     except Exception as e:
         print(f"Error loading references: {str(e)}")
-        return {}
+        return None
+
+
+def _load_refs_json(client_id: int) -> dict:
+    """Load client-specific or default parameters, served from the spec cache"""
+    key = int(client_id)
+    _check_spec_sources()
+    with _spec_cache_lock:
+        refs = _spec_cache.get(key)
+        if refs is not None:
+            _spec_cache_stats["hits"] += 1
+            return refs
+        _spec_cache_stats["misses"] += 1
+
+    refs = _read_refs(key)
+    if refs is None:
+        return {}  # Don't cache read errors; retry on the next call
+    with _spec_cache_lock:
+        _spec_cache[key] = refs
+    return refs
+
+
+# Known parameters mapped to their category (order defines message order)
+KNOWN_PARAMS = {
+    "W": "alveografo",
+    "P": "alveografo",
+    "L": "alveografo",
+    "relacion_P_L": "alveografo",
+    "absorcion_de_agua": "farinografo",
+    "tiempo_de_desarrollo": "farinografo",
+    "estabilidad": "farinografo",
+    "indice_de_tolerancia": "farinografo"
+}
+
 
 def _detect_devs(resultados: dict, refs: dict) -> list:
     """Detect deviations between results and reference values"""
     devs = []
 
-    print(f"DEBUG - Resultados: {resultados}")
-    print(f"DEBUG - Referencias: {refs}")
-
     # Known parameters mapped to their category
-    known_params = {
-        "W": "alveografo",
-        "P": "alveografo",
-        "L": "alveografo",
-        "relacion_P_L": "alveografo",
-        "absorcion_de_agua": "farinografo",
-        "tiempo_de_desarrollo": "farinografo",
-        "estabilidad": "farinografo",
-        "indice_de_tolerancia": "farinografo"
-    }
+    known_params = KNOWN_PARAMS
 
     # Flatten if wrapped inside a category key (e.g., {'farinografo': {...}})
-    if any(k in resultados for k in ["farinografo", "alveografo"]):
-        flat_resultados = {}
-        for cat in ["farinografo", "alveografo"]:
-            if cat in resultados and isinstance(resultados[cat], dict):
-                flat_resultados.update(resultados[cat])
-        resultados = flat_resultados
-
-    print("DEBUG - Normalized resultados:", resultados)
+    resultados = flatten_parametros(resultados)
 
     for param_name, category in known_params.items():
         if param_name not in resultados:
@@ -71,34 +154,27 @@ def _detect_devs(resultados: dict, refs: dict) -> list:
         try:
             param_value = float(resultados[param_name])
         except (ValueError, TypeError):
-            print(f"DEBUG - Skipping invalid value for {param_name}: {resultados[param_name]}")
-            continue
+            continue  # Not a number (e.g., empty field)
 
         ref = refs.get(category, {}).get(param_name, {})
         min_val = ref.get("inf")
         max_val = ref.get("sup")
 
-        print(f"DEBUG - Checking {param_name}: value={param_value}, min={min_val}, max={max_val}")
-
         if min_val is not None and param_value < min_val:
             devs.append(f"{param_name} bajo ({param_value} < {min_val})")
         elif max_val is not None and param_value > max_val:
             devs.append(f"{param_name} alto ({param_value} > {max_val})")
 
-    print(f"DEBUG - Detected deviations: {devs}")
     return devs
 
 def build_desviaciones(id_cliente: int, resultados: dict, user_text: str) -> tuple:
     """Build deviations list based on client parameters"""
-    print(f"Cliente: {id_cliente}")
-    print(f"Resultados crudos: {resultados}")
     try:
         # Parse resultados if it's a string
         if isinstance(resultados, str):
             try:
                 resultados = json.loads(resultados)
             except json.JSONDecodeError:
-                print("DEBUG - JSON decode error on resultados")
                 resultados = {}
         
         # Handle null/None case
@@ -115,13 +191,99 @@ def build_desviaciones(id_cliente: int, resultados: dict, user_text: str) -> tup
             return (True, ", ".join(auto_devs))
         return (False, user_text.strip())
     except Exception as e:
-        print(f"DEBUG - Error in build_desviaciones: {str(e)}")
+        print(f"Error in build_desviaciones: {str(e)}")
         import traceback
         traceback.print_exc()
         # Return original text if there's an error
         return (False, user_text.strip())
 
 
+# --------------------------------------------------------------------
+#  Evaluación por lotes (re-verificación de históricos)
+# --------------------------------------------------------------------
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return float("nan")
+
+
+def detect_devs_batch(pairs) -> list[list[str]]:
+    """
+    Evalúa muchas inspecciones contra los límites de su cliente de una vez.
+
+    Parámetros:
+    - pairs: iterable de (id_cliente, resultados), donde resultados es el dict
+      o el JSON tal como lo acepta build_desviaciones.
+
+    Retorna:
+    - Lista con una lista de desviaciones por fila, con los mismos mensajes
+      y en el mismo orden que build_desviaciones.
+
+    Los valores y límites se arman como matrices (filas × 8 parámetros) y la
+    comparación se hace con operaciones de NumPy; solo las celdas fuera de
+    especificación se formatean en Python.
+    """
+    import numpy as np  # Solo se carga si se usa la ruta por lotes
+    pairs = list(pairs)
+    if not pairs:
+        return []
+    params = list(KNOWN_PARAMS)
+
+    # Valores: matriz n × p (NaN = ausente o inválido, nunca se desvía)
+    flat = [flatten_parametros(r) for _, r in pairs]
+    values = np.array(
+        [[_to_float(f[p]) if p in f else np.nan for p in params] for f in flat],
+        dtype=float,
+    )
+
+    # Límites: una fila por cliente distinto, luego se expanden por índice
+    client_ids, inverse = np.unique(
+        np.array([int(c) for c, _ in pairs], dtype=np.int64), return_inverse=True
+    )
+    raw_limits = []  # (inf, sup) originales por cliente, para los mensajes
+    inf = np.full((len(client_ids), len(params)), np.nan)
+    sup = np.full((len(client_ids), len(params)), np.nan)
+    for ci, client_id in enumerate(client_ids):
+        refs = _load_refs_json(int(client_id))
+        limits = []
+        for pi, param in enumerate(params):
+            ref = refs.get(KNOWN_PARAMS[param], {}).get(param, {})
+            lo, hi = ref.get("inf"), ref.get("sup")
+            if lo is not None:
+                inf[ci, pi] = lo
+            if hi is not None:
+                sup[ci, pi] = hi
+            limits.append((lo, hi))
+        raw_limits.append(limits)
+
+    inf_rows = inf[inverse]
+    sup_rows = sup[inverse]
+    with np.errstate(invalid="ignore"):
+        low = values < inf_rows
+        high = ~low & (values > sup_rows)
+
+    devs: list[list[str]] = [[] for _ in pairs]
+    rows, cols = np.nonzero(low | high)  # Row-major: keeps parameter order
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        value = float(values[r, c])
+        lo, hi = raw_limits[inverse[r]][c]
+        if low[r, c]:
+            devs[r].append(f"{params[c]} bajo ({value} < {lo})")
+        else:
+            devs[r].append(f"{params[c]} alto ({value} > {hi})")
+    return devs
+
+
+def count_devs(desviaciones: str | None) -> int:
+    """
+    Número de desviaciones en el texto separado por comas (los elementos
+    vacíos no cuentan). Se guarda en CERTIFICADO_CALIDAD.num_desviaciones
+    para que el dashboard agrupe 1 / 2 / 3+ directamente en SQL.
+    """
+    return len([x for x in (desviaciones or "").split(",") if x.strip()])
+
+
 def create_certificate(
     id_cliente: int,
     id_inspeccion: int,
@@ -136,32 +298,30 @@ def create_certificate(
     compara_referencias: str,
     desviaciones: str,
     destinatario_correo: str,
+    conn=None,
 ) -> int:
     """
     Inserta un nuevo registro de certificado de calidad en la base de datos.
 
+    Parámetros:
+    - conn: conexión abierta a reutilizar, para registrar el certificado en la
+      misma transacción que otras escrituras (p. ej. encolar su emisión).
+
     Retorna:
     - ID del nuevo certificado insertado.
     """
-    with db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO CERTIFICADO_CALIDAD (
-                id_cliente,
-                id_inspeccion,
-                secuencia_inspeccion,
-                orden_compra,
-                cantidad_solicitada,
-                cantidad_entregada,
-                numero_factura,
-                fecha_envio,
-                fecha_caducidad,
-                resultados_analisis,
-                compara_referencias,
-                desviaciones,
-                destinatario_correo
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+    if conn is None:
+        with db_connection() as own_conn:
+            return create_certificate(
+                id_cliente, id_inspeccion, secuencia_inspeccion, orden_compra,
+                cantidad_solicitada, cantidad_entregada, numero_factura, fecha_envio,
+                fecha_caducidad, resultados_analisis, compara_referencias, desviaciones,
+                destinatario_correo, own_conn,
+            )
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO CERTIFICADO_CALIDAD (
             id_cliente,
             id_inspeccion,
             secuencia_inspeccion,
@@ -174,33 +334,98 @@ def create_certificate(
             resultados_analisis,
             compara_referencias,
             desviaciones,
-            destinatario_correo
-        ))
-        return cursor.lastrowid
+            destinatario_correo,
+            num_desviaciones
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        id_cliente,
+        id_inspeccion,
+        secuencia_inspeccion,
+        orden_compra,
+        cantidad_solicitada,
+        cantidad_entregada,
+        numero_factura,
+        fecha_envio,
+        fecha_caducidad,
+        resultados_analisis,
+        compara_referencias,
+        desviaciones,
+        destinatario_correo,
+        count_devs(desviaciones)
+    ))
+    return cursor.lastrowid
+
+
+def _scope(user_id: int | None, rol: str | None) -> tuple[str, str, tuple]:
+    """JOIN y condición que limitan a un no Admin a certificados de sus inspecciones."""
+    if user_id is not None and not is_admin(rol):
+        return (
+            "JOIN INSPECCION AS i ON i.id_inspeccion = c.id_inspeccion",
+            " AND i.id_laboratorista = ?",
+            (user_id,),
+        )
+    return "", "", ()
 
 
-def get_certificate(id_certificado: int) -> dict | None:
+def get_certificate(
+    id_certificado: int,
+    *,
+    user_id: int | None = None,
+    rol: str | None = None,
+) -> dict | None:
     """
     Recupera un certificado de calidad por su ID.
 
+    Parámetros:
+    - user_id, rol: usuario que consulta. Si se indican y el rol no es Admin, solo se
+      devuelve el certificado si es de una inspección de la que es laboratorista.
+
     Retorna:
     - dict con los campos del certificado si existe.
-    - None si no se encuentra.
+    - None si no se encuentra (o no pertenece al usuario).
     """
+    join, where, params = _scope(user_id, rol)
     with db_connection() as conn:
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT *
-            FROM CERTIFICADO_CALIDAD
-            WHERE id_certificado = ?
-        """, (id_certificado,))
+        cursor.execute(f"""
+            SELECT c.*
+            FROM CERTIFICADO_CALIDAD AS c
+            {join}
+            WHERE c.id_certificado = ?{where}
+        """, (id_certificado, *params))
         row = cursor.fetchone()
 
     if row:
         return dict(row)
     return None
 
+
+def filter_own_certificates(
+    ids_certificado: list[int],
+    user_id: int | None = None,
+    rol: str | None = None,
+) -> list[int]:
+    """
+    De los ids indicados, los certificados que el usuario puede ver: todos los
+    existentes si es Admin, o los de inspecciones de las que es laboratorista.
+    """
+    if not ids_certificado:
+        return []
+    join, where, params = _scope(user_id, rol)
+    placeholders = ", ".join("?" for _ in ids_certificado)
+    with db_connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT c.id_certificado
+            FROM CERTIFICADO_CALIDAD AS c
+            {join}
+            WHERE c.id_certificado IN ({placeholders}){where}
+            """,
+            (*ids_certificado, *params),
+        ).fetchall()
+    return [row[0] for row in rows]
+
 def update_certificate(
     id_certificado: int,
     id_cliente: int,
@@ -239,7 +464,8 @@ def update_certificate(
                 resultados_analisis = ?,
                 compara_referencias = ?,
                 desviaciones = ?,
-                destinatario_correo = ?
+                destinatario_correo = ?,
+                num_desviaciones = ?
             WHERE id_certificado = ?
         """, (
             id_cliente,
@@ -255,6 +481,7 @@ def update_certificate(
             compara_referencias,
             desviaciones,
             destinatario_correo,
+            count_devs(desviaciones),
             id_certificado
         ))
         return cursor.rowcount
@@ -293,4 +520,47 @@ def list_certificates() -> list[dict]:
             ORDER BY id_certificado DESC
         """)
         rows = cursor.fetchall()
-        return [dict(row) for row in rows]
\ No newline at end of file
+        return [dict(row) for row in rows]
+
+
+def list_certificates_page(
+    after: int | None = None,
+    before: int | None = None,
+    limit: int = PAGE_SIZE,
+    *,
+    user_id: int | None = None,
+    rol: str | None = None,
+) -> dict:
+    """
+    Devuelve una página de certificados, del más reciente al más antiguo.
+
+    Parámetros:
+    - after: id_certificado a partir del cual continuar (página siguiente).
+    - before: id_certificado a partir del cual retroceder (página anterior).
+    - limit: número máximo de certificados por página.
+    - user_id, rol: usuario que consulta. Si se indican y el rol no es Admin, solo se
+      devuelven certificados de inspecciones de las que es laboratorista.
+
+    Retorna:
+    - Diccionario con "items" (lista de certificados, cada uno con el nombre de su
+      cliente en "nombre_cliente") y los cursores "next" y "prev".
+    """
+    with db_connection() as conn:
+        join, where, params = "", [], ()
+        if user_id is not None and not is_admin(rol):
+            # Solo certificados de inspecciones propias (idx_inspeccion_laboratorista)
+            join = "JOIN INSPECCION AS i ON i.id_inspeccion = c.id_inspeccion"
+            where, params = ["i.id_laboratorista = ?"], (user_id,)
+        return keyset_page(
+            conn,
+            f"""
+            SELECT c.*, cl.nombre AS nombre_cliente
+            FROM CERTIFICADO_CALIDAD AS c
+            {join}
+            LEFT JOIN CLIENTE AS cl ON cl.id_cliente = c.id_cliente
+            """,
+            "c.id_certificado",
+            params,
+            where=where,
+            after=after, before=before, limit=limit,
+        )
\ No newline at end of file
@@ -7,78 +7,92 @@ y generar salidas en formato JSON para ciertos datos de clientes.
 También incluye funcionalidades para desactivar o eliminar clientes según reglas personalizadas.
 """
 
-import os
 import json
-from db import db_connection
+from db import db_connection, keyset_page, PAGE_SIZE
+from services.certificate_service import invalidate_spec_cache
+
+# Parámetros configurables por instrumento: (prefijo del formulario, nombres)
+SPEC_PARAMS = {
+    "alveografo": ("alveo", ["W", "P", "L", "relacion_P_L"]),
+    "farinografo": (
+        "fari",
+        ["absorcion_de_agua", "tiempo_de_desarrollo", "estabilidad", "indice_de_tolerancia"],
+    ),
+}
+
+_UPSERT_SPEC_SQL = """
+    INSERT INTO CLIENTE_ESPECIFICACION (id_cliente, instrumento, parametro, inf, sup)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (id_cliente, instrumento, parametro)
+    DO UPDATE SET inf = excluded.inf, sup = excluded.sup
+    WHERE inf IS NOT excluded.inf OR sup IS NOT excluded.sup
+"""
+
+
+def save_client_specs(client_id: int, config: dict, conn=None) -> None:
+    """
+    Guarda las especificaciones de un cliente en CLIENTE_ESPECIFICACION.
+
+    Cada parámetro es un upsert de una sola fila; los parámetros que ya no
+    aparecen en `config` se eliminan, igual que cuando se reemplazaba la
+    entrada completa del cliente en specs.json.
+
+    Parámetros:
+    - client_id (int): ID del cliente.
+    - config (dict): {instrumento: {parametro: {"inf": x, "sup": y}}}.
+    - conn: conexión abierta a reutilizar (p. ej. dentro de create_client).
+    """
+    if conn is None:
+        with db_connection() as own_conn:
+            return save_client_specs(client_id, config, own_conn)
+
+    rows = [
+        (client_id, instrumento, parametro, limites.get("inf"), limites.get("sup"))
+        for instrumento, params in config.items()
+        for parametro, limites in params.items()
+    ]
+    conn.executemany(_UPSERT_SPEC_SQL, rows)
+
+    keep = [(r[1], r[2]) for r in rows]
+    existing = conn.execute(
+        "SELECT instrumento, parametro FROM CLIENTE_ESPECIFICACION WHERE id_cliente = ?",
+        (client_id,),
+    ).fetchall()
+    stale = [(client_id, r[0], r[1]) for r in existing if (r[0], r[1]) not in keep]
+    conn.executemany(
+        """
+        DELETE FROM CLIENTE_ESPECIFICACION
+        WHERE id_cliente = ? AND instrumento = ? AND parametro = ?
+        """,
+        stale,
+    )
 
-SPECS_PATH = os.path.join(os.path.dirname(__file__), "specs.json")
+    # Las desviaciones de este cliente deben usar los nuevos límites
+    invalidate_spec_cache(client_id)
 
-def init_specs_file():
-    """Initialize specs.json if it doesn't exist"""
-    if not os.path.exists(SPECS_PATH):
-        with open(SPECS_PATH, 'w') as f:
-            json.dump({}, f)
 
-def build_config_json(use_custom: bool, form_data: dict, client_id: int) -> str:
+def build_config_json(use_custom: bool, form_data: dict, client_id: int, conn=None) -> str:
     """Build and save client parameter configuration"""
-    init_specs_file()
-    
     config = {}
     if use_custom:
         # Process both alveografo and farinografo parameters
-        # Alveógrafo
-        alveo_params = ['W', 'P', 'L', 'relacion_P_L']
-        for param in alveo_params:
-            inf_key = f'alveo_{param}_inf'
-            sup_key = f'alveo_{param}_sup'
-            
-            if inf_key in form_data and sup_key in form_data:
-                inf_value = form_data.get(inf_key, '')
-                sup_value = form_data.get(sup_key, '')
-                
-                # Only add to config if values are provided
-                if inf_value and sup_value:
-                    if not 'alveografo' in config:
-                        config['alveografo'] = {}
-                    
-                    config['alveografo'][param] = {
-                        'inf': float(inf_value) if inf_value else 0,
-                        'sup': float(sup_value) if sup_value else 0
-                    }
-        
-        # Farinógrafo
-        fari_params = ['absorcion_de_agua', 'tiempo_de_desarrollo', 'estabilidad', 'indice_de_tolerancia']
-        for param in fari_params:
-            inf_key = f'fari_{param}_inf'
-            sup_key = f'fari_{param}_sup'
-            
-            if inf_key in form_data and sup_key in form_data:
-                inf_value = form_data.get(inf_key, '')
-                sup_value = form_data.get(sup_key, '')
-                
-                # Only add to config if values are provided
-                if inf_value and sup_value:
-                    if not 'farinografo' in config:
-                        config['farinografo'] = {}
-                    
-                    config['farinografo'][param] = {
-                        'inf': float(inf_value) if inf_value else 0,
-                        'sup': float(sup_value) if sup_value else 0
-                    }
-
-        # ATOMIC WRITE TO SPECS.JSON
-        with open(SPECS_PATH, 'r+') as f:
-            try:
-                specs = json.load(f)
-            except json.JSONDecodeError:
-                specs = {}
-            
-            specs[str(client_id)] = config
-            f.seek(0)
-            f.truncate()
-            json.dump(specs, f, indent=2)
-            f.flush()  # Force write to disk
-            os.fsync(f.fileno())  # Ensure physical write
+        for instrumento, (prefix, params) in SPEC_PARAMS.items():
+            for param in params:
+                inf_key = f'{prefix}_{param}_inf'
+                sup_key = f'{prefix}_{param}_sup'
+
+                if inf_key in form_data and sup_key in form_data:
+                    inf_value = form_data.get(inf_key, '')
+                    sup_value = form_data.get(sup_key, '')
+
+                    # Only add to config if values are provided
+                    if inf_value and sup_value:
+                        config.setdefault(instrumento, {})[param] = {
+                            'inf': float(inf_value) if inf_value else 0,
+                            'sup': float(sup_value) if sup_value else 0
+                        }
+
+        save_client_specs(client_id, config, conn)
 
     return json.dumps(config)
 
@@ -141,7 +155,9 @@ def create_client(
             return None
 
         # Construir y actualizar JSON con ID incluido
-        configuracion_json = build_config_json(use_custom_params, form_data, client_id)
+        configuracion_json = build_config_json(
+            use_custom_params, form_data, client_id, conn
+        )
         cursor.execute(
             "UPDATE CLIENTE SET configuracion_json = ? WHERE id_cliente = ?",
             (configuracion_json, client_id),
@@ -266,10 +282,15 @@ def delete_client(client_id: int) -> int:
     """
     with db_connection() as conn:
         cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM CLIENTE_ESPECIFICACION WHERE id_cliente = ?", (client_id,)
+        )
         query = "DELETE FROM CLIENTE WHERE id_cliente = ?"
         cursor.execute(query, (client_id,))
         affected_rows = cursor.rowcount
 
+    invalidate_spec_cache(client_id)
+
     return affected_rows
 
 
@@ -288,3 +309,38 @@ def list_clients() -> list:
         rows = cursor.fetchall()
 
     return [dict(row) for row in rows]
+
+
+def list_client_names() -> list:
+    """
+    Obtiene solo el id y el nombre de cada cliente, para selectores y etiquetas
+    (sin traer configuracion_json ni el resto de columnas).
+
+    Retorna:
+    - list: Diccionarios con id_cliente y nombre.
+    """
+    with db_connection() as conn:
+        rows = conn.execute("SELECT id_cliente, nombre FROM CLIENTE").fetchall()
+
+    return [dict(row) for row in rows]
+
+
+def list_clients_page(
+    after: int | None = None, before: int | None = None, limit: int = PAGE_SIZE
+) -> dict:
+    """
+    Obtiene una página de clientes, del más reciente al más antiguo.
+
+    Parámetros:
+    - after: id_cliente a partir del cual continuar (página siguiente).
+    - before: id_cliente a partir del cual retroceder (página anterior).
+    - limit: número máximo de clientes por página.
+
+    Retorna:
+    - dict: "items" con los clientes de la página y los cursores "next" y "prev".
+    """
+    with db_connection() as conn:
+        return keyset_page(
+            conn, "SELECT * FROM CLIENTE", "id_cliente",
+            after=after, before=before, limit=limit,
+        )
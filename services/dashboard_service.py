@@ -1,34 +1,105 @@
 import base64
 import io
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
 from typing import Dict, Any
 
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-import pandas as pd
+from db import db_connection, data_version
 
-from db import db_connection
+__all__ = [
+    "generate_dashboard",
+    "dashboard_data",
+    "deviated_certificates",
+    "counts_by_client",
+    "rebuild_daily_stats",
+    "chart_cache_stats",
+    "clear_chart_cache",
+]
 
-__all__ = ["generate_dashboard"]
+# "client": el navegador dibuja las gráficas con los datos de /dashboard/data.
+# "server": se renderizan con matplotlib y se incrustan como PNG.
+DASHBOARD_CHARTS = os.environ.get("DASHBOARD_CHARTS", "client")
+WINDOWS = (3, 6, 12)
+
+# Caché LRU de gráficas ya renderizadas. La llave incluye el alcance
+# (todos o un laboratorista), la ventana en meses, el contador
+# 'certificados' de VERSION_DATOS (lo incrementan los triggers de
+# CERTIFICADO_CALIDAD y de INSPECCION) y el día actual, porque las ventanas se cuentan
+# desde hoy. Una entrada vieja nunca vuelve a coincidir y sale por LRU.
+CHART_CACHE_SIZE = int(os.environ.get("CHART_CACHE_SIZE", "128"))
+
+_chart_cache: OrderedDict = OrderedDict()
+_chart_cache_lock = threading.Lock()
+_chart_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _cache_get(key):
+    with _chart_cache_lock:
+        if key in _chart_cache:
+            _chart_cache.move_to_end(key)
+            _chart_cache_stats["hits"] += 1
+            return _chart_cache[key]
+        _chart_cache_stats["misses"] += 1
+        return None
+
+
+def _cache_put(key, value) -> None:
+    with _chart_cache_lock:
+        _chart_cache[key] = value
+        _chart_cache.move_to_end(key)
+        while len(_chart_cache) > max(0, CHART_CACHE_SIZE):
+            _chart_cache.popitem(last=False)
+            _chart_cache_stats["evictions"] += 1
+
+
+def clear_chart_cache() -> None:
+    """Vacía la caché de gráficas."""
+    with _chart_cache_lock:
+        _chart_cache.clear()
+
+
+def chart_cache_stats() -> dict:
+    """Contadores de la caché de gráficas: hits, misses, evictions, size."""
+    with _chart_cache_lock:
+        return {**_chart_cache_stats, "size": len(_chart_cache)}
+
+_plt = None
+
+
+def _pyplot():
+    """
+    Importa matplotlib (backend Agg) la primera vez que se dibuja una gráfica.
+    Cargarlo al importar el módulo costaba ~0.4 s y decenas de MB por worker,
+    aunque en modo "client" nunca se use.
+    """
+    global _plt
+    if _plt is None:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        _plt = plt
+    return _plt
 
 def _fig_to_uri(fig) -> str:
     """Convierte una figura de Matplotlib en un data‑URI PNG."""
     buf = io.BytesIO()
     fig.savefig(buf, format="png", bbox_inches="tight")
-    plt.close(fig)
+    _pyplot().close(fig)
     return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode()
 
 def _bar_uri(counts: Dict[str, int], title: str) -> str:
     """Genera una gráfica de barras simple."""
-    df = pd.DataFrame(counts, index=[0]).melt()
-    df["value"] = df["value"].astype(int)
+    plt = _pyplot()
+    from matplotlib.ticker import MaxNLocator
 
     fig, ax = plt.subplots()
-    ax.bar(df["variable"], df["value"], width=0.6)
+    ax.bar(list(counts), [int(v) for v in counts.values()], width=0.6)
     ax.set_title(title)
     ax.set_ylabel("Certificados")
     
-    ax.yaxis.set_major_locator(matplotlib.ticker.MaxNLocator(integer=True))
+    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
     ax.set_ylim(bottom=0)
 
     for p in ax.patches:
@@ -43,88 +114,223 @@ def _is_manager(role: str) -> bool:
                     "Gerencia de laboratorio",
                     "Gerencia de Control de Calidad"}
 
-def count_certificados(conn, *, user_id: int, is_manager: bool, months: int) -> int:
+def deviation_summary(conn, *, user_id: int, is_manager: bool,
+                      windows=(3, 6, 12)) -> dict[int, dict[str, int]]:
+    """
+    Cuenta los certificados de cada ventana de meses agrupados por número de
+    desviaciones, en una sola pasada sobre ESTADISTICA_DIARIA (unas cuantas
+    filas por día en lugar de cada certificado).
+
+    Retorna:
+    - dict {meses: {"3+", "2", "1", "Total", "con_desviaciones"}}, donde
+      "con_desviaciones" son los certificados con texto de desviaciones.
+    """
+    windows = sorted(set(windows))
+    # Fechas de corte calculadas una vez, con la misma aritmética de SQLite
+    cutoffs = conn.execute(
+        "SELECT " + ", ".join("date('now', ?)" for _ in windows),
+        [f"-{m} months" for m in windows],
+    ).fetchone()
+
+    columns, params = [], []
+    for m, cutoff in zip(windows, cutoffs):
+        columns += [
+            f"SUM(CASE WHEN e.dia >= ? THEN e.certificados END) AS total_{m}",
+            f"SUM(CASE WHEN e.dia >= ? THEN e.desv_1 END) AS d1_{m}",
+            f"SUM(CASE WHEN e.dia >= ? THEN e.desv_2 END) AS d2_{m}",
+            f"SUM(CASE WHEN e.dia >= ? THEN e.desv_3mas END) AS d3_{m}",
+            f"SUM(CASE WHEN e.dia >= ? THEN e.con_desviaciones END) AS texto_{m}",
+        ]
+        params += [cutoff] * 5
+
     sql = """
-        SELECT COUNT(*) AS total
-        FROM   CERTIFICADO_CALIDAD  AS c
-        JOIN   INSPECCION           AS i USING (id_inspeccion)
-        WHERE  c.fecha_envio >= date('now', ?)
+        SELECT {columns}
+        FROM   ESTADISTICA_DIARIA AS e
+        WHERE  e.dia >= ?
         {where}
-    """.format(where="" if is_manager else "AND i.id_laboratorista = ?")
-    
-    params = [f"-{months} months"]
+    """.format(columns=",\n               ".join(columns),
+               where="" if is_manager else "AND e.id_laboratorista = ?")
+    params.append(min((c for c in cutoffs if c), default=None))
     if not is_manager:
         params.append(user_id)
-    
-    return conn.execute(sql, params).fetchone()["total"]
+
+    row = conn.execute(sql, params).fetchone()
+    return {
+        m: {
+            "3+": row[f"d3_{m}"] or 0,
+            "2": row[f"d2_{m}"] or 0,
+            "1": row[f"d1_{m}"] or 0,
+            "Total": row[f"total_{m}"] or 0,
+            "con_desviaciones": row[f"texto_{m}"] or 0,
+        }
+        for m in windows
+    }
+
+def count_certificados(conn, *, user_id: int, is_manager: bool, months: int) -> int:
+    return deviation_summary(conn, user_id=user_id, is_manager=is_manager,
+                             windows=(months,))[months]["Total"]
 
 def count_desviaciones(conn, *, user_id: int, is_manager: bool, months: int) -> int:
+    return deviation_summary(conn, user_id=user_id, is_manager=is_manager,
+                             windows=(months,))[months]["con_desviaciones"]
+
+def counts_by_dev(conn, *, user_id: int, is_manager: bool, months: int) -> dict[str, int]:
+    summary = deviation_summary(conn, user_id=user_id, is_manager=is_manager,
+                                windows=(months,))[months]
+    return {k: summary[k] for k in ("3+", "2", "1", "Total")}
+
+def deviated_certificates(conn, *, user_id: int, is_manager: bool, months: int) -> list[dict]:
+    """Certificados con desviaciones del periodo, con el nombre del cliente."""
     sql = """
-        SELECT COUNT(*) AS total
+        SELECT c.*, i.id_laboratorista, cl.nombre AS nombre_cliente
         FROM   CERTIFICADO_CALIDAD AS c
-        JOIN   INSPECCION         AS i USING (id_inspeccion)
+        JOIN   INSPECCION          AS i USING (id_inspeccion)
+        LEFT JOIN CLIENTE          AS cl ON cl.id_cliente = c.id_cliente
         WHERE  c.fecha_envio >= date('now', ?)
-        AND   LENGTH(TRIM(c.desviaciones)) > 0
+        AND    LENGTH(TRIM(c.desviaciones)) > 0
         {where}
+        ORDER BY c.fecha_envio DESC, c.id_certificado DESC
     """.format(where="" if is_manager else "AND i.id_laboratorista = ?")
-    
-    params = [f"-{months} months"]
+    params: list[Any] = [f"-{months} months"]
     if not is_manager:
         params.append(user_id)
-    
-    return conn.execute(sql, params).fetchone()["total"]
+    return [dict(row) for row in conn.execute(sql, params).fetchall()]
 
-def counts_by_dev(conn, *, user_id: int, is_manager: bool, months: int) -> dict[str, int]:
+
+def counts_by_client(conn, *, user_id: int, is_manager: bool, months: int) -> list[dict]:
+    """Certificados y certificados con desviaciones del periodo, por cliente."""
     sql = """
-        SELECT c.desviaciones
-        FROM   CERTIFICADO_CALIDAD AS c
-        JOIN   INSPECCION         AS i USING (id_inspeccion)
-        WHERE  c.fecha_envio >= date('now', ?)
-    """
+        SELECT e.id_cliente,
+               cl.nombre AS nombre,
+               SUM(e.certificados) AS certificados,
+               SUM(e.con_desviaciones) AS desviaciones
+        FROM   ESTADISTICA_DIARIA AS e
+        LEFT JOIN CLIENTE        AS cl ON cl.id_cliente = e.id_cliente
+        WHERE  e.dia >= date('now', ?)
+        {where}
+        GROUP BY e.id_cliente
+        ORDER BY certificados DESC, e.id_cliente
+    """.format(where="" if is_manager else "AND e.id_laboratorista = ?")
     params: list[Any] = [f"-{months} months"]
-
     if not is_manager:
-        sql += " AND i.id_laboratorista = ?"
         params.append(user_id)
+    return [dict(row) for row in conn.execute(sql, params).fetchall()]
 
-    df = pd.read_sql_query(sql, conn, params=params)
 
-    df["dev_int"] = df["desviaciones"].apply(
-        lambda t: len([x for x in (t or "").split(",") if x.strip()])
-    )
+def rebuild_daily_stats(conn=None) -> int:
+    """
+    Reconstruye ESTADISTICA_DIARIA desde CERTIFICADO_CALIDAD (los triggers la
+    mantienen al día; esto es para cargas iniciales o reparaciones).
+
+    Retorna:
+    - int: Número de filas del resumen.
+    """
+    if conn is None:
+        with db_connection() as own_conn:
+            return rebuild_daily_stats(own_conn)
+    conn.execute("DELETE FROM ESTADISTICA_DIARIA")
+    conn.execute("""
+        INSERT INTO ESTADISTICA_DIARIA
+        SELECT IFNULL(c.fecha_envio, ''), IFNULL(i.id_laboratorista, 0), c.id_cliente,
+               COUNT(*),
+               SUM(IFNULL(LENGTH(TRIM(c.desviaciones)) > 0, 0)),
+               SUM(c.num_desviaciones = 0), SUM(c.num_desviaciones = 1),
+               SUM(c.num_desviaciones = 2), SUM(c.num_desviaciones >= 3)
+        FROM CERTIFICADO_CALIDAD AS c
+        JOIN INSPECCION AS i USING (id_inspeccion)
+        GROUP BY 1, 2, 3
+    """)
+    return conn.execute("SELECT COUNT(*) FROM ESTADISTICA_DIARIA").fetchone()[0]
 
-    return {
-        "3+": (df["dev_int"] >= 3).sum(),
-        "2":  (df["dev_int"] == 2).sum(),
-        "1":  (df["dev_int"] == 1).sum(),
-        "Total": len(df),
-    }
 
-def generate_dashboard(user, months=12) -> dict:
-    """Genera los datos del dashboard con filtro de tiempo."""
+def _data_stamp(conn) -> tuple:
+    """
+    Parte de la llave de caché que cambia con los datos: las versiones de
+    certificados y clientes (el dashboard muestra nombres de cliente) y el día,
+    porque las ventanas de meses se mueven aunque no haya escrituras.
+    """
+    return (data_version("certificados", conn), data_version("clientes", conn),
+            date.today().isoformat())
+
+
+def dashboard_data(user, months=12) -> dict:
+    """
+    Datos completos del dashboard en forma serializable a JSON.
+
+    Retorna:
+    - dict con "meses", "certificados", "desviaciones" (totales del periodo),
+      "series" ({"3"|"6"|"12": {"1", "2", "3+", "Total"}}), "clientes"
+      (conteos por cliente) y "certificados_con_desviaciones".
+    """
+    is_manager = _is_manager(user.rol)
+    scope = "todos" if is_manager else user.id
+    with db_connection() as conn:
+        stamp = _data_stamp(conn)
+        key = ("datos", scope, months) + stamp
+        data = _cache_get(key)
+        if data is not None:
+            return data
+
+        summary = deviation_summary(conn, user_id=user.id, is_manager=is_manager,
+                                    windows=WINDOWS + (months,))
+        data = {
+            "meses": months,
+            "certificados": summary[months]["Total"],
+            "desviaciones": summary[months]["con_desviaciones"],
+            "series": {
+                str(m): {k: summary[m][k] for k in ("1", "2", "3+", "Total")}
+                for m in WINDOWS
+            },
+            "clientes": counts_by_client(conn, user_id=user.id,
+                                         is_manager=is_manager, months=months),
+            "certificados_con_desviaciones": [
+                {k: cert[k] for k in ("id_certificado", "id_cliente", "nombre_cliente",
+                                      "id_inspeccion", "fecha_envio", "desviaciones",
+                                      "num_desviaciones")}
+                for cert in deviated_certificates(conn, user_id=user.id,
+                                                  is_manager=is_manager, months=months)
+            ],
+        }
+    _cache_put(key, data)
+    return data
+
+
+def generate_dashboard(user, months=12, render_charts=True) -> dict:
+    """
+    Genera los datos del dashboard con filtro de tiempo.
+
+    Con render_charts=False no se usa matplotlib: las gráficas las dibuja el
+    navegador a partir de dashboard_data().
+    """
     is_manager = _is_manager(user.rol)
+    scope = "todos" if is_manager else user.id
+    windows = WINDOWS if render_charts else ()
     with db_connection() as conn:
-        result = {}
-        
-        # Obtener datos dinámicos basados en el periodo seleccionado
-        result.update({
-            "certificados_total": count_certificados(conn,
-                                                   user_id=user.id,
-                                                   is_manager=is_manager,
-                                                   months=months),
-            "desviaciones_total": count_desviaciones(conn,
-                                                   user_id=user.id,
-                                                   is_manager=is_manager,
-                                                   months=months),
-        })
-        
-        # Generar gráficas para los períodos fijos (3, 6, 12 meses)
-        for m in (3, 6, 12):
-            result[f"bar{m}_uri"] = _bar_uri(
-                counts_by_dev(conn,
-                            user_id=user.id,
-                            is_manager=is_manager,
-                            months=m),
-                f"Desviaciones en últimos {m} meses"
-            )
-        return result
\ No newline at end of file
+        stamp = _data_stamp(conn)
+
+        totales = _cache_get(("totales", scope, months) + stamp)
+        bars = {m: _cache_get(("bar", scope, m) + stamp) for m in windows}
+        if totales is None or None in bars.values():
+            # Una sola consulta para el periodo seleccionado y las gráficas fijas
+            summary = deviation_summary(conn,
+                                        user_id=user.id,
+                                        is_manager=is_manager,
+                                        windows=windows + (months,))
+
+    # Obtener datos dinámicos basados en el periodo seleccionado
+    if totales is None:
+        totales = {
+            "certificados_total": summary[months]["Total"],
+            "desviaciones_total": summary[months]["con_desviaciones"],
+        }
+        _cache_put(("totales", scope, months) + stamp, totales)
+    result = dict(totales)
+
+    # Generar gráficas para los períodos fijos (3, 6, 12 meses)
+    for m in windows:
+        if bars[m] is None:
+            counts = {k: summary[m][k] for k in ("3+", "2", "1", "Total")}
+            bars[m] = _bar_uri(counts, f"Desviaciones en últimos {m} meses")
+            _cache_put(("bar", scope, m) + stamp, bars[m])
+        result[f"bar{m}_uri"] = bars[m]
+    return result
@@ -1,6 +1,389 @@
 """
-Servicio de Emisión (Implementación Futura)
+Servicio de Emisión
 
-Este servicio se encargará de la generación de PDFs y el envío de correos electrónicos relacionados con certificaciones.
-El objetivo es automatizar la generación de documentos y la distribución por correo electrónico basada en los datos almacenados.
+Genera el PDF de cada certificado y lo envía por correo fuera del ciclo de
+la petición HTTP. La ruta de creación solo registra el certificado y encola
+un trabajo en EMISION_TRABAJO; un grupo de hilos worker procesa la cola en
+dos etapas:
+
+- render: genera services/certificados/certificado_{id}.pdf en el pool de
+          procesos de pdf_service, o reutiliza el PDF guardado en pdf_store
+          si los datos del certificado no cambiaron.
+- envio:  manda el PDF al cliente y al almacén (mail_service). Con
+          MAIL_BATCH=1, los envíos del lote para un mismo destinatario
+          salen juntos en un solo correo.
+
+Cada etapa se reintenta con espera exponencial hasta MAX_ATTEMPTS veces.
+La cola vive en SQLite, así que los trabajos sobreviven a reinicios.
 """
+
+import os
+import threading
+import time
+
+from db import db_connection
+from services import mail_service, pdf_service, pdf_store
+from services.certificate_service import get_certificate
+from services.mail_service import send_certificate, send_certificates
+
+__all__ = [
+    "enqueue_emission",
+    "wake_workers",
+    "resend_certificate",
+    "get_job",
+    "emission_status",
+    "process_next_job",
+    "process_next_jobs",
+    "recover_stale_jobs",
+    "start_workers",
+    "stop_workers",
+]
+
+CERTS_DIR = os.path.join(os.path.dirname(__file__), "certificados")
+
+EMISSION_WORKERS = int(os.environ.get("EMISSION_WORKERS", "2"))
+MAX_ATTEMPTS = int(os.environ.get("EMISSION_MAX_ATTEMPTS", "5"))
+RETRY_BASE_DELAY = 30  # segundos; se duplica en cada intento fallido
+POLL_INTERVAL = 5.0  # segundos entre revisiones de la cola sin avisos
+STALE_AFTER = 600  # segundos en 'en_proceso' antes de considerar muerto al worker
+RECOVER_INTERVAL = 60.0  # segundos entre búsquedas de trabajos abandonados
+# Trabajos que toma cada worker por vuelta; los renders del lote se reparten
+# entre los procesos de pdf_service, así una ráfaga usa todos los núcleos.
+# Con envío agrupado se toman al menos MAIL_BATCH_MAX para poder juntarlos.
+CLAIM_BATCH = max(
+    1,
+    pdf_service.PDF_WORKERS,
+    mail_service.MAIL_BATCH_MAX if mail_service.MAIL_BATCH else 1,
+)
+
+_wake = threading.Event()
+_stop = threading.Event()
+_workers: list[threading.Thread] = []
+_recover_lock = threading.Lock()
+_last_recover = 0.0
+
+
+# ---------------------------------------------------------------------------
+# COLA
+# ---------------------------------------------------------------------------
+
+def enqueue_emission(id_certificado: int, conn=None) -> int:
+    """
+    Encola la emisión (render + envío) de un certificado y devuelve el id del trabajo.
+
+    Con `conn`, el trabajo se inserta en la transacción de quien llama (p. ej.
+    junto con el certificado); al confirmarla hay que llamar a wake_workers().
+    """
+    if conn is None:
+        with db_connection() as own_conn:
+            job_id = enqueue_emission(id_certificado, own_conn)
+        wake_workers()
+        return job_id
+    cursor = conn.execute(
+        "INSERT INTO EMISION_TRABAJO (id_certificado) VALUES (?)", (id_certificado,)
+    )
+    return cursor.lastrowid
+
+
+def wake_workers() -> None:
+    """Avisa a los workers que hay trabajos nuevos, sin esperar a POLL_INTERVAL."""
+    _wake.set()
+
+
+def resend_certificate(id_certificado: int) -> int:
+    """
+    Encola un reenvío del certificado. Si sus datos no cambiaron, la etapa de
+    render toma el PDF de pdf_store en lugar de volver a generarlo.
+
+    Excepciones:
+    - LookupError si el certificado no existe.
+    """
+    if get_certificate(id_certificado) is None:
+        raise LookupError(f"El certificado #{id_certificado} no existe")
+    return enqueue_emission(id_certificado)
+
+
+def get_job(id_trabajo: int) -> dict | None:
+    """Devuelve un trabajo de emisión por su id, o None si no existe."""
+    with db_connection() as conn:
+        row = conn.execute(
+            "SELECT * FROM EMISION_TRABAJO WHERE id_trabajo = ?", (id_trabajo,)
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def emission_status(ids_certificado: list[int]) -> dict[int, dict]:
+    """
+    Último trabajo de emisión de cada certificado indicado.
+
+    Retorna:
+    - dict {id_certificado: {"id_trabajo", "etapa", "estado", "intentos", "ultimo_error"}}.
+      Los certificados sin trabajo no aparecen.
+    """
+    if not ids_certificado:
+        return {}
+    placeholders = ", ".join("?" for _ in ids_certificado)
+    with db_connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT t.id_certificado, t.id_trabajo, t.etapa, t.estado,
+                   t.intentos, t.ultimo_error
+            FROM EMISION_TRABAJO t
+            WHERE t.id_certificado IN ({placeholders})
+              AND t.id_trabajo = (
+                  SELECT MAX(id_trabajo) FROM EMISION_TRABAJO
+                  WHERE id_certificado = t.id_certificado
+              )
+            """,
+            list(ids_certificado),
+        ).fetchall()
+    return {row["id_certificado"]: dict(row) for row in rows}
+
+
+def _claim_jobs(limit: int = 1) -> list[dict]:
+    """Marca como 'en_proceso' hasta `limit` trabajos disponibles (atómico entre workers)."""
+    with db_connection() as conn:
+        rows = conn.execute(
+            """
+            UPDATE EMISION_TRABAJO
+            SET estado = 'en_proceso', actualizado_en = datetime('now')
+            WHERE id_trabajo IN (
+                SELECT id_trabajo FROM EMISION_TRABAJO
+                WHERE estado = 'pendiente' AND disponible_en <= datetime('now')
+                ORDER BY id_trabajo
+                LIMIT ?
+            )
+            RETURNING *
+            """,
+            (limit,),
+        ).fetchall()
+    return sorted((dict(r) for r in rows), key=lambda j: j["id_trabajo"])
+
+
+def _advance(job: dict, archivo_pdf: str) -> None:
+    """Render terminado: pasa el trabajo a la etapa de envío."""
+    with db_connection() as conn:
+        conn.execute(
+            """
+            UPDATE EMISION_TRABAJO
+            SET etapa = 'envio', estado = 'pendiente', intentos = 0,
+                ultimo_error = NULL, archivo_pdf = ?,
+                disponible_en = datetime('now'), actualizado_en = datetime('now')
+            WHERE id_trabajo = ?
+            """,
+            (archivo_pdf, job["id_trabajo"]),
+        )
+
+
+def _complete(job: dict) -> None:
+    with db_connection() as conn:
+        conn.execute(
+            """
+            UPDATE EMISION_TRABAJO
+            SET estado = 'enviado', ultimo_error = NULL, actualizado_en = datetime('now')
+            WHERE id_trabajo = ?
+            """,
+            (job["id_trabajo"],),
+        )
+
+
+def _fail(job: dict, error: Exception) -> None:
+    """Registra el error y reprograma la etapa, o la marca como fallida."""
+    intentos = job["intentos"] + 1
+    estado = "fallido" if intentos >= MAX_ATTEMPTS else "pendiente"
+    delay = RETRY_BASE_DELAY * 2 ** (intentos - 1)
+    with db_connection() as conn:
+        conn.execute(
+            """
+            UPDATE EMISION_TRABAJO
+            SET estado = ?, intentos = ?, ultimo_error = ?,
+                disponible_en = datetime('now', ?), actualizado_en = datetime('now')
+            WHERE id_trabajo = ?
+            """,
+            (estado, intentos, str(error), f"+{delay} seconds", job["id_trabajo"]),
+        )
+
+
+def recover_stale_jobs(older_than: int = STALE_AFTER) -> int:
+    """Devuelve a 'pendiente' los trabajos que un worker caído dejó 'en_proceso'."""
+    with db_connection() as conn:
+        cursor = conn.execute(
+            """
+            UPDATE EMISION_TRABAJO
+            SET estado = 'pendiente', actualizado_en = datetime('now')
+            WHERE estado = 'en_proceso' AND actualizado_en <= datetime('now', ?)
+            """,
+            (f"-{int(older_than)} seconds",),
+        )
+        return cursor.rowcount
+
+
+# ---------------------------------------------------------------------------
+# ETAPAS
+# ---------------------------------------------------------------------------
+
+def _write_pdf(id_certificado: int, pdf_bytes: bytes) -> str:
+    """Guarda el PDF de forma atómica (el envío nunca ve un archivo a medias)."""
+    os.makedirs(CERTS_DIR, exist_ok=True)
+    pdf_filename = f"certificado_{id_certificado}.pdf"
+    pdf_path = os.path.join(CERTS_DIR, pdf_filename)
+    tmp_path = f"{pdf_path}.tmp"
+    with open(tmp_path, "wb") as pdf_file:
+        pdf_file.write(pdf_bytes)
+    os.replace(tmp_path, pdf_path)
+    return pdf_filename
+
+
+def render_certificate_pdf(cert: dict) -> str:
+    """Genera (o toma de pdf_store) el PDF del certificado y devuelve el nombre del archivo."""
+    result = pdf_store.render_cached([cert])[0]
+    if isinstance(result, Exception):
+        raise result
+    return _write_pdf(cert["id_certificado"], result)
+
+
+def _run_render_stage(jobs: list[dict]) -> None:
+    """
+    Renderiza en paralelo los trabajos del lote que están en etapa 'render';
+    los que ya tienen su PDF en pdf_store no pasan por el pool.
+    """
+    certs = []
+    for job in jobs:
+        cert = get_certificate(job["id_certificado"])
+        if cert is None:
+            _fail(job, LookupError(f"El certificado #{job['id_certificado']} ya no existe"))
+        else:
+            certs.append((job, cert))
+    if not certs:
+        return
+
+    try:
+        results = pdf_store.render_cached([c for _, c in certs])
+    except Exception as e:  # El pool mismo falló: reintentar todo el lote
+        results = [e] * len(certs)
+
+    for (job, cert), result in zip(certs, results):
+        try:
+            if isinstance(result, Exception):
+                raise result
+            _advance(job, _write_pdf(cert["id_certificado"], result))
+        except Exception as e:
+            print(f"Emisión #{job['id_trabajo']} (render) falló: {e}")
+            _fail(job, e)
+
+
+def _send_groups(ready: list[tuple[dict, dict]]) -> list[list[tuple[dict, dict]]]:
+    """Agrupa por destinatario (hasta MAIL_BATCH_MAX) si MAIL_BATCH está activo."""
+    if not mail_service.MAIL_BATCH:
+        return [[item] for item in ready]
+    by_to: dict[str, list] = {}
+    for job, cert in ready:
+        by_to.setdefault(cert["destinatario_correo"], []).append((job, cert))
+    size = max(1, mail_service.MAIL_BATCH_MAX)
+    return [
+        items[i:i + size] for items in by_to.values() for i in range(0, len(items), size)
+    ]
+
+
+def _run_send_stage(jobs: list[dict]) -> None:
+    """Envía los PDFs de los trabajos del lote que están en etapa 'envio'."""
+    ready = []
+    for job in jobs:
+        cert = get_certificate(job["id_certificado"])
+        if cert is None:
+            _fail(job, LookupError(f"El certificado #{job['id_certificado']} ya no existe"))
+        else:
+            ready.append((job, cert))
+
+    for group in _send_groups(ready):
+        destinatario = group[0][1]["destinatario_correo"]
+        try:
+            if len(group) == 1:
+                send_certificate(destinatario, group[0][0]["archivo_pdf"])
+            else:
+                send_certificates(destinatario, [job["archivo_pdf"] for job, _ in group])
+        except Exception as e:
+            for job, _ in group:
+                print(f"Emisión #{job['id_trabajo']} (envio) falló: {e}")
+                _fail(job, e)
+            continue
+        for job, _ in group:
+            _complete(job)
+
+
+def process_next_jobs(limit: int = CLAIM_BATCH) -> int:
+    """
+    Toma hasta `limit` trabajos de la cola y ejecuta su etapa actual.
+    Los renders del lote se hacen en paralelo; los envíos, por destinatario.
+
+    Retorna:
+    - int: Número de trabajos procesados (con o sin éxito).
+    """
+    jobs = _claim_jobs(limit)
+    _run_render_stage([j for j in jobs if j["etapa"] == "render"])
+    _run_send_stage([j for j in jobs if j["etapa"] == "envio"])
+    return len(jobs)
+
+
+def process_next_job() -> bool:
+    """
+    Toma un trabajo de la cola y ejecuta su etapa actual.
+
+    Retorna:
+    - bool: True si se procesó un trabajo (con o sin éxito), False si la cola estaba vacía.
+    """
+    return process_next_jobs(1) > 0
+
+
+# ---------------------------------------------------------------------------
+# WORKERS
+# ---------------------------------------------------------------------------
+
+def _recover_if_due() -> None:
+    """
+    Reencola trabajos abandonados como máximo cada RECOVER_INTERVAL segundos
+    (entre todos los workers del proceso), no solo al arrancar: un hilo que
+    muere a mitad de un trabajo lo deja 'en_proceso' mientras el proceso sigue vivo.
+    """
+    global _last_recover
+    now = time.monotonic()
+    with _recover_lock:
+        if now - _last_recover < RECOVER_INTERVAL:
+            return
+        _last_recover = now
+    recover_stale_jobs(STALE_AFTER)
+
+
+def _worker_loop() -> None:
+    while not _stop.is_set():
+        try:
+            _recover_if_due()
+            if process_next_jobs():
+                continue
+        except Exception as e:  # Errores de BD: no matar el hilo
+            print(f"Error en worker de emisión: {e}")
+        _wake.wait(POLL_INTERVAL)
+        _wake.clear()
+
+
+def start_workers(count: int = EMISSION_WORKERS) -> int:
+    """Arranca los hilos worker de emisión (una sola vez por proceso)."""
+    global _last_recover
+    if _workers or count <= 0:
+        return 0
+    _stop.clear()
+    _last_recover = 0.0  # La primera vuelta busca trabajos abandonados
+    for n in range(count):
+        t = threading.Thread(target=_worker_loop, name=f"emision-{n}", daemon=True)
+        t.start()
+        _workers.append(t)
+    return count
+
+
+def stop_workers(timeout: float = 5.0) -> None:
+    """Detiene los workers después de terminar el trabajo en curso."""
+    _stop.set()
+    _wake.set()
+    for t in _workers:
+        t.join(timeout)
+    _workers.clear()
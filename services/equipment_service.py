@@ -6,7 +6,7 @@ Permite recuperar todos los equipos, obtener un equipo por ID, actualizar su inf
 así como marcar un equipo como inactivo (dar de baja) asignándole una causa de baja.
 """
 
-from db import db_connection
+from db import db_connection, keyset_page, PAGE_SIZE
 
 
 def create_equipment(
@@ -223,6 +223,27 @@ def list_equipment() -> list:
     return [dict(row) for row in rows]
 
 
+def list_equipment_page(
+    after: int | None = None, before: int | None = None, limit: int = PAGE_SIZE
+) -> dict:
+    """
+    Obtiene una página de equipos, del más reciente al más antiguo.
+
+    Parámetros:
+    - after: id_equipo a partir del cual continuar (página siguiente).
+    - before: id_equipo a partir del cual retroceder (página anterior).
+    - limit: número máximo de equipos por página.
+
+    Retorna:
+    - dict: "items" con los equipos de la página y los cursores "next" y "prev".
+    """
+    with db_connection() as conn:
+        return keyset_page(
+            conn, "SELECT * FROM EQUIPO_LABORATORIO", "id_equipo",
+            after=after, before=before, limit=limit,
+        )
+
+
 def deactivate_equipment(id_equipo: int, causa_baja: str) -> int:
     """
     Marca un equipo como inactivo en la base de datos y almacena la razón de baja.
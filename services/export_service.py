@@ -0,0 +1,184 @@
+"""
+Servicio de Exportación
+
+Exporta certificados e inspecciones a CSV en streaming: la consulta se lee
+con fetchmany en bloques de EXPORT_FETCH filas y cada bloque se convierte
+en texto CSV y se entrega antes de leer el siguiente, así exportar años de
+historia usa memoria constante.
+
+Los resultados (resultados_analisis / parametros_analizados) se aplanan en
+una columna por parámetro. El CSV lleva BOM UTF-8 para que Excel respete
+los acentos, y el de inspecciones usa los mismos encabezados que acepta
+import_service, de modo que puede volver a importarse.
+"""
+
+import csv
+import io
+import os
+
+from db import db_connection
+from services.certificate_service import KNOWN_PARAMS
+from services.inspection_service import is_admin
+from services.parameters_service import flatten_parametros
+
+# Filas leídas del cursor (y escritas al CSV) por bloque
+EXPORT_FETCH = int(os.environ.get("EXPORT_FETCH", "1000"))
+
+BOM = "\ufeff"
+
+# Una columna por parámetro, en el orden del certificado
+PARAMETROS = tuple(KNOWN_PARAMS)
+
+COLUMNAS_CERTIFICADO = (
+    "id_certificado", "id_cliente", "nombre_cliente", "id_inspeccion", "numero_lote",
+    "id_laboratorista", "secuencia_inspeccion", "orden_compra", "cantidad_solicitada",
+    "cantidad_entregada", "numero_factura", "fecha_envio", "fecha_caducidad",
+    "compara_referencias", "desviaciones", "destinatario_correo",
+)
+
+COLUMNAS_INSPECCION = (
+    "id_inspeccion", "numero_lote", "fecha", "id_equipo", "secuencia",
+    "tipo_inspeccion", "id_laboratorista",
+)
+
+
+def _filtros(
+    columna_fecha: str,
+    desde: str | None,
+    hasta: str | None,
+    id_cliente: int | None,
+    id_laboratorista: int | None,
+) -> tuple[list[str], list]:
+    where, params = [], []
+    if desde:
+        where.append(f"{columna_fecha} >= ?")
+        params.append(desde)
+    if hasta:
+        where.append(f"{columna_fecha} <= ?")
+        params.append(hasta)
+    if id_cliente is not None:
+        where.append(
+            "EXISTS (SELECT 1 FROM CERTIFICADO_CALIDAD AS cc "
+            "WHERE cc.id_inspeccion = i.id_inspeccion AND cc.id_cliente = ?)"
+        )
+        params.append(id_cliente)
+    if id_laboratorista is not None:
+        where.append("i.id_laboratorista = ?")
+        params.append(id_laboratorista)
+    return where, params
+
+
+def _alcance(id_laboratorista, user_id, rol):
+    """Los usuarios que no son Admin solo exportan sus propias inspecciones."""
+    if user_id is not None and not is_admin(rol):
+        return user_id
+    return id_laboratorista
+
+
+def _csv_stream(sql: str, params: list, columnas: tuple, fetch: int):
+    """
+    Ejecuta la consulta y entrega el CSV por bloques. La última columna de
+    cada fila es el JSON de resultados, que se reemplaza por un valor por
+    parámetro.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columnas + PARAMETROS)
+    yield BOM + buffer.getvalue()
+
+    # La conexión se toma al empezar a leer y vuelve al pool cuando el
+    # generador termina o el cliente corta la descarga (close()).
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None  # Tuplas: no hace falta sqlite3.Row
+        cursor.execute(sql, params)
+        while True:
+            filas = cursor.fetchmany(fetch)
+            if not filas:
+                break
+            buffer.seek(0)
+            buffer.truncate()
+            for *valores, resultados in filas:
+                plano = flatten_parametros(resultados)
+                writer.writerow(valores + [plano.get(p) for p in PARAMETROS])
+            yield buffer.getvalue()
+
+
+def export_certificates_csv(
+    *,
+    desde: str | None = None,
+    hasta: str | None = None,
+    id_cliente: int | None = None,
+    id_laboratorista: int | None = None,
+    user_id: int | None = None,
+    rol: str | None = None,
+    fetch: int | None = None,
+):
+    """
+    Genera el CSV de certificados, en orden de id_certificado.
+
+    Parámetros:
+    - desde, hasta: rango de fecha_envio (fechas ISO, inclusive).
+    - id_cliente: solo certificados de este cliente.
+    - id_laboratorista: solo certificados de inspecciones de este laboratorista.
+    - user_id, rol: usuario que exporta; si no es Admin se limita a sus inspecciones.
+    - fetch: filas por bloque (EXPORT_FETCH por defecto).
+
+    Retorna:
+    - Generador de fragmentos de texto CSV (el primero es el encabezado).
+    """
+    where, params = _filtros(
+        "c.fecha_envio", desde, hasta, None, _alcance(id_laboratorista, user_id, rol)
+    )
+    if id_cliente is not None:
+        where.append("c.id_cliente = ?")
+        params.append(id_cliente)
+    sql = f"""
+        SELECT c.id_certificado, c.id_cliente, cl.nombre, c.id_inspeccion, i.numero_lote,
+               i.id_laboratorista, c.secuencia_inspeccion, c.orden_compra,
+               c.cantidad_solicitada, c.cantidad_entregada, c.numero_factura,
+               c.fecha_envio, c.fecha_caducidad, c.compara_referencias, c.desviaciones,
+               c.destinatario_correo, c.resultados_analisis
+        FROM CERTIFICADO_CALIDAD AS c
+        LEFT JOIN CLIENTE AS cl ON cl.id_cliente = c.id_cliente
+        LEFT JOIN INSPECCION AS i ON i.id_inspeccion = c.id_inspeccion
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY c.id_certificado
+    """
+    return _csv_stream(sql, params, COLUMNAS_CERTIFICADO, fetch or EXPORT_FETCH)
+
+
+def export_inspections_csv(
+    *,
+    desde: str | None = None,
+    hasta: str | None = None,
+    id_cliente: int | None = None,
+    id_laboratorista: int | None = None,
+    user_id: int | None = None,
+    rol: str | None = None,
+    fetch: int | None = None,
+):
+    """
+    Genera el CSV de inspecciones, en orden de id_inspeccion.
+
+    Parámetros:
+    - desde, hasta: rango de fecha de la inspección (fechas ISO, inclusive).
+    - id_cliente: solo inspecciones con algún certificado para este cliente.
+    - id_laboratorista: solo inspecciones de este laboratorista.
+    - user_id, rol: usuario que exporta; si no es Admin se limita a sus inspecciones.
+    - fetch: filas por bloque (EXPORT_FETCH por defecto).
+
+    Retorna:
+    - Generador de fragmentos de texto CSV (el primero es el encabezado).
+    """
+    where, params = _filtros(
+        "i.fecha", desde, hasta, id_cliente, _alcance(id_laboratorista, user_id, rol)
+    )
+    sql = f"""
+        SELECT i.id_inspeccion, i.numero_lote, i.fecha, i.id_equipo, i.secuencia,
+               i.tipo_inspeccion, i.id_laboratorista, i.parametros_analizados
+        FROM INSPECCION AS i
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY i.id_inspeccion
+    """
+    return _csv_stream(sql, params, COLUMNAS_INSPECCION, fetch or EXPORT_FETCH)
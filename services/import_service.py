@@ -0,0 +1,271 @@
+"""
+Servicio de Importación de Inspecciones
+
+Carga por lotes las exportaciones CSV/TSV del alveógrafo y del farinógrafo:
+cada fila es un lote analizado y se convierte en una inspección con sus
+parámetros (INSPECCION + PARAMETRO_ANALISIS), igual que una alta desde el
+formulario de /inspections/create.
+
+El archivo se procesa fila por fila (no se carga completo en memoria) y se
+inserta en bloques de IMPORT_CHUNK filas, cada bloque en una sola
+transacción con executemany. Las filas inválidas no detienen la carga: se
+reportan con su número de línea y el motivo.
+"""
+
+import csv
+import json
+import math
+import os
+import re
+import unicodedata
+from datetime import date, datetime
+from itertools import chain, islice
+
+from db import db_connection
+
+# Filas por transacción: bloques grandes amortizan el commit, pero un bloque
+# retiene el bloqueo de escritura de SQLite mientras se inserta.
+IMPORT_CHUNK = int(os.environ.get("IMPORT_CHUNK", "2000"))
+
+# Errores conservados en el reporte (el conteo total siempre es exacto)
+MAX_ERRORES = int(os.environ.get("IMPORT_MAX_ERRORES", "1000"))
+
+# Encabezado normalizado -> columna de INSPECCION
+COLUMNAS = {
+    "numero_lote": "numero_lote", "lote": "numero_lote", "lot": "numero_lote",
+    "fecha": "fecha", "date": "fecha", "fecha_analisis": "fecha",
+    "secuencia": "secuencia", "seq": "secuencia",
+    "tipo_inspeccion": "tipo_inspeccion", "tipo": "tipo_inspeccion",
+    "id_equipo": "id_equipo", "equipo": "id_equipo",
+    "id_laboratorista": "id_laboratorista", "laboratorista": "id_laboratorista",
+}
+
+# Encabezado normalizado -> parámetro (mismos nombres que valor_* del formulario)
+PARAMETROS = {
+    # Alveógrafo
+    "w": "W", "p": "P", "l": "L",
+    "relacion_p_l": "relacion_P_L", "p_l": "relacion_P_L", "pl": "relacion_P_L",
+    # Farinógrafo
+    "absorcion_de_agua": "absorcion_de_agua", "absorcion": "absorcion_de_agua",
+    "tiempo_de_desarrollo": "tiempo_de_desarrollo", "tiempo_desarrollo": "tiempo_de_desarrollo",
+    "desarrollo": "tiempo_de_desarrollo",
+    "estabilidad": "estabilidad",
+    "indice_de_tolerancia": "indice_de_tolerancia", "tolerancia": "indice_de_tolerancia",
+    "mti": "indice_de_tolerancia",
+}
+
+_FORMATOS_FECHA = ("%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d")
+
+_INSERT_INSPECCION = """
+    INSERT INTO INSPECCION (
+        id_inspeccion, numero_lote, fecha, id_equipo, secuencia,
+        tipo_inspeccion, parametros_analizados, id_laboratorista
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_INSERT_PARAMETRO = """
+    INSERT INTO PARAMETRO_ANALISIS (
+        id_inspeccion, id_equipo_laboratorio, parametro_analizado, valor
+    ) VALUES (?, ?, ?, ?)
+"""
+
+
+def _normalizar(encabezado: str) -> str:
+    """'Absorción de agua (%)' -> 'absorcion_de_agua'."""
+    texto = unicodedata.normalize("NFKD", encabezado or "")
+    texto = texto.encode("ascii", "ignore").decode().lower()
+    texto = re.sub(r"\(.*?\)|\[.*?\]", "", texto)
+    return re.sub(r"[^a-z0-9]+", "_", texto).strip("_")
+
+
+def _fecha(valor: str) -> str:
+    try:
+        return date.fromisoformat(valor).isoformat()  # Caso común, sin strptime
+    except ValueError:
+        pass
+    for formato in _FORMATOS_FECHA:
+        try:
+            return datetime.strptime(valor, formato).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"fecha inválida '{valor}'")
+
+
+def _numero(valor: str) -> float:
+    """Acepta coma decimal (exportaciones en español)."""
+    try:
+        numero = float(valor.replace(",", "."))
+    except ValueError:
+        raise ValueError(f"valor no numérico '{valor}'") from None
+    if not math.isfinite(numero):
+        raise ValueError(f"valor no numérico '{valor}'")
+    return numero
+
+
+def _entero(valor: str, campo: str) -> int:
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValueError(f"{campo} inválido '{valor}'") from None
+
+
+def _lector(stream, delimitador: str | None):
+    """csv.reader sobre el stream, detectando coma, punto y coma o tabulador."""
+    if delimitador is None:
+        primera = stream.readline()
+        delimitador = max("\t;,", key=primera.count)
+        lineas = _encadenar(primera, stream)
+    else:
+        lineas = stream
+    return csv.reader(lineas, delimiter=delimitador)
+
+
+def _encadenar(primera, stream):
+    yield primera
+    yield from stream
+
+
+def _mapear(encabezado: list[str]) -> tuple[dict, dict]:
+    """Posición de cada columna y de cada parámetro reconocido en el encabezado."""
+    columnas, parametros = {}, {}
+    for pos, nombre in enumerate(encabezado):
+        clave = _normalizar(nombre)
+        if clave in COLUMNAS:
+            columnas.setdefault(COLUMNAS[clave], pos)
+        elif clave in PARAMETROS:
+            parametros.setdefault(PARAMETROS[clave], pos)
+    if "numero_lote" not in columnas or "fecha" not in columnas:
+        raise ValueError("El archivo debe tener columnas de lote y fecha")
+    if not parametros:
+        raise ValueError("No se reconoció ninguna columna de alveógrafo o farinógrafo")
+    return columnas, parametros
+
+
+def _fila(valores: list[str], columnas: dict, parametros: dict, defaults: dict) -> tuple:
+    """
+    Convierte una fila del archivo en (numero_lote, fecha, id_equipo, secuencia,
+    tipo_inspeccion, {parámetro: valor}, id_laboratorista). Lanza ValueError si no es válida.
+    """
+    def campo(nombre):
+        pos = columnas.get(nombre)
+        return valores[pos].strip() if pos is not None and pos < len(valores) else ""
+
+    lote = campo("numero_lote")
+    if not lote:
+        raise ValueError("falta el número de lote")
+    fecha = _fecha(campo("fecha"))
+
+    medidos = {}
+    n = len(valores)
+    for nombre, pos in parametros.items():
+        valor = valores[pos].strip() if pos < n else ""
+        if valor:
+            medidos[nombre] = _numero(valor)
+    if not medidos:
+        raise ValueError("la fila no tiene valores de parámetros")
+
+    equipo = campo("id_equipo")
+    laboratorista = campo("id_laboratorista")
+    return (
+        lote,
+        fecha,
+        _entero(equipo, "id_equipo") if equipo else defaults.get("id_equipo"),
+        campo("secuencia") or defaults.get("secuencia"),
+        campo("tipo_inspeccion") or defaults.get("tipo_inspeccion"),
+        medidos,
+        _entero(laboratorista, "id_laboratorista") if laboratorista else defaults.get("id_laboratorista"),
+    )
+
+
+def _insertar_bloque(filas: list[tuple]) -> None:
+    """Inserta un bloque de inspecciones y sus parámetros en una transacción."""
+    with db_connection() as conn:
+        # BEGIN IMMEDIATE toma el bloqueo de escritura antes de leer el último
+        # id, así los ids asignados aquí no chocan con otros escritores.
+        # INSPECCION es AUTOINCREMENT: tampoco se reutilizan ids ya borrados.
+        conn.execute("BEGIN IMMEDIATE")
+        siguiente = conn.execute(
+            """
+            SELECT MAX(
+                IFNULL((SELECT seq FROM sqlite_sequence WHERE name = 'INSPECCION'), 0),
+                IFNULL((SELECT MAX(id_inspeccion) FROM INSPECCION), 0)
+            ) + 1
+            """
+        ).fetchone()[0]
+        inspecciones, por_parametro = [], {}
+        for offset, (lote, fecha, equipo, secuencia, tipo, medidos, lab) in enumerate(filas):
+            id_inspeccion = siguiente + offset
+            inspecciones.append(
+                (id_inspeccion, lote, fecha, equipo, secuencia, tipo, json.dumps(medidos), lab)
+            )
+            # Los valores ya están validados: mismas filas que parameter_rows()
+            for nombre, valor in medidos.items():
+                por_parametro.setdefault(nombre, []).append((id_inspeccion, equipo, nombre, valor))
+        conn.executemany(_INSERT_INSPECCION, inspecciones)
+        # Agrupadas por parámetro, las filas entran en orden de
+        # idx_parametro_inspeccion y el índice se actualiza sin saltos.
+        conn.executemany(_INSERT_PARAMETRO, chain.from_iterable(por_parametro.values()))
+
+
+def import_inspections(
+    stream,
+    *,
+    id_laboratorista: int | None = None,
+    id_equipo: int | None = None,
+    tipo_inspeccion: str | None = None,
+    delimitador: str | None = None,
+    chunk: int | None = None,
+    forzar_laboratorista: bool = False,
+) -> dict:
+    """
+    Importa inspecciones desde un archivo CSV/TSV abierto en modo texto.
+
+    Parámetros:
+    - stream: archivo de texto (o iterable de líneas) con encabezado en la primera fila.
+    - id_laboratorista, id_equipo, tipo_inspeccion: valores por defecto para las filas
+      que no traen esas columnas.
+    - delimitador: ',', ';' o '\\t'; si es None se detecta con el encabezado.
+    - chunk: filas por transacción (IMPORT_CHUNK por defecto).
+    - forzar_laboratorista: si es True, todas las filas quedan a nombre de
+      id_laboratorista y la columna de laboratorista del archivo se ignora
+      (la ruta HTTP lo usa para que un usuario no importe a nombre de otro).
+
+    Retorna:
+    - dict: {"importadas": int, "con_error": int, "errores": [{"fila", "error"}]},
+      donde "fila" es el número de línea en el archivo (el encabezado es la 1).
+
+    Lanza:
+    - ValueError si el encabezado no tiene lote, fecha y al menos un parámetro.
+    """
+    chunk = chunk or IMPORT_CHUNK
+    defaults = {
+        "id_laboratorista": id_laboratorista,
+        "id_equipo": id_equipo,
+        "tipo_inspeccion": tipo_inspeccion,
+    }
+    lector = _lector(stream, delimitador)
+    encabezado = next(lector, None)
+    if not encabezado:
+        raise ValueError("El archivo está vacío")
+    columnas, parametros = _mapear(encabezado)
+    if forzar_laboratorista:
+        columnas.pop("id_laboratorista", None)
+
+    reporte = {"importadas": 0, "con_error": 0, "errores": []}
+    numerados = enumerate(lector, start=2)
+    while True:
+        leidas, bloque = 0, []
+        for linea, valores in islice(numerados, chunk):
+            leidas += 1
+            if not any(v.strip() for v in valores):
+                continue  # Líneas en blanco al final de la exportación
+            try:
+                bloque.append(_fila(valores, columnas, parametros, defaults))
+            except ValueError as e:
+                reporte["con_error"] += 1
+                if len(reporte["errores"]) < MAX_ERRORES:
+                    reporte["errores"].append({"fila": linea, "error": str(e)})
+        if bloque:
+            _insertar_bloque(bloque)
+            reporte["importadas"] += len(bloque)
+        if leidas < chunk:
+            return reporte
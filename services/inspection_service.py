@@ -5,7 +5,8 @@ Maneja las operaciones de base de datos relacionadas con las inspecciones de equ
 Admite operaciones CRUD, recuperación de todos los IDs de inspecciones y filtrado de inspecciones según diferentes parámetros.
 """
 
-from db import db_connection
+from db import db_connection, keyset_page, PAGE_SIZE
+from services.parameters_service import replace_inspection_parameters
 import json
 import sqlite3
 
@@ -37,6 +38,10 @@ def create_inspection(
                 id_laboratorista,
             ),
         )
+        id_inspeccion = cursor.lastrowid
+        # Misma transacción: la inspección y sus parámetros se guardan juntos
+        replace_inspection_parameters(conn, id_inspeccion, id_equipo, parametros_analizados)
+    return id_inspeccion
 
 
 def list_inspections():
@@ -69,6 +74,44 @@ def list_inspections():
     return [dict(row) for row in rows]
 
 
+def list_inspections_page(after=None, before=None, limit=PAGE_SIZE):
+    """
+    Obtiene una página de inspecciones (con los datos de su equipo),
+    de la más reciente a la más antigua.
+
+    Parámetros:
+    - after: id_inspeccion a partir del cual continuar (página siguiente).
+    - before: id_inspeccion a partir del cual retroceder (página anterior).
+    - limit: número máximo de inspecciones por página.
+
+    Retorna:
+    - dict: "items" con las inspecciones de la página y los cursores "next" y "prev".
+    """
+    with db_connection() as conn:
+        return keyset_page(
+            conn,
+            """
+            SELECT
+                i.id_inspeccion,
+                i.numero_lote,
+                i.secuencia,
+                i.tipo_inspeccion,
+                i.fecha,
+                i.parametros_analizados,
+                i.id_equipo,
+                e.descripcion_corta AS equipo_nombre,
+                e.modelo AS equipo_modelo,
+                e.serie AS equipo_serie,
+                i.id_laboratorista
+            FROM INSPECCION i
+            JOIN EQUIPO_LABORATORIO e
+              ON i.id_equipo = e.id_equipo
+            """,
+            "i.id_inspeccion",
+            after=after, before=before, limit=limit,
+        )
+
+
 def get_inspection(id_inspeccion: int) -> dict | None:
     """
     Obtiene una inspección por su ID.
@@ -102,7 +145,7 @@ def update_inspection(
     fecha: str,
     id_equipo: int | None,
     secuencia: str | None,
-    parametros_analizados: str | None,
+    parametros_analizados: dict | None,
     tipo_inspeccion: str,
     id_laboratorista: int | None,
 ) -> int:
@@ -115,7 +158,8 @@ def update_inspection(
     - fecha (str): Nueva fecha de la inspección.
     - id_equipo (int | None): Nuevo ID del equipo inspeccionado.
     - secuencia (str | None): Nueva secuencia del proceso.
-    - parametros_analizados (str | None): Nuevos parámetros analizados.
+    - parametros_analizados (dict | None): Nuevos parámetros analizados; también
+      reemplazan sus filas en PARAMETRO_ANALISIS.
     - tipo_inspeccion (str): Nuevo tipo de inspección.
     - id_laboratorista (int | None): Nuevo ID del usuario que realizó la inspección.
 
@@ -144,6 +188,8 @@ def update_inspection(
             ),
         )
         affected_rows = cursor.rowcount
+        if affected_rows:
+            replace_inspection_parameters(conn, id_inspeccion, id_equipo, parametros_analizados)
 
     return affected_rows
 
@@ -167,15 +213,35 @@ def delete_inspection(id_inspeccion: int) -> int:
     return affected_rows
 
 
-def get_all_inspections() -> list[dict]:
+def get_all_inspections(user_id: int | None = None, rol: str | None = None) -> list[dict]:
+    """
+    Inspecciones para los selectores de certificados, de la más reciente a la más antigua.
+
+    Parámetros:
+    - user_id, rol: usuario que consulta. Si se indican y el rol no es Admin, solo se
+      devuelven las inspecciones de las que es laboratorista (filtro en SQL).
+
+    Retorna:
+    - list: Diccionarios con id_inspeccion, numero_lote, secuencia, fecha e id_laboratorista.
+    """
+    where, params = "", ()
+    if user_id is not None and not is_admin(rol):
+        where, params = "WHERE id_laboratorista = ?", (user_id,)
     with db_connection() as conn:
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         cursor.execute(
-            """
-            SELECT id_inspeccion, numero_lote, secuencia
+            f"""
+            SELECT id_inspeccion, numero_lote, secuencia, fecha, id_laboratorista
             FROM INSPECCION
-            ORDER BY id_inspeccion DESC
-        """
+            {where}
+            ORDER BY fecha DESC, id_inspeccion DESC
+        """,
+            params,
         )
-        return cursor.fetchall()
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def is_admin(rol: str | None) -> bool:
+    """Los administradores ven las inspecciones y certificados de todos los laboratoristas."""
+    return (rol or "").lower() == "admin"
@@ -1,75 +1,348 @@
-import os
+"""
+Servicio de Correo
+
+Envía los PDFs de certificados al cliente y al correo de almacén.
+
+Las sesiones SMTP (conexión TLS + login) se guardan en un pool y se
+reutilizan entre envíos; si el servidor cerró una sesión inactiva se abre
+otra y se reintenta el mensaje una vez. Con MAIL_BATCH=1 los certificados
+pendientes para un mismo destinatario se mandan juntos en un solo correo
+(ver emission_service).
+"""
+
+import atexit
 import json
+import os
+import queue
 import smtplib
+import socket
 import ssl
+import threading
+import time
 from email.message import EmailMessage
 
 # ---- Configuración de Zoho Mail ----
-SMTP_SERVER = "smtp.zoho.com"
-SMTP_PORT = 465                 # SSL
-SMTP_USER = "harinas_elizondo@zohomail.com" #email de harinas_elizondo: harinas_elizondo@zohomail.com
-SMTP_PASS = "31xmQfgZHy79"     # App Password de Zoho (para pruebas)
+SMTP_SERVER = os.environ.get("SMTP_SERVER", "smtp.zoho.com")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "465"))  # SSL
+SMTP_USER = os.environ.get("SMTP_USER", "harinas_elizondo@zohomail.com") #email de harinas_elizondo: harinas_elizondo@zohomail.com
+SMTP_PASS = os.environ.get("SMTP_PASS", "31xmQfgZHy79")     # App Password de Zoho (para pruebas)
+SMTP_USE_SSL = os.environ.get("SMTP_USE_SSL", "1") == "1"  # 0: SMTP sin cifrar (servidor local de pruebas)
 
+# ---- Pool de sesiones ----
+SMTP_POOL_SIZE = int(os.environ.get("SMTP_POOL_SIZE", "2"))
+SMTP_TIMEOUT = float(os.environ.get("SMTP_TIMEOUT", "30"))
+SMTP_IDLE_CHECK = 30.0  # segundos inactiva tras los que se verifica la sesión con NOOP
+SMTP_MAX_MESSAGES = int(os.environ.get("SMTP_MAX_MESSAGES", "100"))  # mensajes por sesión
 
-def send_certificate(correo_cliente: str, nombre_archivo: str) -> None:
+# ---- Envío agrupado ----
+MAIL_BATCH = os.environ.get("MAIL_BATCH", "0") == "1"
+MAIL_BATCH_MAX = int(os.environ.get("MAIL_BATCH_MAX", "10"))  # adjuntos por correo
+
+CERTS_DIR = os.path.join(os.path.dirname(__file__), "certificados")
+ALMACEN_PATH = os.path.join(os.path.dirname(__file__), "correo_almacen.json")
+
+# Errores tras los que la sesión ya no sirve y conviene reconectar
+_RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout)
+
+
+class SMTPPoolTimeout(smtplib.SMTPException):
+    """No se liberó ninguna sesión SMTP a tiempo."""
+
+
+class _Session:
+    __slots__ = ("server", "last_used", "sent")
+
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.last_used = time.monotonic()
+        self.sent = 0
+
+
+class SMTPPool:
     """
-    Envía un archivo .pdf a correo_cliente y al correo de almacén.
+    Pool acotado de sesiones SMTP autenticadas.
 
-    Parámetros:
-    - correo_cliente: dirección de correo del cliente.
-    - nombre_archivo: nombre del archivo .pdf (p.e. "certificado_123.pdf"),
-      ubicado en la carpeta 'certificados/'.
+    Las sesiones se crean bajo demanda hasta `size`; después los envíos
+    esperan a que otra se libere. Una sesión se descarta al fallar, al
+    cumplir `max_messages` o si no responde al NOOP tras estar inactiva.
     """
 
-    # 1) Cargar correo de almacén desde JSON
-    json_path = os.path.join(os.path.dirname(__file__), "correo_almacen.json")
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    correo_almacen = data.get("correo_almacen")
+    def __init__(
+        self,
+        host: str = SMTP_SERVER,
+        port: int = SMTP_PORT,
+        user: str | None = SMTP_USER,
+        password: str | None = SMTP_PASS,
+        size: int = SMTP_POOL_SIZE,
+        use_ssl: bool = SMTP_USE_SSL,
+        timeout: float = SMTP_TIMEOUT,
+        max_messages: int = SMTP_MAX_MESSAGES,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.size = max(1, size)
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.max_messages = max_messages
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=self.size)
+        self._lock = threading.Lock()
+        self._open = 0
+        self._closed = False
+        self._stats = {
+            "sent": 0,
+            "connections": 0,
+            "reuses": 0,
+            "reconnects": 0,
+            "discards": 0,
+        }
+
+    def _connect(self) -> _Session:
+        if self.use_ssl:
+            context = ssl.create_default_context()
+            server = smtplib.SMTP_SSL(
+                self.host, self.port, context=context, timeout=self.timeout
+            )
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.user:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        return _Session(server)
+
+    @staticmethod
+    def _is_healthy(session: _Session) -> bool:
+        if time.monotonic() - session.last_used < SMTP_IDLE_CHECK:
+            return True
+        try:
+            return session.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _discard(self, session: _Session) -> None:
+        try:
+            session.server.quit()
+        except (smtplib.SMTPException, OSError):
+            session.server.close()
+        with self._lock:
+            self._open -= 1
+            self._stats["discards"] += 1
+
+    def acquire(self) -> _Session:
+        """Devuelve una sesión lista, abriendo o esperando una si hace falta."""
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._open < self.size
+                    if can_create:
+                        self._open += 1
+                        self._stats["connections"] += 1
+                if can_create:
+                    try:
+                        return self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._open -= 1
+                        raise
+                try:
+                    session = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise SMTPPoolTimeout(
+                        f"No hubo sesión SMTP disponible en {self.timeout}s"
+                    ) from None
+
+            if self._is_healthy(session):
+                with self._lock:
+                    self._stats["reuses"] += 1
+                return session
+            self._discard(session)
+
+    def release(self, session: _Session) -> None:
+        """Devuelve la sesión al pool (o la cierra si ya cumplió su cuota)."""
+        session.last_used = time.monotonic()
+        if self._closed or session.sent >= self.max_messages:
+            self._discard(session)
+            return
+        try:
+            self._idle.put_nowait(session)
+        except queue.Full:
+            self._discard(session)
+
+    def send(self, msg: EmailMessage) -> None:
+        """
+        Envía un mensaje por una sesión del pool. Si la sesión estaba muerta
+        se descarta, se abre otra y se reintenta una vez.
+        """
+        for attempt in (1, 2):
+            session = self.acquire()
+            try:
+                session.server.send_message(msg)
+            except _RECONNECT_ERRORS:
+                self._discard(session)
+                if attempt == 2:
+                    raise
+                with self._lock:
+                    self._stats["reconnects"] += 1
+                continue
+            except smtplib.SMTPResponseException as e:
+                # 421: el servidor cierra la sesión; cualquier otro código es
+                # un rechazo del mensaje y la sesión sigue siendo válida.
+                if e.smtp_code != 421:
+                    self.release(session)
+                    raise
+                self._discard(session)
+                if attempt == 2:
+                    raise
+                with self._lock:
+                    self._stats["reconnects"] += 1
+                continue
+            except Exception:
+                self._discard(session)
+                raise
+            session.sent += 1
+            self.release(session)
+            with self._lock:
+                self._stats["sent"] += 1
+            return
+
+    def close(self) -> None:
+        """Cierra las sesiones inactivas; las que están en uso, al liberarse."""
+        self._closed = True
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(session)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "open": self._open,
+                "idle": self._idle.qsize(),
+                "size": self.size,
+            }
+
+
+_pool: SMTPPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SMTPPool:
+    """Pool de sesiones del proceso, creado con la configuración actual."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMTPPool()
+        return _pool
+
+
+def close_pool() -> None:
+    """Cierra el pool del proceso (la próxima llamada a get_pool crea otro)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+atexit.register(close_pool)
+
+
+def pool_stats() -> dict:
+    """Contadores del pool: sent, connections, reuses, reconnects, discards, open, idle, size."""
+    return get_pool().stats()
+
+
+# ---------------------------------------------------------------------------
+# MENSAJES
+# ---------------------------------------------------------------------------
+
+_almacen_cache: tuple = (None, None)
+
+
+def _correo_almacen() -> str:
+    """Correo de almacén; correo_almacen.json solo se relee si cambia su mtime."""
+    global _almacen_cache
+    mtime = os.stat(ALMACEN_PATH).st_mtime_ns
+    if _almacen_cache[0] != mtime:
+        with open(ALMACEN_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        _almacen_cache = (mtime, data.get("correo_almacen"))
+    correo_almacen = _almacen_cache[1]
     if not correo_almacen:
         raise ValueError("No se encontró 'correo_almacen' en correo_almacen.json")
+    return correo_almacen
+
+
+def build_message(correo_cliente: str, nombres_archivo: list[str]) -> EmailMessage:
+    """
+    Construye el correo con uno o varios certificados adjuntos.
+
+    Parámetros:
+    - correo_cliente: dirección de correo del cliente.
+    - nombres_archivo: nombres de los .pdf ubicados en CERTS_DIR.
+    """
+    correo_almacen = _correo_almacen()
 
-    # 2) Leer el archivo 
-    certs_dir = os.path.join(os.path.dirname(__file__), "certificados")
-    file_path = os.path.join(certs_dir, nombre_archivo)
-    if not os.path.isfile(file_path):
-        raise FileNotFoundError(f"No existe el archivo: {file_path}")
-    with open(file_path, "rb") as fp:
-        file_data = fp.read()
+    adjuntos = []
+    for nombre_archivo in nombres_archivo:
+        file_path = os.path.join(CERTS_DIR, nombre_archivo)
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"No existe el archivo: {file_path}")
+        with open(file_path, "rb") as fp:
+            adjuntos.append((nombre_archivo, fp.read()))
 
-    # 3) Construir el mensaje
     msg = EmailMessage()
     msg["From"] = SMTP_USER
     msg["To"] = ", ".join([correo_cliente, correo_almacen])
-    msg["Subject"] = f"Envío de certificado: {nombre_archivo}"
-    msg.set_content(
-        f"Hola,\n\nAdjunto encontrarás el certificado '{nombre_archivo}'.\n\nSaludos."
-    )
-
-    # Adjuntar el archivo txt
-    '''msg.add_attachment(
-        file_data,
-        maintype="text",
-        subtype="plain",
-        filename=nombre_archivo
-    )'''
-
-    #Adjuntar un archivo pdf
-    msg.add_attachment(
-        file_data,
-        maintype="application",
-        subtype="pdf",
-        filename=nombre_archivo
-    )
-
-
-    # 4) Enviar por SMTP (Zoho Mail) usando SSL
-    context = ssl.create_default_context()
-    with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT, context=context) as server:
-        server.login(SMTP_USER, SMTP_PASS)
-        server.send_message(msg)
-
-    print(f"Correo enviado a: {correo_cliente} y {correo_almacen}")
+    if len(nombres_archivo) == 1:
+        msg["Subject"] = f"Envío de certificado: {nombres_archivo[0]}"
+        msg.set_content(
+            f"Hola,\n\nAdjunto encontrarás el certificado '{nombres_archivo[0]}'.\n\nSaludos."
+        )
+    else:
+        lista = "\n".join(f"- {n}" for n in nombres_archivo)
+        msg["Subject"] = f"Envío de {len(nombres_archivo)} certificados"
+        msg.set_content(
+            f"Hola,\n\nAdjuntos encontrarás los certificados:\n{lista}\n\nSaludos."
+        )
+
+    for nombre_archivo, file_data in adjuntos:
+        msg.add_attachment(
+            file_data,
+            maintype="application",
+            subtype="pdf",
+            filename=nombre_archivo
+        )
+    return msg
+
+
+def send_certificates(correo_cliente: str, nombres_archivo: list[str]) -> None:
+    """
+    Envía varios .pdf en un solo correo a correo_cliente y al correo de almacén.
+    """
+    get_pool().send(build_message(correo_cliente, nombres_archivo))
+    print(f"Correo enviado a: {correo_cliente} ({len(nombres_archivo)} adjuntos)")
+
+
+def send_certificate(correo_cliente: str, nombre_archivo: str) -> None:
+    """
+    Envía un archivo .pdf a correo_cliente y al correo de almacén.
+
+    Parámetros:
+    - correo_cliente: dirección de correo del cliente.
+    - nombre_archivo: nombre del archivo .pdf (p.e. "certificado_123.pdf"),
+      ubicado en la carpeta 'certificados/'.
+    """
+    send_certificates(correo_cliente, [nombre_archivo])
 
 
 # Ejemplo de uso (descomenta para probar):
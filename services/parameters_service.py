@@ -4,10 +4,21 @@ Servicio de Parámetros
 Gestiona los parámetros que vinculan certificados y registros de equipos.
 Proporciona operaciones CRUD para insertar, recuperar, actualizar y eliminar registros
 de parámetros asociados a certificados y equipos.
+
+PARAMETRO_ANALISIS guarda una fila por parámetro medido en cada inspección
+(la versión relacional de INSPECCION.parametros_analizados). inspection_service
+la escribe en la misma transacción que la inspección, así que las consultas
+por parámetro (p. ej. todos los W del último trimestre) se resuelven en SQL
+con idx_parametro_inspeccion en lugar de decodificar el JSON de cada fila.
 """
 
+import json
+
 from db import db_connection
 
+# Categorías en las que puede venir agrupado parametros_analizados
+CATEGORIAS = ("farinografo", "alveografo")
+
 
 def create_parameter(
     id_inspeccion: int,
@@ -143,3 +154,158 @@ def list_parameters() -> list:
         rows = cursor.fetchall()
 
     return [dict(row) for row in rows]
+
+
+def flatten_parametros(parametros) -> dict:
+    """
+    Normaliza parametros_analizados a {parámetro: valor}.
+
+    Acepta el dict o su JSON, plano o agrupado por categoría
+    ({"alveografo": {"W": ...}, "farinografo": {...}}), igual que la
+    detección de desviaciones.
+    """
+    if isinstance(parametros, str):
+        try:
+            parametros = json.loads(parametros)
+        except json.JSONDecodeError:
+            return {}
+    if not isinstance(parametros, dict):
+        return {}
+    if any(cat in parametros for cat in CATEGORIAS):
+        flat = {}
+        for cat in CATEGORIAS:
+            if isinstance(parametros.get(cat), dict):
+                flat.update(parametros[cat])
+        return flat
+    return parametros
+
+
+def _valor(value) -> float | None:
+    """Valor numérico del parámetro, o None si no es un número."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def parameter_rows(id_inspeccion: int, id_equipo: int | None, parametros) -> list[tuple]:
+    """
+    Filas (id_inspeccion, id_equipo_laboratorio, parametro_analizado, valor)
+    de PARAMETRO_ANALISIS para los parámetros de una inspección.
+    """
+    return [
+        (id_inspeccion, id_equipo, str(nombre), _valor(valor))
+        for nombre, valor in flatten_parametros(parametros).items()
+    ]
+
+
+def replace_inspection_parameters(conn, id_inspeccion: int, id_equipo: int | None, parametros) -> int:
+    """
+    Reemplaza los parámetros de una inspección dentro de la transacción de `conn`.
+
+    Retorna:
+    - int: Número de parámetros escritos.
+    """
+    conn.execute("DELETE FROM PARAMETRO_ANALISIS WHERE id_inspeccion = ?", (id_inspeccion,))
+    rows = parameter_rows(id_inspeccion, id_equipo, parametros)
+    conn.executemany(
+        """
+        INSERT INTO PARAMETRO_ANALISIS (
+            id_inspeccion, id_equipo_laboratorio, parametro_analizado, valor
+        )
+        VALUES (?, ?, ?, ?)
+        """,
+        rows,
+    )
+    return len(rows)
+
+
+def get_inspection_parameters(id_inspeccion: int, conn=None) -> dict:
+    """
+    Obtiene los parámetros medidos de una inspección.
+
+    Retorna:
+    - dict: {parametro_analizado: valor}; solo valores numéricos.
+    """
+    if conn is None:
+        with db_connection() as pooled:
+            return get_inspection_parameters(id_inspeccion, pooled)
+    rows = conn.execute(
+        """
+        SELECT parametro_analizado, valor
+        FROM PARAMETRO_ANALISIS
+        WHERE id_inspeccion = ? AND valor IS NOT NULL
+        ORDER BY id_parametro
+        """,
+        (id_inspeccion,),
+    ).fetchall()
+    return {row["parametro_analizado"]: row["valor"] for row in rows}
+
+
+def _periodo(desde: str | None, hasta: str | None) -> tuple[str, list]:
+    """Condiciones sobre INSPECCION.fecha para un periodo opcional."""
+    where, params = [], []
+    if desde:
+        where.append("i.fecha >= ?")
+        params.append(desde)
+    if hasta:
+        where.append("i.fecha <= ?")
+        params.append(hasta)
+    return "".join(f" AND {w}" for w in where), params
+
+
+def parameter_values(
+    parametro: str, desde: str | None = None, hasta: str | None = None, conn=None
+) -> list:
+    """
+    Obtiene todas las mediciones de un parámetro, por fecha de inspección.
+
+    Parámetros:
+    - parametro (str): Nombre del parámetro (e.g., "W").
+    - desde, hasta (str | None): Periodo opcional (fechas ISO, inclusivas).
+
+    Retorna:
+    - list: Diccionarios con id_inspeccion, fecha y valor, ordenados por fecha.
+    """
+    if conn is None:
+        with db_connection() as pooled:
+            return parameter_values(parametro, desde, hasta, pooled)
+    periodo, params = _periodo(desde, hasta)
+    rows = conn.execute(
+        f"""
+        SELECT p.id_inspeccion, i.fecha, p.valor
+        FROM PARAMETRO_ANALISIS AS p
+        JOIN INSPECCION AS i ON i.id_inspeccion = p.id_inspeccion
+        WHERE p.parametro_analizado = ? AND p.valor IS NOT NULL{periodo}
+        ORDER BY i.fecha, p.id_inspeccion
+        """,
+        [parametro, *params],
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def parameter_summary(desde: str | None = None, hasta: str | None = None, conn=None) -> dict:
+    """
+    Estadística básica de cada parámetro en un periodo, calculada en SQL.
+
+    Retorna:
+    - dict: {parametro: {"n", "min", "max", "promedio"}}.
+    """
+    if conn is None:
+        with db_connection() as pooled:
+            return parameter_summary(desde, hasta, pooled)
+    periodo, params = _periodo(desde, hasta)
+    rows = conn.execute(
+        f"""
+        SELECT p.parametro_analizado AS parametro, COUNT(*) AS n,
+               MIN(p.valor) AS min, MAX(p.valor) AS max, AVG(p.valor) AS promedio
+        FROM PARAMETRO_ANALISIS AS p
+        JOIN INSPECCION AS i ON i.id_inspeccion = p.id_inspeccion
+        WHERE p.valor IS NOT NULL{periodo}
+        GROUP BY p.parametro_analizado
+        """,
+        params,
+    ).fetchall()
+    return {row["parametro"]: {k: row[k] for k in ("n", "min", "max", "promedio")} for row in rows}
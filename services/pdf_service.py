@@ -0,0 +1,201 @@
+"""
+Servicio de PDFs
+
+Genera los PDFs de certificados (templates/certificado_pdf.html) en un pool
+de procesos, para que el render de xhtml2pdf (Python puro y limitado por CPU)
+no bloquee el GIL de los hilos de Flask ni de los workers de emisión, y para
+que una ráfaga de certificados use todos los núcleos.
+
+Cada proceso del pool se precalienta al arrancar: importa xhtml2pdf y
+reportlab, compila la plantilla, descarga una sola vez las imágenes remotas
+(logo y firmas) y hace un render de prueba para cargar fuentes y CSS.
+
+Este módulo no depende de Flask ni de la base de datos, para que los
+procesos del pool arranquen rápido.
+"""
+
+import atexit
+import multiprocessing
+import os
+import tempfile
+import threading
+import urllib.request
+from io import BytesIO
+
+__all__ = ["render_pdf", "render_pdfs", "start_pool", "shutdown_pool", "PDFRenderError"]
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
+TEMPLATE_NAME = "certificado_pdf.html"
+
+# Número de procesos; 0 renderiza en el proceso actual (útil en pruebas).
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", str(os.cpu_count() or 1)))
+ASSET_TIMEOUT = 5  # segundos para descargar cada imagen remota
+
+_WARMUP_CERT = {
+    "id_certificado": 0,
+    "resultados_analisis": "{}",
+    "compara_referencias": "",
+    "desviaciones": "",
+}
+
+
+class PDFRenderError(RuntimeError):
+    """xhtml2pdf no pudo generar el documento."""
+
+
+# ---------------------------------------------------------------------------
+# ESTADO DE CADA PROCESO (plantilla compilada e imágenes locales)
+# ---------------------------------------------------------------------------
+
+_template = None
+_pisa = None
+_assets: dict[str, str] = {}
+_assets_dir: str | None = None
+
+
+def _fetch_asset(uri: str) -> str:
+    """Descarga una imagen remota una sola vez y devuelve su ruta local."""
+    global _assets_dir
+    if uri in _assets:
+        return _assets[uri]
+    if _assets_dir is None:
+        _assets_dir = tempfile.mkdtemp(prefix="pdf_assets_")
+    path = os.path.join(_assets_dir, f"asset_{len(_assets)}")
+    try:
+        with urllib.request.urlopen(uri, timeout=ASSET_TIMEOUT) as resp:
+            data = resp.read()
+        with open(path, "wb") as fh:
+            fh.write(data)
+    except Exception as e:
+        # Se recuerda el fallo para no volver a esperar la red en cada render;
+        # el PDF sale sin esa imagen, igual que antes.
+        print(f"No se pudo descargar {uri}: {e}")
+        path = ""
+    _assets[uri] = path
+    return path
+
+
+def _link_callback(uri: str, rel: str) -> str:
+    if uri.startswith(("http://", "https://")):
+        return _fetch_asset(uri)
+    return uri
+
+
+def _init_worker() -> None:
+    """Precalienta el proceso: imports, plantilla, imágenes, fuentes y CSS."""
+    global _template, _pisa
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+    from xhtml2pdf import pisa
+
+    _pisa = pisa
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        autoescape=select_autoescape(["html"]),
+    )
+    _template = env.get_template(TEMPLATE_NAME)
+    try:
+        _render(_WARMUP_CERT)
+    except Exception as e:
+        print(f"Render de calentamiento falló: {e}")
+
+
+def _render(cert: dict) -> bytes:
+    if _template is None:
+        _init_worker()
+    html = _template.render(cert=cert)
+    buffer = BytesIO()
+    result = _pisa.CreatePDF(
+        BytesIO(html.encode("utf-8")), dest=buffer, link_callback=_link_callback
+    )
+    if result.err:
+        raise PDFRenderError(f"xhtml2pdf reportó {result.err} errores")
+    return buffer.getvalue()
+
+
+def _render_safe(cert: dict):
+    """Versión para el pool: devuelve (True, bytes) o (False, mensaje)."""
+    try:
+        return True, _render(cert)
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
+
+# ---------------------------------------------------------------------------
+# POOL
+# ---------------------------------------------------------------------------
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def start_pool(processes: int | None = None):
+    """
+    Arranca el pool de procesos (una sola vez). Usa 'spawn' para no heredar
+    hilos ni conexiones SQLite del proceso web.
+    Retorna el pool, o None si PDF_WORKERS es 0.
+    """
+    global _pool
+    processes = PDF_WORKERS if processes is None else processes
+    if processes <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            ctx = multiprocessing.get_context("spawn")
+            _pool = ctx.Pool(processes=processes, initializer=_init_worker)
+        return _pool
+
+
+def shutdown_pool() -> None:
+    """Cierra el pool y espera a que terminen los procesos."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool.join()
+            _pool = None
+
+
+atexit.register(shutdown_pool)
+
+
+def render_pdf(cert: dict) -> bytes:
+    """
+    Renderiza un certificado y devuelve los bytes del PDF.
+
+    Parámetros:
+    - cert (dict): campos del certificado tal como los usa certificado_pdf.html.
+
+    Excepciones:
+    - PDFRenderError si xhtml2pdf falla.
+    """
+    return render_pdfs([cert])[0]
+
+
+def render_pdfs(certs: list[dict], return_exceptions: bool = False) -> list:
+    """
+    Renderiza varios certificados en paralelo, conservando el orden.
+
+    Parámetros:
+    - certs (list[dict]): certificados a renderizar.
+    - return_exceptions (bool): si es True, los renders fallidos se devuelven
+      como PDFRenderError en su posición en lugar de lanzar la primera.
+
+    Retorna:
+    - list: bytes de cada PDF (o PDFRenderError si return_exceptions).
+    """
+    certs = [dict(c) for c in certs]
+    pool = start_pool()
+    if pool is None:
+        results = [_render_safe(c) for c in certs]
+    else:
+        results = pool.map(_render_safe, certs, chunksize=1)
+
+    out = []
+    for ok, value in results:
+        if ok:
+            out.append(value)
+        elif return_exceptions:
+            out.append(PDFRenderError(value))
+        else:
+            raise PDFRenderError(value)
+    return out
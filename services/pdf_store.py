@@ -0,0 +1,185 @@
+"""
+Almacén de PDFs direccionado por contenido
+
+Guarda cada PDF de certificado bajo el hash SHA-256 de los datos con que se
+renderizó (más una huella de la plantilla), de modo que:
+
+- re-descargar o reenviar un certificado sin cambios reutiliza los bytes
+  guardados y no vuelve a renderizar;
+- si el certificado o la plantilla cambian, el hash cambia y nunca se
+  entrega un PDF desactualizado.
+
+Los datos incluyen id_certificado (la plantilla lo imprime), así que cada
+archivo pertenece a un solo certificado: lo que se reutiliza son los
+renders repetidos del mismo certificado.
+
+Los archivos viven en PDF_STORE_DIR/<2 primeros hex>/<hash>.pdf. El mtime de
+cada archivo marca su último uso; evict() borra los que superan la edad
+máxima y, si aún se excede el tamaño máximo, los menos usados primero.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from services import pdf_service
+
+__all__ = ["certificate_key", "get", "put", "render_cached", "evict", "store_stats"]
+
+PDF_STORE_DIR = os.environ.get(
+    "PDF_STORE_DIR", os.path.join(os.path.dirname(__file__), "certificados", "store")
+)
+PDF_STORE_MAX_BYTES = int(os.environ.get("PDF_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+PDF_STORE_MAX_AGE_DAYS = float(os.environ.get("PDF_STORE_MAX_AGE_DAYS", "365"))
+EVICT_EVERY = 50  # escrituras entre barridos de evicción
+
+_TEMPLATE_PATH = os.path.join(pdf_service.TEMPLATES_DIR, pdf_service.TEMPLATE_NAME)
+
+_lock = threading.Lock()
+_template_fp: tuple = (None, "")
+_puts_since_evict = 0
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+
+def _template_fingerprint() -> str:
+    """Hash de certificado_pdf.html; se recalcula solo si cambia su mtime."""
+    global _template_fp
+    try:
+        mtime = os.stat(_TEMPLATE_PATH).st_mtime_ns
+    except OSError:
+        return ""
+    if _template_fp[0] != mtime:
+        with open(_TEMPLATE_PATH, "rb") as fh:
+            _template_fp = (mtime, hashlib.sha256(fh.read()).hexdigest())
+    return _template_fp[1]
+
+
+def certificate_key(cert: dict) -> str:
+    """Hash de los datos que determinan el PDF de un certificado."""
+    payload = json.dumps(
+        {"template": _template_fingerprint(), "cert": dict(cert)},
+        sort_keys=True,
+        default=str,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _path(key: str) -> str:
+    return os.path.join(PDF_STORE_DIR, key[:2], f"{key}.pdf")
+
+
+def get(key: str) -> bytes | None:
+    """Devuelve los bytes guardados para `key` (y marca su uso), o None."""
+    path = _path(key)
+    try:
+        with open(path, "rb") as fh:
+            data = fh.read()
+        os.utime(path)  # Último uso, para la evicción LRU
+    except OSError:
+        with _lock:
+            _stats["misses"] += 1
+        return None
+    with _lock:
+        _stats["hits"] += 1
+    return data
+
+
+def put(key: str, data: bytes) -> str:
+    """Guarda `data` bajo `key` si aún no existe y devuelve su ruta."""
+    global _puts_since_evict
+    path = _path(key)
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp_path, path)
+
+    with _lock:
+        _stats["writes"] += 1
+        _puts_since_evict += 1
+        run_evict = _puts_since_evict >= EVICT_EVERY
+        if run_evict:
+            _puts_since_evict = 0
+    if run_evict:
+        evict()
+    return path
+
+
+def render_cached(certs: list[dict]) -> list:
+    """
+    Devuelve el PDF de cada certificado, renderizando solo los que no están
+    en el almacén (en paralelo, con pdf_service).
+
+    Retorna:
+    - list: bytes de cada PDF, o PDFRenderError en la posición de los que fallaron.
+    """
+    keys = [certificate_key(c) for c in certs]
+    results: list = [get(k) for k in keys]
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        rendered = pdf_service.render_pdfs(
+            [certs[i] for i in missing], return_exceptions=True
+        )
+        for i, pdf in zip(missing, rendered):
+            if not isinstance(pdf, Exception):
+                put(keys[i], pdf)
+            results[i] = pdf
+    return results
+
+
+def evict(
+    max_bytes: int | None = None, max_age_days: float | None = None
+) -> int:
+    """
+    Borra los PDFs sin uso por más de `max_age_days` y, si el almacén sigue
+    ocupando más de `max_bytes`, los menos usados hasta quedar por debajo.
+
+    Retorna:
+    - int: Número de archivos eliminados.
+    """
+    max_bytes = PDF_STORE_MAX_BYTES if max_bytes is None else max_bytes
+    max_age_days = PDF_STORE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    if not os.path.isdir(PDF_STORE_DIR):
+        return 0
+
+    entries = []
+    for dirpath, _, filenames in os.walk(PDF_STORE_DIR):
+        for name in filenames:
+            if name.endswith(".pdf"):
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+    entries.sort()  # Menos usados primero
+
+    cutoff = time.time() - max_age_days * 86400
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for mtime, size, path in entries:
+        if mtime >= cutoff and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+
+    with _lock:
+        _stats["evictions"] += removed
+    return removed
+
+
+def store_stats() -> dict:
+    """Contadores del almacén: hits, misses, writes, evictions."""
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,386 @@
+"""
+Servicio de Snapshots Analíticos
+
+Copia incremental de la historia de QA a Parquet, particionada por año y
+mes (anio=AAAA/mes=M, estilo Hive), para que los análisis pesados lean
+archivos columnares en lugar de consultar data.db y competir con la
+aplicación web por SQLite.
+
+Tablas del snapshot:
+- certificados: CERTIFICADO_CALIDAD, particionada por fecha_envio.
+- inspecciones: INSPECCION, particionada por fecha.
+- mediciones: PARAMETRO_ANALISIS con la fecha y el equipo de la inspección.
+
+Cada corrida solo escribe los ids mayores que los de la corrida anterior
+(guardados en _estado.json), leyendo SQLite en bloques cortos por clave
+primaria. Las ediciones y bajas de filas ya copiadas no se reflejan hasta
+reconstruir con rebuild=True.
+
+La excepción son las mediciones: editar una inspección reescribe sus
+parámetros con ids nuevos, que se copian como filas nuevas. Al leer se
+conserva solo la fila más reciente de cada (inspección, parámetro), así una
+edición nunca cuenta dos veces; los parámetros que la edición quitó siguen
+apareciendo hasta reconstruir.
+
+pyarrow es opcional: solo se importa al escribir o leer un snapshot.
+"""
+
+import functools
+import json
+import operator
+import os
+import shutil
+from typing import Any
+
+from db import db_connection
+
+# Directorio raíz de los snapshots
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshots")
+
+# Filas leídas de SQLite (y escritas por archivo) en cada bloque
+SNAPSHOT_BATCH = int(os.environ.get("SNAPSHOT_BATCH", "100000"))
+
+ESTADO = "_estado.json"
+
+# Año y mes de una fecha ISO guardada como TEXT; sin fecha (p. ej. un
+# certificado no enviado) va a anio=0/mes=0, porque una partición NULL no se
+# puede leer con el esquema int32
+_PARTICION = (
+    "IFNULL(CAST(substr({0}, 1, 4) AS INTEGER), 0), IFNULL(CAST(substr({0}, 6, 2) AS INTEGER), 0)"
+)
+
+# tabla -> (clave, SELECT ... WHERE clave > ? AND clave <= ?, columnas y tipos)
+TABLAS: dict[str, tuple[str, str, tuple]] = {
+    "certificados": (
+        "id_certificado",
+        f"""
+        SELECT id_certificado, id_cliente, id_inspeccion, secuencia_inspeccion, orden_compra,
+               cantidad_solicitada, cantidad_entregada, numero_factura, fecha_envio,
+               fecha_caducidad, resultados_analisis, compara_referencias, desviaciones,
+               destinatario_correo, num_desviaciones, {_PARTICION.format("fecha_envio")}
+        FROM CERTIFICADO_CALIDAD
+        WHERE id_certificado > ? AND id_certificado <= ?
+        ORDER BY id_certificado
+        """,
+        (
+            ("id_certificado", "int64"), ("id_cliente", "int64"), ("id_inspeccion", "int64"),
+            ("secuencia_inspeccion", "string"), ("orden_compra", "string"),
+            ("cantidad_solicitada", "float64"), ("cantidad_entregada", "float64"),
+            ("numero_factura", "string"), ("fecha_envio", "string"),
+            ("fecha_caducidad", "string"), ("resultados_analisis", "string"),
+            ("compara_referencias", "string"), ("desviaciones", "string"),
+            ("destinatario_correo", "string"), ("num_desviaciones", "int64"),
+            ("anio", "int32"), ("mes", "int32"),
+        ),
+    ),
+    "inspecciones": (
+        "id_inspeccion",
+        f"""
+        SELECT id_inspeccion, numero_lote, fecha, id_equipo, secuencia, parametros_analizados,
+               tipo_inspeccion, id_laboratorista, {_PARTICION.format("fecha")}
+        FROM INSPECCION
+        WHERE id_inspeccion > ? AND id_inspeccion <= ?
+        ORDER BY id_inspeccion
+        """,
+        (
+            ("id_inspeccion", "int64"), ("numero_lote", "string"), ("fecha", "string"),
+            ("id_equipo", "int64"), ("secuencia", "string"),
+            ("parametros_analizados", "string"), ("tipo_inspeccion", "string"),
+            ("id_laboratorista", "int64"), ("anio", "int32"), ("mes", "int32"),
+        ),
+    ),
+    "mediciones": (
+        "p.id_parametro",
+        f"""
+        SELECT p.id_parametro, p.id_inspeccion, p.id_equipo_laboratorio, p.parametro_analizado,
+               p.valor, i.fecha, i.id_laboratorista, {_PARTICION.format("i.fecha")}
+        FROM PARAMETRO_ANALISIS AS p
+        JOIN INSPECCION AS i ON i.id_inspeccion = p.id_inspeccion
+        WHERE p.id_parametro > ? AND p.id_parametro <= ?
+        ORDER BY p.id_parametro
+        """,
+        (
+            ("id_parametro", "int64"), ("id_inspeccion", "int64"), ("id_equipo", "int64"),
+            ("parametro", "string"), ("valor", "float64"), ("fecha", "string"),
+            ("id_laboratorista", "int64"), ("anio", "int32"), ("mes", "int32"),
+        ),
+    ),
+}
+
+# Tabla de SQLite de cada tabla del snapshot, para saber hasta qué id copiar
+_ORIGEN = {
+    "certificados": "CERTIFICADO_CALIDAD",
+    "inspecciones": "INSPECCION",
+    "mediciones": "PARAMETRO_ANALISIS",
+}
+
+
+def _pa():
+    """Importa pyarrow solo cuando se escribe o se lee un snapshot."""
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError:
+        raise RuntimeError(
+            "Los snapshots Parquet requieren pyarrow (pip install pyarrow)"
+        ) from None
+    return pa, ds
+
+
+def _schema(pa, columnas: tuple):
+    return pa.schema([(nombre, getattr(pa, tipo)()) for nombre, tipo in columnas])
+
+
+def _particion(pa, ds):
+    return ds.partitioning(pa.schema([("anio", pa.int32()), ("mes", pa.int32())]), flavor="hive")
+
+
+def _leer_estado(directorio: str) -> dict[str, int]:
+    try:
+        with open(os.path.join(directorio, ESTADO), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _guardar_estado(directorio: str, estado: dict[str, int]) -> None:
+    """Escritura atómica: un corte a mitad de corrida deja el estado anterior."""
+    ruta = os.path.join(directorio, ESTADO)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(estado, f, indent=2)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def _limpiar_huerfanos(raiz: str, ultimo: int) -> None:
+    """
+    Borra archivos de una corrida que no llegó a guardar el estado (su
+    primer id es mayor que el último registrado), para no duplicar filas.
+    """
+    for carpeta, _, archivos in os.walk(raiz):
+        for nombre in archivos:
+            if nombre.startswith("part-") and int(nombre.split("-")[1]) > ultimo:
+                os.remove(os.path.join(carpeta, nombre))
+
+
+def _ultimo_id(tabla: str) -> int:
+    clave = TABLAS[tabla][0].split(".")[-1]
+    with db_connection() as conn:
+        fila = conn.execute(f"SELECT MAX({clave}) FROM {_ORIGEN[tabla]}").fetchone()
+    return fila[0] or 0
+
+
+def _copiar(tabla: str, raiz: str, desde: int, hasta: int, batch: int) -> int:
+    """Copia los ids (desde, hasta] de una tabla; retorna las filas escritas."""
+    pa, ds = _pa()
+    _, sql, columnas = TABLAS[tabla]
+    schema = _schema(pa, columnas)
+    particion = _particion(pa, ds)
+    escritas = 0
+    while desde < hasta:
+        # Transacciones de lectura cortas: no retienen el WAL ni bloquean
+        # el checkpoint mientras se escribe Parquet
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            filas = cursor.execute(sql + " LIMIT ?", (desde, hasta, batch)).fetchall()
+        if not filas:
+            break
+        datos = pa.Table.from_arrays(
+            [pa.array(col, type=campo.type) for col, campo in zip(zip(*filas), schema)],
+            schema=schema,
+        )
+        ds.write_dataset(
+            datos,
+            raiz,
+            format="parquet",
+            partitioning=particion,
+            # El primer id en el nombre permite detectar archivos huérfanos
+            basename_template=f"part-{filas[0][0]:012d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        escritas += len(filas)
+        desde = filas[-1][0]
+    return escritas
+
+
+def write_snapshot(
+    directorio: str | None = None,
+    *,
+    tablas: tuple[str, ...] = tuple(TABLAS),
+    rebuild: bool = False,
+    batch: int | None = None,
+) -> dict[str, int]:
+    """
+    Escribe en Parquet las filas nuevas desde el último snapshot.
+
+    Parámetros:
+    - directorio: raíz de los snapshots (SNAPSHOT_DIR por defecto).
+    - tablas: subconjunto de "certificados", "inspecciones", "mediciones".
+    - rebuild: borra el snapshot de esas tablas y lo escribe completo.
+    - batch: filas por bloque leído de SQLite (SNAPSHOT_BATCH por defecto).
+
+    Retorna:
+    - dict {tabla: filas escritas en esta corrida}.
+
+    Lanza:
+    - RuntimeError si pyarrow no está instalado.
+    - ValueError si se pide una tabla desconocida.
+    """
+    _pa()
+    directorio = directorio or SNAPSHOT_DIR
+    desconocidas = set(tablas) - set(TABLAS)
+    if desconocidas:
+        raise ValueError(f"Tablas desconocidas: {', '.join(sorted(desconocidas))}")
+    os.makedirs(directorio, exist_ok=True)
+
+    estado = _leer_estado(directorio)
+    resultado = {}
+    for tabla in tablas:
+        raiz = os.path.join(directorio, tabla)
+        if rebuild:
+            shutil.rmtree(raiz, ignore_errors=True)
+            estado.pop(tabla, None)
+        desde = estado.get(tabla, 0)
+        _limpiar_huerfanos(raiz, desde)
+        hasta = _ultimo_id(tabla)
+        resultado[tabla] = _copiar(tabla, raiz, desde, hasta, batch or SNAPSHOT_BATCH)
+        estado[tabla] = max(desde, hasta)
+        _guardar_estado(directorio, estado)
+    return resultado
+
+
+def _filtro_fechas(ds, columna: str, desde: str | None, hasta: str | None):
+    """Filtro por rango de fechas ISO que además poda particiones año/mes."""
+    condiciones = []
+    anio, mes = ds.field("anio"), ds.field("mes")
+    if desde:
+        a, m = int(desde[:4]), int(desde[5:7])
+        condiciones += [(anio > a) | ((anio == a) & (mes >= m)), ds.field(columna) >= desde]
+    if hasta:
+        a, m = int(hasta[:4]), int(hasta[5:7])
+        condiciones += [(anio < a) | ((anio == a) & (mes <= m)), ds.field(columna) <= hasta]
+    return functools.reduce(operator.and_, condiciones) if condiciones else None
+
+
+def load_table(
+    tabla: str,
+    *,
+    columnas: list[str] | None = None,
+    desde: str | None = None,
+    hasta: str | None = None,
+    filtro=None,
+    directorio: str | None = None,
+):
+    """
+    Lee una tabla del snapshot como pyarrow.Table, con los archivos
+    mapeados en memoria.
+
+    Parámetros:
+    - tabla: "certificados", "inspecciones" o "mediciones".
+    - columnas: columnas a leer (todas por defecto); solo se leen esas.
+    - desde, hasta: rango de fechas ISO (fecha_envio o fecha), inclusive.
+    - filtro: expresión adicional de pyarrow.dataset (e.g. ds.field("id_equipo") == 3).
+    - directorio: raíz de los snapshots (SNAPSHOT_DIR por defecto).
+
+    Retorna:
+    - pyarrow.Table (vacía, con el esquema de la tabla, si aún no hay snapshot).
+      En mediciones, solo la última escritura de cada (inspección, parámetro).
+    """
+    pa, ds = _pa()
+    if tabla not in TABLAS:
+        raise ValueError(f"Tabla desconocida: {tabla}")
+    schema = _schema(pa, TABLAS[tabla][2])
+    raiz = os.path.join(directorio or SNAPSHOT_DIR, tabla)
+    if not os.path.isdir(raiz):
+        vacia = schema.empty_table()
+        return vacia.select(columnas) if columnas else vacia
+
+    from pyarrow import fs
+
+    dataset = ds.dataset(
+        raiz,
+        schema=schema,
+        format="parquet",
+        partitioning=_particion(pa, ds),
+        filesystem=fs.LocalFileSystem(use_mmap=True),  # Lectura con memory map
+    )
+    fecha = "fecha_envio" if tabla == "certificados" else "fecha"
+    expr = _filtro_fechas(ds, fecha, desde, hasta)
+    if filtro is not None:
+        expr = filtro if expr is None else expr & filtro
+    if tabla == "mediciones":
+        vigentes = _mediciones_vigentes(dataset, ds)
+        if vigentes is not None:
+            expr = vigentes if expr is None else vigentes & expr
+    return dataset.to_table(columns=columnas, filter=expr)
+
+
+def _mediciones_vigentes(dataset, ds):
+    """
+    Filtro que descarta las mediciones reemplazadas por una escritura más
+    reciente de la misma (inspección, parámetro), o None si no hay. Se
+    calcula sobre todas las particiones y antes de los demás filtros, porque
+    la edición pudo cambiar la fecha, el equipo o el valor de la inspección.
+    """
+    import numpy as np  # Ya cargado por pyarrow
+
+    claves = dataset.to_table(columns=["id_parametro", "id_inspeccion", "parametro"])
+    if claves.num_rows < 2:
+        return None
+    nombres = claves.column("parametro").combine_chunks().dictionary_encode()
+    clave = (
+        claves.column("id_inspeccion").to_numpy() * len(nombres.dictionary)
+        + nombres.indices.to_numpy(zero_copy_only=False)
+    )
+    ids = claves.column("id_parametro").to_numpy()
+    orden = np.lexsort((ids, clave))
+    # Con el mismo (inspección, parámetro) que la siguiente: ya reemplazada
+    repetida = clave[orden[:-1]] == clave[orden[1:]]
+    if not repetida.any():
+        return None
+    return ~ds.field("id_parametro").isin(ids[orden[:-1][repetida]])
+
+
+def load_measurements(
+    parametro: str | None = None,
+    *,
+    id_equipo: int | None = None,
+    desde: str | None = None,
+    hasta: str | None = None,
+    directorio: str | None = None,
+) -> list[tuple[tuple[str, Any], Any]]:
+    """
+    Mediciones del snapshot agrupadas por (parámetro, equipo), con la misma
+    forma que statistics_service.load_measurements: lista de
+    ((parametro, id_equipo), arreglo de NumPy en orden cronológico).
+    """
+    _, ds = _pa()
+    filtro = ds.field("valor").is_valid()
+    if parametro is not None:
+        filtro &= ds.field("parametro") == parametro
+    if id_equipo is not None:
+        filtro &= ds.field("id_equipo") == id_equipo
+    datos = load_table(
+        "mediciones",
+        columnas=["parametro", "id_equipo", "fecha", "id_inspeccion", "valor"],
+        desde=desde,
+        hasta=hasta,
+        filtro=filtro,
+        directorio=directorio,
+    )
+    claves = [("parametro", "ascending"), ("id_equipo", "ascending")]
+    datos = datos.sort_by(claves + [("fecha", "ascending"), ("id_inspeccion", "ascending")])
+    grupos = (
+        datos.group_by(["parametro", "id_equipo"], use_threads=False)
+        .aggregate([("valor", "count")])
+        .sort_by(claves)
+    )
+
+    import numpy as np  # Ya cargado por pyarrow
+
+    valores = datos.column("valor").to_numpy()
+    cortes = np.cumsum(grupos.column("valor_count").to_numpy())[:-1]
+    return list(zip(
+        zip(grupos.column("parametro").to_pylist(), grupos.column("id_equipo").to_pylist()),
+        np.split(valores, cortes),
+    ))
@@ -1,6 +1,379 @@
 """
-Servicio de Estadísticas (Implementación Futura)
+Servicio de Estadísticas
 
-Este servicio analizará y generará informes estadísticos basados en los registros de la base de datos.
-Incluirá funcionalidades para leer datos y producir información a través de reportes automatizados.
+Control estadístico de proceso (SPC) de los parámetros de inspección:
+media, desviación estándar, capacidad (Cp/Cpk y Pp/Ppk) contra los límites
+de especificación del cliente (o los de parametros_default.json), cartas
+X̄-R (o I-MR con subgrupos de 1), EWMA y reglas de Western Electric.
+
+Los valores se leen de PARAMETRO_ANALISIS como una sola columna, ordenada
+por parámetro, equipo y fecha, y todos los cálculos se hacen con
+operaciones de NumPy sobre el arreglo completo de cada grupo; no hay
+bucles de Python por medición. NumPy se importa solo al usarse, como en
+la detección de desviaciones por lotes. Con snapshot=True las mediciones
+se leen del snapshot Parquet (snapshot_service) y no de data.db.
 """
+
+import math
+from typing import Any
+
+from db import db_connection
+from services.certificate_service import KNOWN_PARAMS, _load_refs_json
+
+# Constantes de cartas X̄-R por tamaño de subgrupo: (A2, D3, D4, d2)
+XBAR_R = {
+    2: (1.880, 0.000, 3.267, 1.128),
+    3: (1.023, 0.000, 2.574, 1.693),
+    4: (0.729, 0.000, 2.282, 2.059),
+    5: (0.577, 0.000, 2.114, 2.326),
+    6: (0.483, 0.000, 2.004, 2.534),
+    7: (0.419, 0.076, 1.924, 2.704),
+    8: (0.373, 0.136, 1.864, 2.847),
+    9: (0.337, 0.184, 1.816, 2.970),
+    10: (0.308, 0.223, 1.777, 3.078),
+}
+
+SUBGRUPO = 5        # Mediciones consecutivas por subgrupo de la carta X̄-R
+EWMA_LAMBDA = 0.2   # Peso de la medición más reciente en la EWMA
+EWMA_L = 3.0        # Ancho de los límites EWMA, en sigmas
+MAX_PUNTOS = 50     # Índices de puntos fuera de control devueltos por regla
+
+
+def _np():
+    import numpy as np  # Solo se carga si se calculan estadísticas
+    return np
+
+
+def _num(value) -> float | None:
+    """float de Python para JSON; None en lugar de NaN/inf."""
+    if value is None:
+        return None
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def spec_limits(parametro: str, id_cliente: int | None = None) -> tuple[float | None, float | None]:
+    """
+    Límites (inferior, superior) de especificación de un parámetro para un
+    cliente; sin cliente (o sin especificación propia) se usan los defaults.
+    """
+    refs = _load_refs_json(id_cliente or 0)
+    ref = refs.get(KNOWN_PARAMS.get(parametro, ""), {}).get(parametro, {})
+    return ref.get("inf"), ref.get("sup")
+
+
+def _capacidad(media: float, sigma: float, lsl, usl) -> tuple[float | None, float | None]:
+    """Índice de capacidad potencial (Cp) y real (Cpk) para un sigma dado."""
+    if not sigma or not math.isfinite(sigma):
+        return None, None
+    cp = (usl - lsl) / (6 * sigma) if lsl is not None and usl is not None else None
+    lados = []
+    if usl is not None:
+        lados.append((usl - media) / (3 * sigma))
+    if lsl is not None:
+        lados.append((media - lsl) / (3 * sigma))
+    return _num(cp), _num(min(lados)) if lados else None
+
+
+def ewma(values, lam: float = EWMA_LAMBDA, inicio: float | None = None):
+    """
+    Serie EWMA z_t = λ·x_t + (1 − λ)·z_{t−1}, con z_{−1} = `inicio` (la media si es None).
+
+    Se evalúa por bloques: dentro de cada bloque la recurrencia se resuelve con
+    una suma acumulada escalada por potencias de (1 − λ), y solo el valor
+    final pasa de un bloque al siguiente. El tamaño de bloque se elige para que
+    las potencias no desborden un float64.
+    """
+    np = _np()
+    x = np.asarray(values, dtype=float)
+    if x.size == 0:
+        return x
+    z0 = float(x.mean()) if inicio is None else float(inicio)
+    if lam >= 1.0:
+        return x.copy()
+    decay = 1.0 - lam
+    bloque = int(max(1, min(1024, 200 * math.log(10) / -math.log(decay))))
+    j = np.arange(bloque, dtype=float)
+    crece = decay ** -j           # (1 − λ)^(−j)
+    decae = decay ** j            # (1 − λ)^j
+    decae1 = decae * decay        # (1 − λ)^(j+1)
+
+    z = np.empty_like(x)
+    anterior = z0
+    for start in range(0, x.size, bloque):
+        tramo = x[start:start + bloque]
+        m = tramo.size
+        acumulado = np.cumsum(tramo * crece[:m])
+        z[start:start + m] = decae1[:m] * anterior + lam * decae[:m] * acumulado
+        anterior = z[start + m - 1]
+    return z
+
+
+def _ventanas(flags, ancho: int, minimo: int):
+    """Posiciones donde al menos `minimo` de las últimas `ancho` banderas están activas."""
+    np = _np()
+    if flags.size < ancho:
+        return np.zeros(0, dtype=np.int64)
+    sumas = np.convolve(flags.astype(np.int32), np.ones(ancho, dtype=np.int32), "valid")
+    return np.flatnonzero(sumas >= minimo) + ancho - 1
+
+
+def western_electric(points, centro: float, sigma: float) -> dict[str, Any]:
+    """
+    Reglas de Western Electric sobre una carta con línea central `centro` y
+    desviación `sigma` de los puntos graficados:
+
+    1. Un punto fuera de ±3σ.
+    2. Dos de tres puntos consecutivos más allá de 2σ, del mismo lado.
+    3. Cuatro de cinco puntos consecutivos más allá de 1σ, del mismo lado.
+    4. Ocho puntos consecutivos del mismo lado de la línea central.
+
+    Retorna {"regla_N": {"violaciones": int, "puntos": [índices]}}, donde cada
+    índice es el punto que completa la ventana que viola la regla.
+    """
+    np = _np()
+    p = np.asarray(points, dtype=float)
+    if not sigma or not math.isfinite(sigma) or p.size == 0:
+        return {f"regla_{n}": {"violaciones": 0, "puntos": []} for n in (1, 2, 3, 4)}
+    z = (p - centro) / sigma
+
+    def por_lado(umbral, ancho, minimo):
+        arriba = _ventanas(z > umbral, ancho, minimo)
+        abajo = _ventanas(z < -umbral, ancho, minimo)
+        return np.union1d(arriba, abajo)
+
+    reglas = {
+        1: np.flatnonzero(np.abs(z) > 3),
+        2: por_lado(2, 3, 2),
+        3: por_lado(1, 5, 4),
+        4: por_lado(0, 8, 8),
+    }
+    return {
+        f"regla_{n}": {"violaciones": int(idx.size), "puntos": idx[:MAX_PUNTOS].tolist()}
+        for n, idx in reglas.items()
+    }
+
+
+def spc_metrics(
+    values,
+    lsl: float | None = None,
+    usl: float | None = None,
+    *,
+    subgrupo: int = SUBGRUPO,
+    lam: float = EWMA_LAMBDA,
+    L: float = EWMA_L,
+) -> dict[str, Any]:
+    """
+    Métricas SPC de una serie de mediciones en orden cronológico.
+
+    Parámetros:
+    - values: mediciones (lista o arreglo); los NaN se descartan.
+    - lsl, usl: límites inferior y superior de especificación (pueden faltar).
+    - subgrupo: tamaño de subgrupo de la carta X̄-R (1 = carta I-MR).
+    - lam, L: peso y ancho (en sigmas) de la carta EWMA.
+
+    Retorna:
+    - dict con n, media, desviacion, sigma_dentro, cp, cpk, pp, ppk, xbar_r,
+      ewma y western_electric (aplicadas a los puntos de la carta X̄ o I).
+    """
+    np = _np()
+    x = np.asarray(values, dtype=float)
+    x = x[~np.isnan(x)]
+    n = int(x.size)
+    resultado: dict[str, Any] = {"n": n, "lsl": _num(lsl), "usl": _num(usl)}
+    if n == 0:
+        return resultado
+
+    media = float(x.mean())
+    desviacion = float(x.std(ddof=1)) if n > 1 else float("nan")
+
+    # Carta X̄-R con subgrupos consecutivos (el sobrante final se descarta),
+    # o I-MR (rango móvil de 2) cuando el subgrupo es 1.
+    k = int(subgrupo)
+    if k <= 1:
+        puntos = x
+        rangos = np.abs(np.diff(x))
+        A2, D3, D4, d2 = 2.660, 0.0, 3.267, 1.128
+    else:
+        if k not in XBAR_R:
+            raise ValueError(f"subgrupo debe estar entre 1 y {max(XBAR_R)}")
+        m = n // k
+        grupos = x[: m * k].reshape(m, k)
+        puntos = grupos.mean(axis=1)
+        rangos = np.ptp(grupos, axis=1)
+        A2, D3, D4, d2 = XBAR_R[k]
+
+    if puntos.size and rangos.size:
+        centro = float(puntos.mean())
+        r_medio = float(rangos.mean())
+        sigma_dentro = r_medio / d2
+        sigma_puntos = A2 * r_medio / 3  # σ de los puntos graficados
+        lcl, ucl = centro - A2 * r_medio, centro + A2 * r_medio
+        resultado["xbar_r"] = {
+            "subgrupo": max(k, 1),
+            "puntos": int(puntos.size),
+            "centro": _num(centro),
+            "lcl": _num(lcl),
+            "ucl": _num(ucl),
+            "r_medio": _num(r_medio),
+            "r_lcl": _num(D3 * r_medio),
+            "r_ucl": _num(D4 * r_medio),
+            "fuera": int(np.count_nonzero((puntos < lcl) | (puntos > ucl))),
+        }
+        resultado["western_electric"] = western_electric(puntos, centro, sigma_puntos)
+    else:
+        sigma_dentro = float("nan")
+
+    # EWMA de las mediciones individuales, con límites que se abren hasta
+    # su valor asintótico μ ± Lσ·√(λ / (2 − λ)).
+    z = ewma(x, lam, inicio=media)
+    sigma_ewma = sigma_dentro if math.isfinite(sigma_dentro) else desviacion
+    t = np.arange(1, n + 1, dtype=float)
+    ancho = L * sigma_ewma * np.sqrt(lam / (2 - lam) * (1 - (1 - lam) ** (2 * t)))
+    fuera = np.abs(z - media) > ancho if math.isfinite(sigma_ewma) else np.zeros(n, bool)
+    resultado["ewma"] = {
+        "lambda": lam,
+        "L": L,
+        "ultimo": _num(z[-1]),
+        "lcl": _num(media - ancho[-1]),
+        "ucl": _num(media + ancho[-1]),
+        "fuera": int(np.count_nonzero(fuera)),
+        "puntos": np.flatnonzero(fuera)[:MAX_PUNTOS].tolist(),
+    }
+
+    # Cp/Cpk con la variación dentro de subgrupos; Pp/Ppk con la total
+    cp, cpk = _capacidad(media, sigma_dentro, lsl, usl)
+    pp, ppk = _capacidad(media, desviacion, lsl, usl)
+    resultado.update(
+        media=_num(media),
+        desviacion=_num(desviacion),
+        sigma_dentro=_num(sigma_dentro),
+        minimo=_num(x.min()),
+        maximo=_num(x.max()),
+        cp=cp, cpk=cpk, pp=pp, ppk=ppk,
+    )
+    return resultado
+
+
+def load_measurements(
+    parametro: str | None = None,
+    *,
+    id_equipo: int | None = None,
+    desde: str | None = None,
+    hasta: str | None = None,
+    conn=None,
+):
+    """
+    Mediciones de PARAMETRO_ANALISIS agrupadas por (parámetro, equipo).
+
+    Retorna:
+    - Lista de ((parametro, id_equipo), arreglo de valores en orden cronológico).
+      Los valores se leen como una sola columna y se separan por los conteos
+      de cada grupo, sin recorrer las filas en Python.
+    """
+    if conn is None:
+        with db_connection() as pooled:
+            return load_measurements(
+                parametro, id_equipo=id_equipo, desde=desde, hasta=hasta, conn=pooled
+            )
+    np = _np()
+    where, params = ["p.valor IS NOT NULL"], []
+    if parametro is not None:
+        where.append("p.parametro_analizado = ?")
+        params.append(parametro)
+    if id_equipo is not None:
+        where.append("p.id_equipo_laboratorio = ?")
+        params.append(id_equipo)
+    if desde:
+        where.append("i.fecha >= ?")
+        params.append(desde)
+    if hasta:
+        where.append("i.fecha <= ?")
+        params.append(hasta)
+    origen = f"""
+        FROM PARAMETRO_ANALISIS AS p
+        JOIN INSPECCION AS i ON i.id_inspeccion = p.id_inspeccion
+        WHERE {" AND ".join(where)}
+    """
+    # Conteos y valores en una sola transacción de lectura: con WAL ambas
+    # consultas ven el mismo snapshot aunque otro proceso inserte entre ellas.
+    # Si quien llama ya abrió una transacción, se lee dentro de la suya.
+    propia = not conn.in_transaction
+    if propia:
+        conn.execute("BEGIN")
+    try:
+        grupos = conn.execute(
+            f"""
+            SELECT p.parametro_analizado, p.id_equipo_laboratorio, COUNT(*)
+            {origen}
+            GROUP BY p.parametro_analizado, p.id_equipo_laboratorio
+            ORDER BY p.parametro_analizado, p.id_equipo_laboratorio
+            """,
+            params,
+        ).fetchall()
+        total = sum(g[2] for g in grupos)
+        # Cursor de tuplas: evita crear un sqlite3.Row por medición
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(
+            f"""
+            SELECT p.valor
+            {origen}
+            ORDER BY p.parametro_analizado, p.id_equipo_laboratorio, i.fecha, p.id_inspeccion
+            """,
+            params,
+        )
+        valores = np.fromiter((row[0] for row in cursor), dtype=float, count=total)
+    finally:
+        if propia:
+            conn.commit()
+    cortes = np.cumsum([g[2] for g in grupos])[:-1]
+    return [
+        ((g[0], g[1]), serie) for g, serie in zip(grupos, np.split(valores, cortes))
+    ]
+
+
+def spc_report(
+    parametro: str | None = None,
+    *,
+    id_cliente: int | None = None,
+    id_equipo: int | None = None,
+    desde: str | None = None,
+    hasta: str | None = None,
+    subgrupo: int = SUBGRUPO,
+    lam: float = EWMA_LAMBDA,
+    L: float = EWMA_L,
+    snapshot: bool = False,
+    conn=None,
+) -> list[dict]:
+    """
+    Reporte SPC por parámetro y equipo.
+
+    Parámetros:
+    - parametro: un parámetro (e.g., "W") o None para todos.
+    - id_cliente: cliente cuyos límites de especificación se usan para Cp/Cpk
+      (None = parametros_default.json).
+    - id_equipo, desde, hasta: filtros opcionales de equipo y periodo (fechas ISO).
+    - subgrupo, lam, L: configuración de las cartas (ver spc_metrics).
+    - snapshot: leer las mediciones del snapshot Parquet (snapshot_service)
+      en lugar de data.db.
+
+    Retorna:
+    - Lista de dicts con parametro, id_equipo y las métricas de spc_metrics.
+    """
+    if snapshot:
+        from services import snapshot_service
+
+        grupos = snapshot_service.load_measurements(
+            parametro, id_equipo=id_equipo, desde=desde, hasta=hasta
+        )
+    else:
+        grupos = load_measurements(
+            parametro, id_equipo=id_equipo, desde=desde, hasta=hasta, conn=conn
+        )
+    reporte = []
+    for (nombre, equipo), valores in grupos:
+        lsl, usl = spec_limits(nombre, id_cliente)
+        metricas = spc_metrics(valores, lsl, usl, subgrupo=subgrupo, lam=lam, L=L)
+        reporte.append({"parametro": nombre, "id_equipo": equipo, **metricas})
+    return reporte
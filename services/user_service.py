@@ -5,7 +5,28 @@ Maneja las operaciones de base de datos relacionadas con los usuarios, incluyend
 lectura, actualización y eliminación de registros.
 Este servicio también permite recuperar todos los IDs de usuarios o buscar usuarios con parámetros específicos.
 """
-from db import db_connection
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from db import db_connection, data_version, keyset_page, PAGE_SIZE
+
+# Caché de usuarios para el user_loader de Flask-Login, que se ejecuta en
+# cada petición autenticada. Cada entrada vive USER_CACHE_TTL segundos; la
+# caché completa se vacía al editar o eliminar un usuario en este proceso y,
+# para cambios hechos en otros workers, cuando cambia el contador 'usuarios'
+# de VERSION_DATOS (lo incrementan los triggers de USUARIO). Esa revisión se
+# hace como máximo cada USER_CACHE_CHECK_INTERVAL segundos.
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "300"))
+USER_CACHE_CHECK_INTERVAL = 2.0
+
+_user_cache: OrderedDict = OrderedDict()  # id -> (expira_en, dict)
+_user_cache_lock = threading.Lock()
+_user_cache_version = None
+_user_cache_checked_at = 0.0
+_user_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
 
 
 def create_user(mail: str, contrasena: str, rol: str, nombre: str) -> int | None:
@@ -69,14 +90,83 @@ def get_user(user_id: int) -> dict | None:
     return None
 
 
-def update_user(user_id: int, mail: str, contrasena: str, rol: str, nombre: str) -> int:
+def invalidate_user_cache(user_id: int | None = None) -> None:
+    """Descarta de la caché un usuario (o todos)."""
+    with _user_cache_lock:
+        if user_id is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(int(user_id), None)
+        _user_cache_stats["invalidations"] += 1
+
+
+def user_cache_stats() -> dict:
+    """Contadores de la caché de usuarios: hits, misses, invalidations, size."""
+    with _user_cache_lock:
+        return {**_user_cache_stats, "size": len(_user_cache)}
+
+
+def _check_user_version() -> None:
+    """Vacía la caché si otro proceso editó o eliminó usuarios."""
+    global _user_cache_version, _user_cache_checked_at
+    now = time.monotonic()
+    if now - _user_cache_checked_at < USER_CACHE_CHECK_INTERVAL:
+        return
+    version = data_version("usuarios")
+    with _user_cache_lock:
+        _user_cache_checked_at = now
+        if version != _user_cache_version:
+            if _user_cache:
+                _user_cache_stats["invalidations"] += 1
+            _user_cache.clear()
+            _user_cache_version = version
+
+
+def get_user_cached(user_id: int) -> dict | None:
+    """
+    Igual que get_user, pero sin la contraseña y servido desde la caché
+    mientras la entrada no haya expirado ni cambiado la versión de usuarios.
+    Pensada para el user_loader; los usuarios inexistentes no se guardan.
+    """
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    _check_user_version()
+    now = time.monotonic()
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+        if entry is not None and entry[0] > now:
+            _user_cache.move_to_end(user_id)
+            _user_cache_stats["hits"] += 1
+            return dict(entry[1])
+        _user_cache_stats["misses"] += 1
+
+    with db_connection() as conn:
+        row = conn.execute(
+            "SELECT id_usuario, mail, rol, nombre FROM USUARIO WHERE id_usuario = ?",
+            (user_id,),
+        ).fetchone()
+    user = dict(row) if row else None
+    if user is not None:
+        with _user_cache_lock:
+            _user_cache[user_id] = (now + USER_CACHE_TTL, user)
+            _user_cache.move_to_end(user_id)
+            while len(_user_cache) > max(0, USER_CACHE_SIZE):
+                _user_cache.popitem(last=False)
+        return dict(user)
+    return None
+
+
+def update_user(user_id: int, mail: str, contrasena: str | None, rol: str, nombre: str) -> int:
     """
     Actualiza la información de un usuario en la base de datos.
 
     Parámetros:
     - user_id (int): ID del usuario a actualizar.
     - mail (str): Nuevo correo electrónico del usuario.
-    - contrasena (str): Nueva contraseña del usuario (debería estar hasheada en producción).
+    - contrasena (str | None): Nueva contraseña del usuario (debería estar hasheada en
+      producción); None conserva la actual.
     - rol (str): Nuevo rol del usuario.
     - nombre (str): Nuevo nombre del usuario.
 
@@ -90,11 +180,12 @@ def update_user(user_id: int, mail: str, contrasena: str, rol: str, nombre: str)
         cursor = conn.cursor()
         query = """
             UPDATE USUARIO
-            SET mail = ?, contrasena = ?, rol = ?, nombre = ?
+            SET mail = ?, contrasena = COALESCE(?, contrasena), rol = ?, nombre = ?
             WHERE id_usuario = ?
         """
         cursor.execute(query, (mail, contrasena, rol, nombre, user_id))
         affected_rows = cursor.rowcount
+    invalidate_user_cache(user_id)
     return affected_rows
 
 
@@ -116,6 +207,7 @@ def delete_user(user_id: int) -> int:
         """
         cursor.execute(query, (user_id,))
         affected_rows = cursor.rowcount
+    invalidate_user_cache(user_id)
     return affected_rows
 
 
@@ -157,3 +249,27 @@ def list_users() -> list:
         }
         for row in rows
     ]
+
+
+def list_users_page(
+    after: int | None = None, before: int | None = None, limit: int = PAGE_SIZE
+) -> dict:
+    """
+    Obtiene una página de usuarios, del más reciente al más antiguo.
+
+    Parámetros:
+    - after: id_usuario a partir del cual continuar (página siguiente).
+    - before: id_usuario a partir del cual retroceder (página anterior).
+    - limit: número máximo de usuarios por página.
+
+    Retorna:
+    - dict: "items" con los usuarios de la página (sin contraseña) y los cursores
+      "next" y "prev".
+    """
+    with db_connection() as conn:
+        return keyset_page(
+            conn,
+            "SELECT id_usuario, mail, rol, nombre FROM USUARIO",
+            "id_usuario",
+            after=after, before=before, limit=limit,
+        )
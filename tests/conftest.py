@@ -1,7 +1,13 @@
 # tests/conftest.py
+import itertools
+
 import pytest
 import db
 
+# Ids handed out by new_id(): far above anything the tests insert through
+# AUTOINCREMENT, and never the same twice in a session.
+_unused_ids = itertools.count(1_000_000)
+
 
 @pytest.fixture(scope="session", autouse=True)
 def configure_test_db(tmp_path_factory):
@@ -16,9 +22,22 @@ def configure_test_db(tmp_path_factory):
 def fresh_db():
     """
     This fixture runs before each test function.
-    It creates a new in-memory database schema so each test is isolated.
+    It makes sure the schema is up to date and hands the test a connection.
+
+    The database file is shared by the whole session: rows written by
+    earlier tests are still there. Tests that count or filter rows by
+    laboratorista or equipment should use ids from new_id().
     """
     with db.db_connection() as conn:
         db.init_db()
         # Test runs here
         yield conn
+
+
+@pytest.fixture
+def new_id():
+    """
+    Returns a function that gives an id (laboratorista, equipment, ...) no
+    other test uses, so queries filtered by it only see this test's rows.
+    """
+    return lambda: next(_unused_ids)
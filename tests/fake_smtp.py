@@ -0,0 +1,98 @@
+# tests/fake_smtp.py
+"""
+Minimal in-process SMTP server for tests and benchmarks.
+
+Speaks just enough plain-text SMTP for smtplib: EHLO/HELO, AUTH PLAIN/LOGIN,
+MAIL, RCPT, DATA, RSET, NOOP and QUIT. Received messages are kept in
+`server.messages` as (mail_from, rcpt_tos, data) tuples.
+"""
+import socketserver
+import threading
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write((line + "\r\n").encode())
+
+    def readline(self) -> str | None:
+        raw = self.rfile.readline()
+        return raw.decode("utf-8", "replace").rstrip("\r\n") if raw else None
+
+    def handle(self):
+        srv = self.server
+        with srv.lock:
+            srv.sessions += 1
+        self.reply("220 fake-smtp ready")
+        mail_from, rcpts = None, []
+        while True:
+            line = self.readline()
+            if line is None:
+                return
+            verb = line.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-fake-smtp")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif verb == "HELO":
+                self.reply("250 fake-smtp")
+            elif verb == "AUTH":
+                if line.upper().startswith("AUTH LOGIN"):
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.readline()
+                with srv.lock:
+                    srv.logins += 1
+                self.reply("235 Authentication successful")
+            elif verb == "MAIL":
+                mail_from, rcpts = line[10:].strip("<> "), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                rcpts.append(line[8:].strip("<> "))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data_line = self.readline()
+                    if data_line is None or data_line == ".":
+                        break
+                    lines.append(data_line[1:] if data_line.startswith("..") else data_line)
+                with srv.lock:
+                    srv.messages.append((mail_from, rcpts, "\r\n".join(lines)))
+                    drop = srv.drop_after is not None and len(srv.messages) >= srv.drop_after
+                    if drop:
+                        srv.drop_after = None
+                self.reply("250 OK queued")
+                if drop:  # Simulate the server closing an idle session
+                    return
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """Run with `with FakeSMTPServer() as server:`; listens on server.port."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.sessions = 0
+        self.logins = 0
+        self.drop_after = None  # Close the connection after this many messages
+        self.port = self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -6,6 +6,7 @@ from services.certificate_service import (
     update_certificate,
     delete_certificate,
     list_certificates,
+    list_certificates_page,
 )
 from services.client_service import create_client  # Needed to create test clients
 from services.inspection_service import (
@@ -255,3 +256,211 @@ def test_list_certificates(fresh_db):
     certificate_count = cursor.fetchone()[0]
 
     assert certificate_count >= 2  # Ensure at least two certificates exist in the table
+
+
+def test_certificate_page_includes_client_name(fresh_db):
+    """
+    Test that the paged listing carries each certificate's client name from the join.
+    """
+    client_id = create_client(
+        "Nombre Unido S.A.", "RFCJOIN01", "", "", True, True, "pw", None, False, {}
+    )
+    cert_id = create_certificate(
+        client_id, 1, "SEQ", "PO", 1.0, 1.0, "INV", "2024-07-01", "", "{}", "", "", "qa@example.com"
+    )
+    orphan_id = create_certificate(
+        999999, 1, "SEQ", "PO", 1.0, 1.0, "INV", "2024-07-01", "", "{}", "", "", "qa@example.com"
+    )
+
+    page = list_certificates_page(after=orphan_id + 1, limit=2)
+    names = {c["id_certificado"]: c["nombre_cliente"] for c in page["items"]}
+    assert names == {orphan_id: None, cert_id: "Nombre Unido S.A."}
+
+
+@pytest.fixture
+def client_specs(tmp_path, monkeypatch):
+    """
+    Give client 7 custom W limits, point defaults at a temporary file and
+    start with an empty spec cache.
+    """
+    import json
+    import services.certificate_service as cs
+    from services.client_service import save_client_specs
+
+    defaults = tmp_path / "parametros_default.json"
+    defaults.write_text(json.dumps({"alveografo": {"W": {"inf": 180, "sup": 350}}}))
+    monkeypatch.setattr(cs, "DEFAULT_PATH", str(defaults))
+    save_client_specs(7, {"alveografo": {"W": {"inf": 100, "sup": 200}}})
+    cs.invalidate_spec_cache()
+    yield 7
+    save_client_specs(7, {})
+    cs.invalidate_spec_cache()
+
+
+def test_spec_cache_hits_and_misses(client_specs):
+    """
+    Test that repeated deviation checks for a client are served from the cache.
+    """
+    from services.certificate_service import build_desviaciones, spec_cache_stats
+
+    before = spec_cache_stats()
+    assert build_desviaciones(7, {"W": 250}, "") == (True, "W alto (250.0 > 200.0)")
+    assert build_desviaciones(7, {"W": 150}, "ok") == (False, "ok")
+    # Client without custom limits falls back to the defaults
+    assert build_desviaciones(8, {"W": 150}, "") == (True, "W bajo (150.0 < 180)")
+    after = spec_cache_stats()
+
+    assert after["misses"] - before["misses"] == 2
+    assert after["hits"] - before["hits"] == 1
+
+
+def test_spec_cache_invalidated_by_build_config_json(client_specs):
+    """
+    Test that saving new client limits is visible to the next deviation check.
+    """
+    from services.certificate_service import build_desviaciones
+    from services.client_service import build_config_json
+
+    assert build_desviaciones(7, {"W": 250}, "")[0] is True
+    build_config_json(True, {"alveo_W_inf": "100", "alveo_W_sup": "300"}, 7)
+    assert build_desviaciones(7, {"W": 250}, "") == (False, "")
+
+
+def test_spec_cache_invalidated_by_other_writers(client_specs, monkeypatch):
+    """
+    Test that a spec change committed by another process is picked up
+    through the 'especificaciones' data version.
+    """
+    import sqlite3
+    import db
+    import services.certificate_service as cs
+
+    monkeypatch.setattr(cs, "SPEC_CACHE_CHECK_INTERVAL", 0)
+    assert cs.build_desviaciones(7, {"W": 250}, "")[0] is True
+
+    other = sqlite3.connect(db.DB_PATH)  # Bypasses invalidate_spec_cache
+    other.execute(
+        "UPDATE CLIENTE_ESPECIFICACION SET sup = 999 WHERE id_cliente = 7 AND parametro = 'W'"
+    )
+    other.commit()
+    other.close()
+
+    assert cs.build_desviaciones(7, {"W": 250}, "") == (False, "")
+
+
+def test_save_client_specs_upserts_and_prunes(client_specs, fresh_db):
+    """
+    Test that saving a config replaces the client's previous parameter set.
+    """
+    from services.client_service import save_client_specs
+
+    save_client_specs(7, {"farinografo": {"estabilidad": {"inf": 5.0, "sup": 10.0}}})
+
+    cursor = fresh_db.cursor()
+    cursor.execute(
+        "SELECT instrumento, parametro, inf, sup FROM CLIENTE_ESPECIFICACION WHERE id_cliente = 7"
+    )
+    rows = [tuple(r) for r in cursor.fetchall()]
+    assert rows == [("farinografo", "estabilidad", 5.0, 10.0)]
+
+
+def test_detect_devs_batch_matches_build_desviaciones(client_specs):
+    """
+    Test that the batch engine yields exactly the deviations of the per-row path.
+    """
+    import json
+    import random
+    from services.certificate_service import (
+        KNOWN_PARAMS,
+        build_desviaciones,
+        detect_devs_batch,
+    )
+
+    rng = random.Random(42)
+    pairs = [
+        (7, {"W": 250}),
+        (8, {"alveografo": {"W": 100}, "farinografo": {"estabilidad": 20}}),
+        (8, json.dumps({"W": "abc", "P": None, "L": "95"})),
+        (8, "not json"),
+        (8, None),
+        (7, {"W": float("nan")}),
+    ]
+    for _ in range(300):
+        row = {p: round(rng.uniform(0, 400), 2) for p in KNOWN_PARAMS if rng.random() < 0.7}
+        pairs.append((rng.choice([7, 8]), row))
+
+    batch = detect_devs_batch(pairs)
+
+    assert len(batch) == len(pairs)
+    for (client_id, resultados), devs in zip(pairs, batch):
+        has_devs, text = build_desviaciones(client_id, resultados, "")
+        assert (", ".join(devs) if devs else "") == (text if has_devs else "")
+
+
+def test_certificate_page_is_scoped_to_laboratorista(fresh_db, new_id):
+    """
+    Test that a non-admin's page only holds certificates of their own inspections.
+    """
+    mine, other = new_id(), new_id()
+    cursor = fresh_db.cursor()
+    inspections = {}
+    for lab in (mine, other):
+        cursor.execute(
+            "INSERT INTO INSPECCION (numero_lote, fecha, id_laboratorista) VALUES (?, ?, ?)",
+            (f"LAB-{lab}", "2024-01-01", lab),
+        )
+        inspections[lab] = cursor.lastrowid
+    fresh_db.commit()
+
+    owned = {mine: [], other: []}
+    for n in range(6):
+        lab = mine if n % 3 else other
+        owned[lab].append(create_certificate(
+            1, inspections[lab], "SEQ", "PO", 1.0, 1.0, "INV", "2024-01-01", "", "{}", "", "", "qa@example.com"
+        ))
+
+    # Certificates from other tests may point at the same inspection ids
+    expected = [r[0] for r in cursor.execute(
+        "SELECT id_certificado FROM CERTIFICADO_CALIDAD WHERE id_inspeccion = ? "
+        "ORDER BY id_certificado DESC", (inspections[mine],)
+    ).fetchall()]
+    seen, page = [], list_certificates_page(limit=3, user_id=mine, rol="Laboratorista")
+    while True:
+        seen += [c["id_certificado"] for c in page["items"]]
+        if page["next"] is None:
+            break
+        page = list_certificates_page(after=page["next"], limit=3, user_id=mine, rol="Laboratorista")
+
+    assert seen == expected
+    assert set(owned[mine]) <= set(seen) and not set(owned[other]) & set(seen)
+
+    admin = list_certificates_page(limit=6, user_id=mine, rol="Admin")
+    assert set(owned[other]) <= {c["id_certificado"] for c in admin["items"]}
+
+
+def test_certificate_lookup_is_scoped_to_laboratorista(fresh_db, new_id):
+    """
+    Test that a non-admin can only load (or poll) certificates of their own inspections.
+    """
+    from services.certificate_service import filter_own_certificates
+
+    lab_a, lab_b = new_id(), new_id()
+    cursor = fresh_db.cursor()
+    cert_ids = {}
+    for lab in (lab_a, lab_b):
+        cursor.execute(
+            "INSERT INTO INSPECCION (numero_lote, fecha, id_laboratorista) VALUES (?, ?, ?)",
+            (f"LAB-{lab}", "2024-01-01", lab),
+        )
+        fresh_db.commit()
+        cert_ids[lab] = create_certificate(
+            1, cursor.lastrowid, "SEQ", "PO", 1.0, 1.0, "INV", "2024-01-01", "", "{}", "", "", "qa@example.com"
+        )
+
+    own, other = cert_ids[lab_a], cert_ids[lab_b]
+    assert get_certificate(own, user_id=lab_a, rol="Laboratorista")["id_certificado"] == own
+    assert get_certificate(other, user_id=lab_a, rol="Laboratorista") is None
+    assert get_certificate(other, user_id=lab_a, rol="Admin") == get_certificate(other)
+
+    assert filter_own_certificates([own, other], lab_a, "Laboratorista") == [own]
+    assert sorted(filter_own_certificates([own, other], lab_a, "Admin")) == sorted([own, other])
@@ -7,6 +7,7 @@ from services.client_service import (
     deactivate_client,
     delete_client,
     list_clients,
+    list_clients_page,
 )
 
 
@@ -156,6 +157,29 @@ def test_list_clients(fresh_db):
     assert client_count >= 2  # Ensure at least two clients exist in the table
 
 
+def test_list_clients_page(fresh_db):
+    """
+    Test that paging through clients returns every client once, newest first.
+    """
+    for n in range(7):
+        create_client(f"Paginado {n}", f"RFCPAG{n}", "", "", True, False, "", None, False, {})
+
+    expected = sorted((c["id_cliente"] for c in list_clients()), reverse=True)
+    seen, page = [], list_clients_page(limit=3)
+    while True:
+        assert len(page["items"]) <= 3
+        seen += [c["id_cliente"] for c in page["items"]]
+        if page["next"] is None:
+            break
+        page = list_clients_page(after=page["next"], limit=3)
+
+    assert seen == expected
+    # Going back from the last page returns the three clients shown just before it
+    end = len(seen) - len(page["items"])
+    back = list_clients_page(before=page["items"][0]["id_cliente"], limit=3)
+    assert [c["id_cliente"] for c in back["items"]] == expected[end - 3:end]
+
+
 def test_deactivate_client(fresh_db):
     """
     Test deactivating a client and verifying that 'activo' is set to 0 and 'motivo_baja' is stored.
@@ -185,3 +209,52 @@ def test_deactivate_client(fresh_db):
     assert row is not None
     assert row["activo"] == 0
     assert row["motivo_baja"] == "Cliente ya no requiere servicio"
+
+
+def test_import_specs_json(fresh_db, tmp_path, monkeypatch):
+    """
+    Test that migration 0003 only imports specs.json entries for clients that exist.
+    """
+    import importlib.util
+    import json
+
+    client_id = create_client(
+        "Cliente Specs",
+        "RFCSPEC1",
+        "Ana Ruiz",
+        "ana.ruiz@example.com",
+        True,
+        True,
+        "pass",
+        None,
+        False,
+        {},
+    )
+    specs = tmp_path / "specs.json"
+    specs.write_text(
+        json.dumps(
+            {
+                str(client_id): {"alveografo": {"W": {"inf": 60.0, "sup": 110.0}}},
+                "999999": {"alveografo": {"W": {"inf": 1.0, "sup": 2.0}}},
+            }
+        )
+    )
+
+    spec = importlib.util.spec_from_file_location(
+        "migration_0003", "migrations/0003_importar_specs_json.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, "SPECS_PATH", str(specs))
+    module.upgrade(fresh_db)
+    fresh_db.commit()
+
+    cursor = fresh_db.cursor()
+    cursor.execute(
+        "SELECT parametro, inf, sup FROM CLIENTE_ESPECIFICACION WHERE id_cliente = ?",
+        (client_id,),
+    )
+    assert [tuple(r) for r in cursor.fetchall()] == [("W", 60.0, 110.0)]
+    cursor.execute("SELECT COUNT(*) FROM CLIENTE_ESPECIFICACION WHERE id_cliente = 999999")
+    assert cursor.fetchone()[0] == 0
+    delete_client(client_id)
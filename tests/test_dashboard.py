@@ -0,0 +1,303 @@
+# tests/test_dashboard.py
+from datetime import date, timedelta
+
+import pytest
+from services import dashboard_service
+from services.certificate_service import create_certificate, update_certificate
+
+DEVIATIONS = ["", None, "pH", "pH, Humedad", "a,,b", " , ", "a, b, c", "a,b,c,d"]
+
+
+@pytest.fixture
+def lab(new_id):
+    return new_id()
+
+
+@pytest.fixture
+def dashboard_data(fresh_db, lab):
+    """
+    Certificates for one laboratorista spread over the last 16 months.
+    """
+    cursor = fresh_db.cursor()
+    cursor.execute(
+        "INSERT INTO INSPECCION (numero_lote, fecha, id_laboratorista) VALUES (?, ?, ?)",
+        ("LOT-DASH", "2024-01-01", lab),
+    )
+    id_inspeccion = cursor.lastrowid
+    fresh_db.commit()
+
+    rows = []
+    for n in range(48):
+        fecha = (date.today() - timedelta(days=10 * n)).isoformat()
+        devs = DEVIATIONS[n % len(DEVIATIONS)]
+        create_certificate(
+            1, id_inspeccion, "SEQ", "PO", 1.0, 1.0, "INV", fecha, fecha, "{}", "", devs, "qa@example.com"
+        )
+        rows.append((fecha, devs))
+    return rows
+
+
+def _expected(rows, months, cutoff):
+    """The previous pandas implementation, row by row."""
+    counts = [
+        len([x for x in (devs or "").split(",") if x.strip()])
+        for fecha, devs in rows
+        if fecha >= cutoff
+    ]
+    return {
+        "3+": sum(c >= 3 for c in counts),
+        "2": sum(c == 2 for c in counts),
+        "1": sum(c == 1 for c in counts),
+        "Total": len(counts),
+        "con_desviaciones": sum(
+            1 for fecha, devs in rows if fecha >= cutoff and (devs or "").strip()
+        ),
+    }
+
+
+def test_summary_matches_row_by_row_counts(fresh_db, dashboard_data, lab):
+    """
+    Test that the single-pass aggregation matches the previous per-row counting.
+    """
+    summary = dashboard_service.deviation_summary(
+        fresh_db, user_id=lab, is_manager=False, windows=(3, 6, 12, 24)
+    )
+
+    for months in (3, 6, 12, 24):
+        cutoff = fresh_db.execute("SELECT date('now', ?)", (f"-{months} months",)).fetchone()[0]
+        assert summary[months] == _expected(dashboard_data, months, cutoff), months
+
+    assert dashboard_service.counts_by_dev(
+        fresh_db, user_id=lab, is_manager=False, months=6
+    ) == {k: summary[6][k] for k in ("3+", "2", "1", "Total")}
+    assert dashboard_service.count_certificados(
+        fresh_db, user_id=lab, is_manager=False, months=12
+    ) == summary[12]["Total"]
+
+
+def test_update_recounts_deviations(fresh_db, dashboard_data):
+    """
+    Test that editing the deviations text keeps num_desviaciones in sync.
+    """
+    cert_id = fresh_db.execute(
+        "SELECT MAX(id_certificado) FROM CERTIFICADO_CALIDAD"
+    ).fetchone()[0]
+    update_certificate(
+        cert_id, 1, 1, "SEQ", "PO", 1.0, 1.0, "INV", "2024-01-01", "2024-01-01", "{}", "", "x, y", "qa@example.com"
+    )
+    row = fresh_db.execute(
+        "SELECT num_desviaciones FROM CERTIFICADO_CALIDAD WHERE id_certificado = ?", (cert_id,)
+    ).fetchone()
+    assert row[0] == 2
+
+
+def test_summary_uses_covering_index(fresh_db):
+    """
+    Test that the aggregation reads only the fecha_envio index, not the table.
+    """
+    cursor = fresh_db.cursor()
+    cursor.execute(
+        "EXPLAIN QUERY PLAN SELECT SUM(c.num_desviaciones = 1), "
+        "SUM(LENGTH(TRIM(c.desviaciones)) > 0) FROM CERTIFICADO_CALIDAD AS c "
+        "JOIN INSPECCION AS i USING (id_inspeccion) WHERE c.fecha_envio >= '2024-01-01'"
+    )
+    detail = " ".join(row["detail"] for row in cursor.fetchall())
+    assert "COVERING INDEX idx_certificado_fecha_envio" in detail
+
+
+class _User:
+    rol = "Laboratorista"
+
+    def __init__(self, id):
+        self.id = id
+
+
+def test_charts_are_cached_until_certificates_change(fresh_db, dashboard_data, lab, monkeypatch):
+    """
+    Test that repeated views reuse rendered charts and a new certificate invalidates them.
+    """
+    import db
+
+    renders = []
+    monkeypatch.setattr(dashboard_service, "_bar_uri", lambda counts, title: renders.append(counts) or title)
+    dashboard_service.clear_chart_cache()
+
+    first = dashboard_service.generate_dashboard(_User(lab), months=12)
+    before = dashboard_service.chart_cache_stats()
+    second = dashboard_service.generate_dashboard(_User(lab), months=12)
+    after = dashboard_service.chart_cache_stats()
+
+    assert first == second
+    assert len(renders) == 3
+    assert after["hits"] - before["hits"] == 4  # Totals + three charts
+
+    version = db.data_version("certificados")
+    create_certificate(1, 1, "SEQ", "PO", 1.0, 1.0, "INV", date.today().isoformat(),
+                       "", "{}", "", "pH", "qa@example.com")
+    assert db.data_version("certificados") == version + 1
+
+    dashboard_service.generate_dashboard(_User(lab), months=12)
+    assert len(renders) == 6
+
+
+def test_charts_are_invalidated_by_inspection_insert_and_delete(fresh_db, dashboard_data, lab, monkeypatch):
+    """
+    Test that creating or deleting an inspection invalidates the cached charts.
+    """
+    import db
+
+    renders = []
+    monkeypatch.setattr(dashboard_service, "_bar_uri", lambda counts, title: renders.append(counts) or title)
+    dashboard_service.clear_chart_cache()
+    dashboard_service.generate_dashboard(_User(lab), months=12)
+
+    version = db.data_version("certificados")
+    cursor = fresh_db.cursor()
+    cursor.execute(
+        "INSERT INTO INSPECCION (numero_lote, fecha, id_laboratorista) VALUES (?, ?, ?)",
+        ("LOT-DASH-2", "2024-01-01", lab),
+    )
+    id_inspeccion = cursor.lastrowid
+    fresh_db.commit()
+    assert db.data_version("certificados") == version + 1
+
+    create_certificate(1, id_inspeccion, "SEQ", "PO", 1.0, 1.0, "INV", date.today().isoformat(),
+                       "", "{}", "", "pH", "qa@example.com")
+
+    with_new = dashboard_service.generate_dashboard(_User(lab), months=12)
+    assert len(renders) == 6
+
+    cursor.execute("DELETE FROM INSPECCION WHERE id_inspeccion = ?", (id_inspeccion,))
+    fresh_db.commit()
+    assert db.data_version("certificados") == version + 3
+
+    assert dashboard_service.generate_dashboard(_User(lab), months=12) != with_new
+    assert len(renders) == 9
+
+
+def test_chart_cache_is_lru_bounded(fresh_db, monkeypatch):
+    """
+    Test that the chart cache evicts the least recently used entries.
+    """
+    monkeypatch.setattr(dashboard_service, "CHART_CACHE_SIZE", 2)
+    dashboard_service.clear_chart_cache()
+    before = dashboard_service.chart_cache_stats()["evictions"]
+
+    for key in ("a", "b", "a", "c"):
+        if dashboard_service._cache_get(key) is None:
+            dashboard_service._cache_put(key, key.upper())
+
+    assert dashboard_service._cache_get("a") == "A"
+    assert dashboard_service._cache_get("b") is None
+    assert dashboard_service.chart_cache_stats()["evictions"] == before + 1
+
+
+def test_dashboard_data_json(fresh_db, dashboard_data, lab):
+    """
+    Test the JSON payload: bucket series, per-client counts and deviated certificates.
+    """
+    import json
+
+    dashboard_service.clear_chart_cache()
+    data = dashboard_service.dashboard_data(_User(lab), months=6)
+    summary = dashboard_service.deviation_summary(
+        fresh_db, user_id=lab, is_manager=False, windows=(3, 6, 12)
+    )
+
+    assert json.loads(json.dumps(data)) == data  # Serializable as-is
+    assert data["certificados"] == summary[6]["Total"]
+    assert data["desviaciones"] == summary[6]["con_desviaciones"]
+    for m in (3, 6, 12):
+        assert data["series"][str(m)] == {k: summary[m][k] for k in ("1", "2", "3+", "Total")}
+
+    assert sum(c["certificados"] for c in data["clientes"]) == summary[6]["Total"]
+    deviated = data["certificados_con_desviaciones"]
+    assert len(deviated) == summary[6]["con_desviaciones"]
+    assert all(c["desviaciones"].strip() for c in deviated)
+
+
+def test_client_mode_skips_matplotlib(fresh_db, dashboard_data, lab, monkeypatch):
+    """
+    Test that the client charting mode returns totals without rendering images.
+    """
+    def no_render(counts, title):
+        raise AssertionError("charts are drawn in the browser")
+
+    monkeypatch.setattr(dashboard_service, "_bar_uri", no_render)
+    dashboard_service.clear_chart_cache()
+    dash = dashboard_service.generate_dashboard(_User(lab), months=12, render_charts=False)
+
+    assert set(dash) == {"certificados_total", "desviaciones_total"}
+
+
+def test_daily_stats_follow_every_write_path(fresh_db, dashboard_data, lab, new_id):
+    """
+    Test that the trigger-maintained rollup always equals a full rebuild.
+    """
+    from services.certificate_service import delete_certificate
+
+    def rollup():
+        return fresh_db.execute(
+            "SELECT * FROM ESTADISTICA_DIARIA ORDER BY dia, id_laboratorista, id_cliente"
+        ).fetchall()
+
+    def assert_in_sync():
+        current = [tuple(r) for r in rollup()]
+        dashboard_service.rebuild_daily_stats(fresh_db)
+        fresh_db.commit()
+        assert current == [tuple(r) for r in rollup()]
+
+    assert_in_sync()
+    other_lab = new_id()
+    ids = [r[0] for r in fresh_db.execute(
+        "SELECT id_certificado FROM CERTIFICADO_CALIDAD c JOIN INSPECCION i USING (id_inspeccion) "
+        "WHERE i.id_laboratorista = ? ORDER BY id_certificado", (lab,)
+    ).fetchall()]
+    id_inspeccion = fresh_db.execute(
+        "SELECT id_inspeccion FROM CERTIFICADO_CALIDAD WHERE id_certificado = ?", (ids[0],)
+    ).fetchone()[0]
+
+    update_certificate(ids[0], 2, id_inspeccion, "S", "P", 1.0, 1.0, "I", "2020-01-01", "",
+                       "{}", "", "a, b, c", "qa@example.com")
+    assert_in_sync()
+    delete_certificate(ids[1])
+    assert_in_sync()
+
+    fresh_db.execute("UPDATE INSPECCION SET id_laboratorista = ? WHERE id_inspeccion = ?",
+                     (other_lab, id_inspeccion))
+    assert_in_sync()
+    fresh_db.execute("DELETE FROM INSPECCION WHERE id_inspeccion = ?", (id_inspeccion,))
+    assert_in_sync()
+    assert fresh_db.execute(
+        "SELECT COUNT(*) FROM ESTADISTICA_DIARIA WHERE id_laboratorista = ?", (other_lab,)
+    ).fetchone()[0] == 0
+
+
+def test_dashboard_data_is_invalidated_by_client_rename(fresh_db, lab):
+    """
+    Test that renaming a client refreshes the cached client names in the JSON payload.
+    """
+    cursor = fresh_db.cursor()
+    cursor.execute("INSERT INTO CLIENTE (nombre, contrasena) VALUES (?, ?)", ("Molino Viejo", "x"))
+    id_cliente = cursor.lastrowid
+    cursor.execute(
+        "INSERT INTO INSPECCION (numero_lote, fecha, id_laboratorista) VALUES (?, ?, ?)",
+        ("LOT-DASH-CLI", "2024-01-01", lab),
+    )
+    id_inspeccion = cursor.lastrowid
+    fresh_db.commit()
+    hoy = date.today().isoformat()
+    create_certificate(id_cliente, id_inspeccion, "SEQ", "PO", 1.0, 1.0, "INV", hoy, hoy,
+                       "{}", "", "pH", "qa@example.com")
+
+    def names():
+        data = dashboard_service.dashboard_data(_User(lab), months=12)
+        return ({c["nombre"] for c in data["clientes"]},
+                {c["nombre_cliente"] for c in data["certificados_con_desviaciones"]})
+
+    dashboard_service.clear_chart_cache()
+    assert names() == ({"Molino Viejo"}, {"Molino Viejo"})
+
+    cursor.execute("UPDATE CLIENTE SET nombre = ? WHERE id_cliente = ?", ("Molino Nuevo", id_cliente))
+    fresh_db.commit()
+    assert names() == ({"Molino Nuevo"}, {"Molino Nuevo"})
@@ -0,0 +1,257 @@
+# tests/test_db.py
+import sqlite3
+import threading
+
+import pytest
+import db
+
+
+def test_connections_are_reused(fresh_db):
+    """
+    Test that sequential db_connection() calls reuse the same pooled connection.
+    """
+    with db.db_connection() as conn:
+        first = id(conn)
+    before = db.pool_stats()
+    with db.db_connection() as conn:
+        second = id(conn)
+    after = db.pool_stats()
+
+    assert first == second
+    assert after["hits"] == before["hits"] + 1
+    assert after["creations"] == before["creations"]
+
+
+def test_uncommitted_work_is_rolled_back_on_error(fresh_db):
+    """
+    Test that a connection returned after an exception carries no open transaction.
+    """
+    with pytest.raises(RuntimeError):
+        with db.db_connection() as conn:
+            conn.execute(
+                "INSERT INTO USUARIO (mail, contrasena, rol, nombre) VALUES (?, ?, ?, ?)",
+                ("rollback@example.com", "x", "user", "Rollback"),
+            )
+            raise RuntimeError("boom")
+
+    with db.db_connection() as conn:
+        assert not conn.in_transaction
+        row = conn.execute(
+            "SELECT 1 FROM USUARIO WHERE mail = ?", ("rollback@example.com",)
+        ).fetchone()
+    assert row is None
+
+
+def test_row_factory_is_reset_on_return(fresh_db):
+    """
+    Test that per-call tweaks to row_factory do not leak to the next user.
+    """
+    with db.db_connection() as conn:
+        conn.row_factory = None
+    with db.db_connection() as conn:
+        assert conn.row_factory is sqlite3.Row
+
+
+def test_unhealthy_connection_is_replaced(tmp_path):
+    """
+    Test that a broken idle connection is discarded and a new one created.
+    """
+    pool = db.ConnectionPool(str(tmp_path / "pool.db"), size=1, timeout=5)
+    stale = pool.acquire()
+    pool.release(stale)
+    stale.close()  # Simulate a connection that died while idle
+
+    conn = pool.acquire()
+    assert conn is not stale
+    assert conn.execute("SELECT 1").fetchone()[0] == 1
+    assert pool.stats()["discards"] == 1
+    pool.release(conn)
+    pool.close()
+
+
+def test_pool_waits_when_exhausted(tmp_path):
+    """
+    Test that a full pool blocks callers until a connection is released.
+    """
+    pool = db.ConnectionPool(str(tmp_path / "pool.db"), size=1, timeout=5)
+    held = pool.acquire()
+    got = []
+
+    def worker():
+        conn = pool.acquire()
+        got.append(conn)
+        pool.release(conn)
+
+    t = threading.Thread(target=worker)
+    t.start()
+    t.join(0.2)
+    assert not got  # Still waiting for the only connection
+    pool.release(held)
+    t.join(5)
+
+    assert got == [held]
+    assert pool.stats()["waits"] == 1
+    assert pool.stats()["creations"] == 1
+    pool.close()
+
+
+def test_pool_timeout(tmp_path):
+    """
+    Test that acquiring from an exhausted pool fails after the timeout.
+    """
+    pool = db.ConnectionPool(str(tmp_path / "pool.db"), size=1, timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(db.PoolTimeout):
+        pool.acquire()
+    pool.release(held)
+    pool.close()
+
+
+def test_pragma_profile_is_applied(fresh_db):
+    """
+    Test that pooled connections run in WAL mode with the configured profile.
+    """
+    active = db.active_pragmas()
+
+    assert active["journal_mode"] == "wal"
+    assert active["synchronous"] == 1  # NORMAL
+    assert active["temp_store"] == 2  # MEMORY
+    assert db.verify_pragmas() == {}
+
+
+def test_verify_pragmas_reports_mismatch(fresh_db):
+    """
+    Test that a drifted setting is reported as (expected, actual).
+    """
+    with db.db_connection() as conn:
+        conn.execute("PRAGMA synchronous = FULL")
+        mismatches = db.verify_pragmas(conn)
+        conn.execute("PRAGMA synchronous = NORMAL")
+
+    assert mismatches == {"synchronous": (1, 2)}
+
+
+def test_checkpoint(fresh_db):
+    """
+    Test that a manual WAL checkpoint runs and reports its counters.
+    """
+    result = db.checkpoint("passive")
+    assert set(result) == {"busy", "log", "checkpointed"}
+    assert result["busy"] == 0
+
+    with pytest.raises(ValueError):
+        db.checkpoint("bogus")
+
+
+def test_checkpoint_job_start_stop():
+    """
+    Test that the background checkpoint job starts once and can be stopped.
+    """
+    assert db.start_checkpoint_job(interval=60) is True
+    assert db.start_checkpoint_job(interval=60) is False  # Already running
+    db.stop_checkpoint_job()
+    assert db.start_checkpoint_job(interval=0) is False  # Disabled
+
+
+def test_init_db_records_versions(fresh_db):
+    """
+    Test that the base schema and every migration are recorded and not re-run.
+    """
+    cursor = fresh_db.cursor()
+    cursor.execute("SELECT version FROM schema_version ORDER BY version")
+    versions = [row[0] for row in cursor.fetchall()]
+
+    assert versions[0] == db.BASE_SCHEMA_VERSION
+    assert versions[1:] == [v for v, _ in db._list_migrations()]
+    assert db.pending_migrations() == []
+
+    db.init_db()  # Nothing pending: must be a no-op
+    cursor.execute("SELECT COUNT(*) FROM schema_version")
+    assert cursor.fetchone()[0] == len(versions)
+
+
+def test_hot_queries_use_indexes(fresh_db):
+    """
+    Test that the dashboard and address lookups no longer do full table scans.
+    """
+    cursor = fresh_db.cursor()
+    plans = {
+        "certificados": """
+            SELECT COUNT(*) FROM CERTIFICADO_CALIDAD AS c
+            JOIN INSPECCION AS i USING (id_inspeccion)
+            WHERE c.fecha_envio >= date('now', '-3 months')
+        """,
+        "laboratorista": "SELECT id_inspeccion FROM INSPECCION WHERE id_laboratorista = 1",
+        "direcciones": "SELECT * FROM DIRECCION_CLIENTE WHERE id_cliente = 1",
+    }
+    for name, sql in plans.items():
+        cursor.execute("EXPLAIN QUERY PLAN " + sql)
+        detail = " ".join(row["detail"] for row in cursor.fetchall())
+        assert "USING" in detail and "INDEX" in detail, (name, detail)
+
+
+def _walk(conn, direction, start):
+    """Follow next/prev cursors from `start` and return the ids per page."""
+    pages, page = [], start
+    while True:
+        pages.append([r["id"] for r in page["items"]])
+        cursor = page[direction]
+        if cursor is None:
+            return pages
+        arg = "after" if direction == "next" else "before"
+        page = db.keyset_page(conn, "SELECT id FROM t", "id", limit=page["limit"], **{arg: cursor})
+
+
+def test_keyset_page_walks_both_directions():
+    """
+    Test that next/prev cursors cover every row exactly once, newest first.
+    """
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, par INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?, ?)", [(i, i % 2) for i in range(1, 24)])
+
+    first = db.keyset_page(conn, "SELECT id FROM t", "id", limit=5)
+    assert first["prev"] is None
+    forward = _walk(conn, "next", first)
+    assert [i for p in forward for i in p] == list(range(23, 0, -1))
+    assert [len(p) for p in forward] == [5, 5, 5, 5, 3]
+
+    last = db.keyset_page(conn, "SELECT id FROM t", "id", after=forward[-2][-1], limit=5)
+    assert last["next"] is None
+    backward = _walk(conn, "prev", last)
+    assert backward == forward[::-1]
+
+    # Filters are combined with the cursor condition
+    even = db.keyset_page(conn, "SELECT id FROM t", "id", where=["par = ?"], params=(0,),
+                          after=20, limit=3)
+    assert [r["id"] for r in even["items"]] == [18, 16, 14]
+    assert (even["prev"], even["next"]) == (18, 14)
+
+
+def test_keyset_page_limit_is_clamped():
+    """
+    Test that the requested page size is kept within 1..MAX_PAGE_SIZE.
+    """
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(1, 4)])
+
+    assert db.keyset_page(conn, "SELECT id FROM t", "id", limit=0)["limit"] == db.PAGE_SIZE
+    assert db.keyset_page(conn, "SELECT id FROM t", "id", limit=-5)["limit"] == 1
+    assert db.keyset_page(conn, "SELECT id FROM t", "id", limit=10**6)["limit"] == db.MAX_PAGE_SIZE
+
+
+def test_listing_pages_seek_by_primary_key(fresh_db):
+    """
+    Test that a deep page is an index seek rather than a scan from the start.
+    """
+    cursor = fresh_db.cursor()
+    for table, key in [("CERTIFICADO_CALIDAD", "id_certificado"), ("CLIENTE", "id_cliente"),
+                       ("EQUIPO_LABORATORIO", "id_equipo"), ("USUARIO", "id_usuario")]:
+        cursor.execute(
+            f"EXPLAIN QUERY PLAN SELECT * FROM {table} WHERE {key} < 1000 ORDER BY {key} DESC LIMIT 51"
+        )
+        detail = " ".join(row["detail"] for row in cursor.fetchall())
+        assert "SEARCH" in detail and "PRIMARY KEY" in detail, (table, detail)
@@ -0,0 +1,200 @@
+# tests/test_emission.py
+import pytest
+import services.emission_service as es
+import services.pdf_store as pdf_store
+from services.certificate_service import create_certificate
+
+
+def _make_certificate(correo="qa@example.com"):
+    return create_certificate(
+        1, 1, "SEQ001", "PO-1001", 500.0, 495.0, "INV-1", "2024-03-30",
+        "2025-03-30", '{"W": 250}', "", "", correo,
+    )
+
+
+@pytest.fixture
+def outbox(tmp_path, monkeypatch):
+    """
+    Render PDFs into a temporary folder and capture sends instead of mailing.
+    """
+    sent = []
+    monkeypatch.setattr(es, "CERTS_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_store, "PDF_STORE_DIR", str(tmp_path / "store"))
+    monkeypatch.setattr(es, "send_certificate", lambda to, name: sent.append((to, name)))
+    # Drain jobs left over by other tests so each test sees only its own
+    while es.process_next_job():
+        pass
+    sent.clear()
+    return sent
+
+
+def test_emission_runs_render_then_send(fresh_db, outbox, tmp_path):
+    """
+    Test that a queued certificate goes through render and send stages.
+    """
+    cert_id = _make_certificate("cliente@example.com")
+    job_id = es.enqueue_emission(cert_id)
+
+    assert es.get_job(job_id)["estado"] == "pendiente"
+
+    assert es.process_next_job() is True  # render
+    job = es.get_job(job_id)
+    assert job["etapa"] == "envio"
+    assert job["archivo_pdf"] == f"certificado_{cert_id}.pdf"
+    assert (tmp_path / job["archivo_pdf"]).read_bytes().startswith(b"%PDF")
+
+    assert es.process_next_job() is True  # send
+    assert es.get_job(job_id)["estado"] == "enviado"
+    assert outbox == [("cliente@example.com", f"certificado_{cert_id}.pdf")]
+    assert es.process_next_job() is False
+    assert es.emission_status([cert_id])[cert_id]["estado"] == "enviado"
+
+
+def test_emission_retries_then_fails(fresh_db, outbox, monkeypatch):
+    """
+    Test that a failing stage is rescheduled with backoff and finally marked failed.
+    """
+    def broken_send(to, name):
+        raise ConnectionError("SMTP caído")
+
+    monkeypatch.setattr(es, "send_certificate", broken_send)
+    monkeypatch.setattr(es, "RETRY_BASE_DELAY", 0)
+    monkeypatch.setattr(es, "MAX_ATTEMPTS", 2)
+
+    job_id = es.enqueue_emission(_make_certificate())
+    es.process_next_job()  # render OK
+    es.process_next_job()  # send attempt 1
+    job = es.get_job(job_id)
+    assert (job["estado"], job["intentos"], job["ultimo_error"]) == ("pendiente", 1, "SMTP caído")
+
+    es.process_next_job()  # send attempt 2
+    job = es.get_job(job_id)
+    assert (job["estado"], job["intentos"]) == ("fallido", 2)
+    assert es.process_next_job() is False
+
+
+def test_recover_stale_jobs(fresh_db, outbox):
+    """
+    Test that jobs left 'en_proceso' by a dead worker are requeued.
+    """
+    job_id = es.enqueue_emission(_make_certificate())
+    es._claim_jobs(1)
+    assert es.get_job(job_id)["estado"] == "en_proceso"
+
+    assert es.recover_stale_jobs(older_than=0) == 1
+    assert es.get_job(job_id)["estado"] == "pendiente"
+
+
+def test_workers_drain_queue(fresh_db, outbox):
+    """
+    Test that background workers pick up a job as soon as it is enqueued.
+    """
+    import time
+
+    cert_id = _make_certificate()
+    es.start_workers(2)
+    try:
+        job_id = es.enqueue_emission(cert_id)
+        deadline = time.monotonic() + 20
+        while es.get_job(job_id)["estado"] != "enviado" and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        es.stop_workers()
+
+    assert es.get_job(job_id)["estado"] == "enviado"
+
+
+def test_resend_reuses_stored_pdf(fresh_db, outbox, monkeypatch):
+    """
+    Test that resending an unchanged certificate skips the render.
+    """
+    cert_id = _make_certificate("cliente@example.com")
+    es.enqueue_emission(cert_id)
+    while es.process_next_job():
+        pass
+
+    def no_render(*args, **kwargs):
+        raise AssertionError("render should come from the store")
+
+    monkeypatch.setattr(es.pdf_service, "render_pdfs", no_render)
+    job_id = es.resend_certificate(cert_id)
+    while es.process_next_job():
+        pass
+
+    assert es.get_job(job_id)["estado"] == "enviado"
+    assert outbox == [("cliente@example.com", f"certificado_{cert_id}.pdf")] * 2
+
+    with pytest.raises(LookupError):
+        es.resend_certificate(999999)
+
+
+def test_send_stage_batches_per_recipient(fresh_db, outbox, monkeypatch):
+    """
+    Test that with MAIL_BATCH the send jobs for one recipient share a message.
+    """
+    batches = []
+    monkeypatch.setattr(es.mail_service, "MAIL_BATCH", True)
+    monkeypatch.setattr(es, "send_certificates", lambda to, names: batches.append((to, names)))
+
+    a1, a2 = _make_certificate("a@example.com"), _make_certificate("a@example.com")
+    b1 = _make_certificate("b@example.com")
+    jobs = [es.enqueue_emission(c) for c in (a1, a2, b1)]
+    es.process_next_jobs(3)  # render
+    es.process_next_jobs(3)  # send
+
+    assert batches == [("a@example.com", [f"certificado_{a1}.pdf", f"certificado_{a2}.pdf"])]
+    assert outbox == [("b@example.com", f"certificado_{b1}.pdf")]
+    assert all(es.get_job(j)["estado"] == "enviado" for j in jobs)
+
+
+def test_certificate_and_job_share_a_transaction(fresh_db, outbox):
+    """
+    Test that a failed enqueue also rolls back the certificate it was created with.
+    """
+    from db import db_connection
+    from services.certificate_service import get_certificate
+
+    with db_connection() as conn:
+        cert_id = create_certificate(
+            1, 1, "SEQ001", "PO-1001", 500.0, 495.0, "INV-1", "2024-03-30",
+            "2025-03-30", '{"W": 250}', "", "", "qa@example.com", conn=conn,
+        )
+        job_id = es.enqueue_emission(cert_id, conn)
+    assert es.get_job(job_id)["id_certificado"] == cert_id
+
+    with pytest.raises(ZeroDivisionError):
+        with db_connection() as conn:
+            orphan = create_certificate(
+                1, 1, "SEQ002", "PO-1002", 500.0, 495.0, "INV-2", "2024-03-30",
+                "2025-03-30", '{"W": 250}', "", "", "qa@example.com", conn=conn,
+            )
+            1 / 0  # enqueue_emission fails before the commit
+    assert get_certificate(orphan) is None
+
+
+def test_workers_requeue_stale_jobs_periodically(fresh_db, outbox, monkeypatch):
+    """
+    Test that running workers requeue jobs abandoned after they started, not only at startup.
+    """
+    import time
+
+    monkeypatch.setattr(es, "RECOVER_INTERVAL", 0.05)
+    monkeypatch.setattr(es, "POLL_INTERVAL", 0.05)
+    monkeypatch.setattr(es, "STALE_AFTER", 0)
+    es.start_workers(1)
+    try:
+        time.sleep(0.2)  # Past the startup recovery
+        # A job claimed by a thread that died while the process keeps running
+        fresh_db.execute(
+            "INSERT INTO EMISION_TRABAJO (id_certificado, estado) VALUES (?, 'en_proceso')",
+            (_make_certificate(),),
+        )
+        job_id = fresh_db.execute("SELECT MAX(id_trabajo) FROM EMISION_TRABAJO").fetchone()[0]
+        fresh_db.commit()
+        deadline = time.monotonic() + 20
+        while es.get_job(job_id)["estado"] != "enviado" and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        es.stop_workers()
+
+    assert es.get_job(job_id)["estado"] == "enviado"
@@ -0,0 +1,102 @@
+# tests/test_export.py
+import csv
+import io
+import json
+
+from db import get_pool
+from services import export_service, import_service
+from services.certificate_service import create_certificate
+from services.client_service import create_client
+from services.inspection_service import create_inspection
+from services.parameters_service import get_inspection_parameters
+
+
+def _rows(chunks) -> list[dict]:
+    text = "".join(chunks)
+    assert text.startswith(export_service.BOM)
+    return list(csv.DictReader(io.StringIO(text[1:])))
+
+
+def test_export_inspections_flattens_parameters_and_reimports(fresh_db, new_id):
+    """
+    Test that inspection exports flatten parameters, honor filters and can be imported back.
+    """
+    lab = new_id()
+    nested = {"alveografo": {"W": 310.0, "P": 85.0}, "farinografo": {"estabilidad": 9.5}}
+    create_inspection("EXP-1", "2024-01-10", None, "1", "Rutina", nested, lab)
+    create_inspection("EXP-2", "2024-02-10", None, "2", "Rutina", {"W": 290.0}, lab)
+    create_inspection("EXP-3", "2024-03-10", None, "3", "Rutina", {"W": 250.0}, lab)
+
+    rows = _rows(export_service.export_inspections_csv(
+        id_laboratorista=lab, desde="2024-01-01", hasta="2024-02-28", fetch=1
+    ))
+    assert [r["numero_lote"] for r in rows] == ["EXP-1", "EXP-2"]
+    assert rows[0]["W"] == "310.0" and rows[0]["estabilidad"] == "9.5"
+    assert rows[1]["P"] == ""
+
+    # The export header is one import_service understands
+    before = _rows(export_service.export_inspections_csv(id_laboratorista=lab))
+    reporte = import_service.import_inspections(
+        io.StringIO("".join(export_service.export_inspections_csv(id_laboratorista=lab))[1:])
+    )
+    assert reporte == {"importadas": 3, "con_error": 0, "errores": []}
+    after = _rows(export_service.export_inspections_csv(id_laboratorista=lab))
+    strip = lambda r: {k: v for k, v in r.items() if k != "id_inspeccion"}  # noqa: E731
+    assert [strip(r) for r in after[3:]] == [strip(r) for r in before]
+    assert get_inspection_parameters(int(after[3]["id_inspeccion"])) == {
+        "W": 310.0, "P": 85.0, "estabilidad": 9.5
+    }
+
+
+def test_export_certificates_filters_and_scope(fresh_db, new_id):
+    """
+    Test certificate exports: client name, flattened results, client filter and owner scope.
+    """
+    lab, other_lab = new_id(), new_id()
+    client_id = create_client("Exporta S.A.", "RFCEXP1", "", "", True, True, "", None, False, {})
+    mine = create_inspection("EXP-C1", "2024-04-01", None, "1", "Rutina", {"W": 300.0}, lab)
+    other = create_inspection("EXP-C2", "2024-04-01", None, "1", "Rutina", {"W": 200.0}, other_lab)
+    for id_inspeccion, resultados in ((mine, {"W": 300.0}), (other, {"alveografo": {"W": 200.0}})):
+        create_certificate(
+            client_id, id_inspeccion, "1", "OC", 10.0, 10.0, "F-1", "2024-04-02", "2025-04-02",
+            json.dumps(resultados), "", "", "qa@example.com",
+        )
+
+    rows = _rows(export_service.export_certificates_csv(id_cliente=client_id))
+    assert [(r["nombre_cliente"], r["numero_lote"], r["W"]) for r in rows] == [
+        ("Exporta S.A.", "EXP-C1", "300.0"),
+        ("Exporta S.A.", "EXP-C2", "200.0"),
+    ]
+
+    # Non-admins only export certificates of their own inspections
+    scoped = _rows(export_service.export_certificates_csv(
+        id_cliente=client_id, user_id=lab, rol="Laboratorista"
+    ))
+    assert [r["numero_lote"] for r in scoped] == ["EXP-C1"]
+    admin = _rows(export_service.export_certificates_csv(
+        id_cliente=client_id, user_id=lab, rol="Admin"
+    ))
+    assert len(admin) == 2
+
+
+def test_export_streams_in_blocks_and_releases_connection(fresh_db, new_id):
+    """
+    Test that rows arrive in fetch-sized blocks and an abandoned download frees its connection.
+    """
+    lab = new_id()
+    for n in range(5):
+        create_inspection(f"EXP-S{n}", "2024-05-01", None, "1", "Rutina", {"W": 300.0}, lab)
+
+    chunks = list(export_service.export_inspections_csv(id_laboratorista=lab, fetch=2))
+    assert len(chunks) == 1 + 3  # Header, then blocks of 2, 2 and 1 rows
+
+    pool = get_pool()
+    in_use = lambda: pool.stats()["open"] - pool.stats()["idle"]  # noqa: E731
+    baseline = in_use()  # fresh_db holds one
+    stream = export_service.export_inspections_csv(id_laboratorista=lab, fetch=2)
+    next(stream)
+    assert in_use() == baseline  # The header is sent before taking a connection
+    next(stream)
+    assert in_use() == baseline + 1
+    stream.close()
+    assert in_use() == baseline
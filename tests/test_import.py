@@ -0,0 +1,112 @@
+# tests/test_import.py
+import io
+
+import pytest
+from services import import_service
+from services.parameters_service import get_inspection_parameters
+
+def _imported(conn, lab):
+    rows = conn.execute(
+        "SELECT id_inspeccion, numero_lote, fecha, tipo_inspeccion FROM INSPECCION "
+        "WHERE id_laboratorista = ? ORDER BY id_inspeccion", (lab,)
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def test_import_maps_columns_and_reports_bad_rows(fresh_db, new_id):
+    """
+    Test that instrument headers map to parameters and invalid rows are reported by line.
+    """
+    lab = new_id()
+    data = (
+        "Lote;Fecha;W;P/L;Absorción de agua (%);Tiempo desarrollo;Notas\n"
+        "IMP-1;01/02/2024;310;0,85;58.5;2.5;ok\n"
+        "IMP-2;2024-02-02;;;;;sin valores\n"
+        "IMP-3;2024-02-30;300;;;;fecha mala\n"
+        ";2024-02-03;300;;;;sin lote\n"
+        "IMP-4;2024-02-04;abc;;;;texto\n"
+        "\n"
+        "IMP-5;2024-02-05;280;;;;ok\n"
+    )
+    reporte = import_service.import_inspections(
+        io.StringIO(data), id_laboratorista=lab, tipo_inspeccion="A"
+    )
+
+    assert reporte["importadas"] == 2
+    assert reporte["con_error"] == 4
+    assert [e["fila"] for e in reporte["errores"]] == [3, 4, 5, 6]
+    assert "no numérico" in reporte["errores"][3]["error"]
+
+    rows = _imported(fresh_db, lab)
+    assert [(r["numero_lote"], r["fecha"], r["tipo_inspeccion"]) for r in rows] == [
+        ("IMP-1", "2024-02-01", "A"), ("IMP-5", "2024-02-05", "A"),
+    ]
+    assert get_inspection_parameters(rows[0]["id_inspeccion"]) == {
+        "W": 310.0, "relacion_P_L": 0.85, "absorcion_de_agua": 58.5, "tiempo_de_desarrollo": 2.5,
+    }
+
+
+def test_import_tsv_in_chunks(fresh_db, new_id):
+    """
+    Test tab-separated input split across several transactions without losing rows.
+    """
+    lab = new_id()
+    lines = ["lot\tdate\testabilidad\tmti\tlaboratorista"]
+    lines += [f"TSV-{n}\t2024-03-01\t{8 + n % 4}\t{40 + n}\t{lab}" for n in range(25)]
+    reporte = import_service.import_inspections(io.StringIO("\n".join(lines) + "\n"), chunk=10)
+
+    assert reporte == {"importadas": 25, "con_error": 0, "errores": []}
+    rows = _imported(fresh_db, lab)
+    assert [r["numero_lote"] for r in rows] == [f"TSV-{n}" for n in range(25)]
+    count = fresh_db.execute(
+        "SELECT COUNT(*) FROM PARAMETRO_ANALISIS WHERE id_inspeccion BETWEEN ? AND ?",
+        (rows[0]["id_inspeccion"], rows[-1]["id_inspeccion"]),
+    ).fetchone()[0]
+    assert count == 50
+
+
+def test_import_does_not_reuse_deleted_ids(fresh_db, new_id):
+    """
+    Test that explicitly assigned ids stay above previously deleted inspections.
+    """
+    lab = new_id()
+    cursor = fresh_db.cursor()
+    cursor.execute(
+        "INSERT INTO INSPECCION (numero_lote, fecha, id_laboratorista) VALUES ('TMP', '2024-01-01', ?)",
+        (lab,),
+    )
+    deleted = cursor.lastrowid
+    cursor.execute("DELETE FROM INSPECCION WHERE id_inspeccion = ?", (deleted,))
+    fresh_db.commit()
+
+    import_service.import_inspections(
+        io.StringIO("lote,fecha,W\nNEW-ID,2024-01-01,300\n"), id_laboratorista=lab
+    )
+    assigned = _imported(fresh_db, lab)[-1]["id_inspeccion"]
+    assert assigned > deleted
+
+
+def test_import_rejects_unknown_header(fresh_db):
+    """
+    Test that a file without lot/date/parameter columns is refused before inserting anything.
+    """
+    with pytest.raises(ValueError):
+        import_service.import_inspections(io.StringIO("a,b,c\n1,2,3\n"))
+    with pytest.raises(ValueError):
+        import_service.import_inspections(io.StringIO("lote,fecha,color\nX,2024-01-01,rojo\n"))
+
+
+def test_import_can_force_the_importing_laboratorista(fresh_db, new_id):
+    """
+    Test that a laboratorista column in the file is ignored when the importer is forced.
+    """
+    lab, other = new_id(), new_id()
+    data = f"lote,fecha,W,laboratorista\nFORCE-1,2024-01-01,300,{other}\n"
+
+    reporte = import_service.import_inspections(
+        io.StringIO(data), id_laboratorista=lab, forzar_laboratorista=True
+    )
+
+    assert reporte["importadas"] == 1
+    assert [r["numero_lote"] for r in _imported(fresh_db, lab)] == ["FORCE-1"]
+    assert _imported(fresh_db, other) == []
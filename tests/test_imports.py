@@ -0,0 +1,59 @@
+# tests/test_imports.py
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded only on first use (charts in server mode, PDFs, batch deviations)
+HEAVY = ("numpy", "pandas", "matplotlib", "xhtml2pdf", "reportlab")
+
+# Generous ceiling for `import main` so slow CI machines do not flake; the
+# real regression signal is a heavy module showing up in the import graph.
+IMPORT_BUDGET_S = float(os.environ.get("IMPORT_BUDGET_S", "3.0"))
+
+
+def _importtime(module, tmp_path):
+    """
+    Import `module` in a fresh interpreter under -X importtime.
+
+    Returns {module name: cumulative microseconds}.
+    """
+    env = dict(os.environ, DB_PATH=str(tmp_path / "import.db"), EMISSION_WORKERS="0")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["main", "services.dashboard_service", "services.certificate_service", "services.pdf_service"],
+)
+def test_heavy_dependencies_are_lazy(module, tmp_path):
+    """
+    Test that importing the app does not pull in pandas, matplotlib, numpy or xhtml2pdf.
+    """
+    times = _importtime(module, tmp_path)
+    loaded = sorted(n for n in times if n.split(".")[0] in HEAVY)
+    assert loaded == [], loaded
+
+
+def test_app_import_time(tmp_path):
+    """
+    Test that `import main` stays within the import-time budget.
+    """
+    times = _importtime("main", tmp_path)
+    assert times["main"] / 1e6 < IMPORT_BUDGET_S, times["main"]
@@ -6,6 +6,7 @@ from services.inspection_service import (
     update_inspection,
     delete_inspection,
     list_inspections,
+    get_all_inspections,
 )
 from services.equipment_service import (
     create_equipment,
@@ -237,3 +238,31 @@ def test_list_inspections(fresh_db):
     inspection_count = cursor.fetchone()[0]
 
     assert inspection_count >= 2  # Ensure at least two inspections exist in the table
+
+
+def test_get_all_inspections_is_scoped_to_laboratorista(fresh_db):
+    """
+    Test that non-admins only get their own inspections, newest date first, via the index.
+    """
+    cursor = fresh_db.cursor()
+    for lote, fecha, lab in [("SC-1", "2024-01-02", 7101), ("SC-2", "2024-03-01", 7101),
+                             ("SC-3", "2024-02-01", 7102)]:
+        cursor.execute(
+            "INSERT INTO INSPECCION (numero_lote, fecha, id_laboratorista) VALUES (?, ?, ?)",
+            (lote, fecha, lab),
+        )
+    fresh_db.commit()
+
+    own = get_all_inspections(7101, "Laboratorista")
+    assert [i["numero_lote"] for i in own] == ["SC-2", "SC-1"]
+    assert {i["id_laboratorista"] for i in own} == {7101}
+
+    lotes = {i["numero_lote"] for i in get_all_inspections(7101, "Admin")}
+    assert {"SC-1", "SC-2", "SC-3"} <= lotes
+
+    cursor.execute(
+        "EXPLAIN QUERY PLAN SELECT id_inspeccion FROM INSPECCION WHERE id_laboratorista = 1 "
+        "ORDER BY fecha DESC, id_inspeccion DESC"
+    )
+    detail = " ".join(row["detail"] for row in cursor.fetchall())
+    assert "idx_inspeccion_laboratorista_fecha" in detail and "TEMP B-TREE" not in detail
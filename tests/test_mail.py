@@ -0,0 +1,74 @@
+# tests/test_mail.py
+import email
+from email import policy
+
+import pytest
+import services.mail_service as ms
+from fake_smtp import FakeSMTPServer
+
+
+@pytest.fixture
+def smtp_server(tmp_path, monkeypatch):
+    """
+    Local SMTP server plus a certificates folder with two small PDFs.
+    """
+    for n in (1, 2):
+        (tmp_path / f"certificado_{n}.pdf").write_bytes(b"%PDF-1.4 test")
+    monkeypatch.setattr(ms, "CERTS_DIR", str(tmp_path))
+    with FakeSMTPServer() as server:
+        pool = ms.SMTPPool("127.0.0.1", server.port, "user", "pw", use_ssl=False)
+        monkeypatch.setattr(ms, "_pool", pool)
+        yield server
+        pool.close()
+
+
+def test_sessions_are_reused(smtp_server):
+    """
+    Test that consecutive sends share one authenticated session.
+    """
+    for _ in range(3):
+        ms.send_certificate("cliente@example.com", "certificado_1.pdf")
+
+    assert len(smtp_server.messages) == 3
+    assert smtp_server.sessions == 1
+    assert smtp_server.logins == 1
+    stats = ms.pool_stats()
+    assert (stats["sent"], stats["connections"], stats["reuses"]) == (3, 1, 2)
+
+    _, rcpts, _ = smtp_server.messages[0]
+    assert rcpts == ["cliente@example.com", ms._correo_almacen()]
+
+
+def test_reconnects_after_server_drops_session(smtp_server):
+    """
+    Test that a session closed by the server is replaced and the message retried.
+    """
+    smtp_server.drop_after = 1
+    ms.send_certificate("cliente@example.com", "certificado_1.pdf")
+    ms.send_certificate("cliente@example.com", "certificado_2.pdf")
+
+    assert len(smtp_server.messages) == 2
+    assert smtp_server.sessions == 2
+    assert ms.pool_stats()["reconnects"] == 1
+
+
+def test_batched_message_has_all_attachments(smtp_server):
+    """
+    Test that several certificates for one recipient go out as one message.
+    """
+    ms.send_certificates("cliente@example.com", ["certificado_1.pdf", "certificado_2.pdf"])
+
+    assert len(smtp_server.messages) == 1
+    msg = email.message_from_string(smtp_server.messages[0][2], policy=policy.default)
+    names = [part.get_filename() for part in msg.iter_attachments()]
+    assert names == ["certificado_1.pdf", "certificado_2.pdf"]
+    assert msg["Subject"] == "Envío de 2 certificados"
+
+
+def test_missing_file_is_not_sent(smtp_server):
+    """
+    Test that a missing PDF raises before anything is sent.
+    """
+    with pytest.raises(FileNotFoundError):
+        ms.send_certificates("cliente@example.com", ["certificado_1.pdf", "nope.pdf"])
+    assert smtp_server.messages == []
@@ -0,0 +1,100 @@
+# tests/test_metrics.py
+import db
+import metrics
+import pytest
+from flask import Flask
+
+
+def test_histogram_renders_cumulative_buckets():
+    """
+    Test the Prometheus text format of a labelled histogram and counter.
+    """
+    hist = metrics.Histogram("test_latency_seconds", "Test.", (0.1, 1.0), ("endpoint",))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        hist.observe(value, 'a"b')
+    lines = hist.render()
+
+    assert lines[:2] == [
+        "# HELP harina_test_latency_seconds Test.",
+        "# TYPE harina_test_latency_seconds histogram",
+    ]
+    assert 'harina_test_latency_seconds_bucket{endpoint="a\\"b",le="0.1"} 2' in lines
+    assert 'harina_test_latency_seconds_bucket{endpoint="a\\"b",le="1.0"} 3' in lines
+    assert 'harina_test_latency_seconds_bucket{endpoint="a\\"b",le="+Inf"} 4' in lines
+    assert 'harina_test_latency_seconds_count{endpoint="a\\"b"} 4' in lines
+
+    counter = metrics.Counter("test_total", "Test.", ("status",))
+    counter.inc("200")
+    counter.inc("200", amount=2)
+    assert counter.render()[-1] == 'harina_test_total{status="200"} 3'
+
+
+def test_statements_are_counted_per_request(fresh_db):
+    """
+    Test that execute(), cursor().execute() and executemany() are all counted.
+    """
+    metrics.begin_request("test")
+    with db.db_connection() as conn:
+        conn.execute("SELECT 1").fetchone()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id_inspeccion FROM INSPECCION LIMIT 5")
+        cursor.fetchall()
+        conn.executemany(
+            "UPDATE INSPECCION SET secuencia = secuencia WHERE id_inspeccion = ?", [(-1,), (-2,)]
+        )
+    queries, seconds = metrics.request_db_stats()
+    metrics.begin_request()  # Leave no request open for other tests
+
+    assert queries == 3
+    assert seconds > 0
+
+
+def test_slow_statements_are_logged_with_plan(fresh_db, monkeypatch):
+    """
+    Test that slow statements keep SQL, parameters and EXPLAIN QUERY PLAN, redacting passwords.
+    """
+    monkeypatch.setattr(db, "SLOW_QUERY_MS", 1e-6)
+    with db.db_connection() as conn:
+        conn.execute(
+            "SELECT * FROM INSPECCION\n  WHERE id_inspeccion = ?", (123456789,)
+        ).fetchall()
+        conn.execute("SELECT id_usuario FROM USUARIO WHERE mail = ? AND contrasena = ?", ("a", "b"))
+
+    credentials, lookup = metrics.slow_queries()[:2]
+    assert lookup["sql"] == "SELECT * FROM INSPECCION WHERE id_inspeccion = ?"
+    assert lookup["params"] == [123456789]
+    assert any("INTEGER PRIMARY KEY" in step for step in lookup["plan"])
+    assert credentials["params"] == "<redacted>"
+
+
+def test_middleware_records_route_latency():
+    """
+    Test that init_app times requests by endpoint and counts them by status.
+    """
+    app = Flask(__name__)
+    metrics.init_app(app)
+
+    @app.route("/metrics-test/<int:n>")
+    def metrics_test(n):
+        return "ok", 200 if n else 500
+
+    client = app.test_client()
+    before = metrics.REQUEST_LATENCY.snapshot("metrics_test", "GET") or {"count": 0}
+    client.get("/metrics-test/1")
+    client.get("/metrics-test/0")
+    client.get("/metrics-test/x")
+
+    assert metrics.REQUEST_LATENCY.snapshot("metrics_test", "GET")["count"] == before["count"] + 2
+    text = metrics.render()
+    assert 'harina_http_requests_total{endpoint="metrics_test",method="GET",status="500"}' in text
+    assert 'harina_http_requests_total{endpoint="unmatched",method="GET",status="404"}' in text
+    assert "# TYPE harina_db_execute_seconds histogram" in text
+
+
+@pytest.mark.parametrize("value", ["x" * 500, b"\x00" * 10])
+def test_long_parameters_are_truncated(value):
+    """
+    Test that logged parameters do not carry large text or blobs.
+    """
+    logged = db._loggable_params("SELECT ?", (value,))[0]
+    assert len(logged) <= 210
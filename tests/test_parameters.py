@@ -6,9 +6,14 @@ from services.parameters_service import (
     update_parameter,
     delete_parameter,
     list_parameters,
+    get_inspection_parameters,
+    parameter_values,
+    parameter_summary,
 )
 from services.inspection_service import (
     create_inspection,
+    update_inspection,
+    delete_inspection,
 )  # Needed to create test inspections
 from services.equipment_service import (
     create_equipment,
@@ -192,3 +197,87 @@ def test_list_parameters(fresh_db):
     parameter_count = cursor.fetchone()[0]
 
     assert parameter_count >= 2  # Ensure at least two parameters exist in the table
+
+
+def _params(conn, id_inspeccion):
+    rows = conn.execute(
+        "SELECT parametro_analizado, valor, id_equipo_laboratorio FROM PARAMETRO_ANALISIS "
+        "WHERE id_inspeccion = ? ORDER BY id_parametro", (id_inspeccion,)
+    ).fetchall()
+    return [tuple(r) for r in rows]
+
+
+def test_inspection_writes_keep_parameters_in_sync(fresh_db):
+    """
+    Test that creating, editing and deleting an inspection maintains PARAMETRO_ANALISIS.
+    """
+    id_inspeccion = create_inspection(
+        "LOT-PA1", "2024-02-01", None, "SEQ", "Rutina",
+        {"alveografo": {"W": 310, "P": "n/a"}, "farinografo": {"estabilidad": 9.5}}, None,
+    )
+    assert _params(fresh_db, id_inspeccion) == [("estabilidad", 9.5, None), ("W", 310.0, None),
+                                                ("P", None, None)]
+    assert get_inspection_parameters(id_inspeccion) == {"W": 310.0, "estabilidad": 9.5}
+
+    update_inspection(id_inspeccion, "LOT-PA1", "2024-02-01", 3, "SEQ", {"W": 280.5}, "Rutina", None)
+    assert _params(fresh_db, id_inspeccion) == [("W", 280.5, 3)]
+
+    delete_inspection(id_inspeccion)
+    assert _params(fresh_db, id_inspeccion) == []
+
+
+def test_parameter_queries_are_relational(fresh_db):
+    """
+    Test per-parameter values and summaries, and that they are served by the index.
+    """
+    for fecha, w in [("2023-12-31", 100.0), ("2024-01-10", 200.0), ("2024-02-20", 300.0)]:
+        create_inspection("LOT-PQ", fecha, None, "SEQ", "Rutina", {"W_prueba": w}, None)
+
+    values = parameter_values("W_prueba", desde="2024-01-01", hasta="2024-03-31")
+    assert [(v["fecha"], v["valor"]) for v in values] == [("2024-01-10", 200.0), ("2024-02-20", 300.0)]
+
+    summary = parameter_summary(desde="2024-01-01")["W_prueba"]
+    assert summary == {"n": 2, "min": 200.0, "max": 300.0, "promedio": 250.0}
+
+    cursor = fresh_db.cursor()
+    cursor.execute(
+        "EXPLAIN QUERY PLAN SELECT id_inspeccion, valor FROM PARAMETRO_ANALISIS "
+        "WHERE parametro_analizado = 'W'"
+    )
+    detail = " ".join(row["detail"] for row in cursor.fetchall())
+    assert "COVERING INDEX idx_parametro_inspeccion" in detail
+
+
+def test_backfill_migration(tmp_path):
+    """
+    Test that the migration loads the parameters of existing inspections from their JSON.
+    """
+    import importlib.util
+    import json
+    import sqlite3
+
+    import db
+
+    conn = sqlite3.connect(tmp_path / "backfill.db")
+    with open(db.SQL_FILE_PATH, encoding="utf-8") as f:
+        conn.executescript(f.read())
+    conn.executemany(
+        "INSERT INTO INSPECCION (numero_lote, fecha, id_equipo, parametros_analizados) VALUES (?, ?, ?, ?)",
+        [("A", "2024-01-01", None, json.dumps({"W": 250, "L": 90})),
+         ("B", "2024-01-02", 4, json.dumps({"farinografo": {"estabilidad": 8}})),
+         ("C", "2024-01-03", None, "no es json"),
+         ("D", "2024-01-04", None, None)],
+    )
+
+    spec = importlib.util.spec_from_file_location(
+        "migration_0010", "migrations/0010_parametro_analisis.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.upgrade(conn)
+
+    rows = conn.execute(
+        "SELECT id_inspeccion, id_equipo_laboratorio, parametro_analizado, valor "
+        "FROM PARAMETRO_ANALISIS ORDER BY id_parametro"
+    ).fetchall()
+    assert rows == [(1, None, "W", 250.0), (1, None, "L", 90.0), (2, 4, "estabilidad", 8.0)]
@@ -0,0 +1,116 @@
+# tests/test_pdf.py
+import pytest
+from services import pdf_service, pdf_store
+
+
+def _cert(n):
+    return {
+        "id_certificado": n,
+        "id_cliente": 1,
+        "id_inspeccion": 1,
+        "resultados_analisis": '{"W": 250}',
+        "compara_referencias": "",
+        "desviaciones": f"Desviación {n}",
+        "destinatario_correo": "qa@example.com",
+    }
+
+
+def test_render_pdf_in_process(monkeypatch):
+    """
+    Test the synchronous API without a process pool.
+    """
+    monkeypatch.setattr(pdf_service, "PDF_WORKERS", 0)
+    pdf = pdf_service.render_pdf(_cert(1))
+    assert pdf.startswith(b"%PDF")
+
+
+def test_render_pdfs_with_pool():
+    """
+    Test the batch API on pre-warmed worker processes, preserving order.
+    """
+    pdf_service.start_pool(processes=2)
+    try:
+        pdfs = pdf_service.render_pdfs([_cert(n) for n in range(4)])
+    finally:
+        pdf_service.shutdown_pool()
+
+    assert len(pdfs) == 4
+    assert all(p.startswith(b"%PDF") for p in pdfs)
+
+
+def test_render_errors(monkeypatch):
+    """
+    Test that a failed render raises, or is returned in place when requested.
+    """
+    monkeypatch.setattr(pdf_service, "PDF_WORKERS", 0)
+    monkeypatch.setattr(pdf_service, "_render", lambda cert: 1 / cert["id_certificado"])
+
+    with pytest.raises(pdf_service.PDFRenderError):
+        pdf_service.render_pdfs([_cert(0)])
+
+    results = pdf_service.render_pdfs([_cert(0), _cert(2)], return_exceptions=True)
+    assert isinstance(results[0], pdf_service.PDFRenderError)
+    assert results[1] == 0.5
+
+
+@pytest.fixture
+def rendered(tmp_path, monkeypatch):
+    """
+    Point the content-addressed store at a temporary folder and record renders.
+    """
+    rendered = []
+
+    def fake_render_pdfs(certs, return_exceptions=False):
+        rendered.extend(c["id_certificado"] for c in certs)
+        return [f"%PDF {c['desviaciones']}".encode() for c in certs]
+
+    monkeypatch.setattr(pdf_store, "PDF_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_service, "render_pdfs", fake_render_pdfs)
+    return rendered
+
+
+def test_store_reuses_unchanged_certificates(rendered):
+    """
+    Test that a certificate is rendered once and later served from the pdf_store.
+    """
+    first = pdf_store.render_cached([_cert(1), _cert(2)])
+    again = pdf_store.render_cached([_cert(1), _cert(2)])
+
+    assert first == again
+    assert rendered == [1, 2]
+
+
+def test_store_key_follows_content(rendered):
+    """
+    Test that changed data gets a new key and a stored file is never overwritten.
+    """
+    changed = dict(_cert(1), desviaciones="Otra")
+    assert pdf_store.certificate_key(_cert(1)) == pdf_store.certificate_key(_cert(1))
+    assert pdf_store.certificate_key(_cert(1)) != pdf_store.certificate_key(changed)
+
+    pdf_store.render_cached([_cert(1)])
+    assert pdf_store.render_cached([changed])[0] == b"%PDF Otra"
+    assert rendered == [1, 1]
+
+    pdf_store.put(pdf_store.certificate_key(_cert(1)), b"%PDF dup")
+    assert pdf_store.get(pdf_store.certificate_key(_cert(1))) == "%PDF Desviación 1".encode()
+
+
+def test_store_eviction(rendered):
+    """
+    Test eviction of expired entries and of least recently used ones over the size cap.
+    """
+    import os
+    import time
+
+    keys = [pdf_store.certificate_key(_cert(n)) for n in range(3)]
+    for n, key in enumerate(keys):
+        path = pdf_store.put(key, b"x" * 100)
+        os.utime(path, (time.time() - 10 + n, time.time() - 10 + n))
+
+    assert pdf_store.evict(max_bytes=250, max_age_days=1) == 1  # Oldest goes first
+    assert pdf_store.get(keys[0]) is None
+    assert pdf_store.get(keys[1]) is not None
+
+    assert pdf_store.evict(max_bytes=10_000, max_age_days=0) == 2
+    assert pdf_store.get(keys[2]) is None
@@ -0,0 +1,146 @@
+# tests/test_snapshot.py
+import os
+
+import pytest
+from services import statistics_service
+from services.inspection_service import create_inspection, delete_inspection, update_inspection
+
+pa = pytest.importorskip("pyarrow")
+from services import snapshot_service  # noqa: E402
+
+
+def _ids(tabla, directorio, **kwargs):
+    table = snapshot_service.load_table(tabla, directorio=directorio, **kwargs)
+    return sorted(table.column(table.column_names[0]).to_pylist())
+
+
+def test_snapshot_is_incremental_and_partitioned(fresh_db, tmp_path):
+    """
+    Test that each run only writes new ids, into anio=/mes= partitions.
+    """
+    directorio = str(tmp_path)
+    first = create_inspection("SNAP-1", "2024-01-15", None, "1", "A", {"W": 300.0}, None)
+
+    escritas = snapshot_service.write_snapshot(directorio, batch=3)
+    assert escritas["inspecciones"] >= 1
+    assert os.path.isdir(tmp_path / "inspecciones" / "anio=2024" / "mes=1")
+    assert first in _ids("inspecciones", directorio)
+
+    second = create_inspection("SNAP-2", "2024-02-15", None, "1", "A", {"W": 310.0, "P": 80.0}, None)
+    escritas = snapshot_service.write_snapshot(directorio)
+    assert escritas == {"certificados": 0, "inspecciones": 1, "mediciones": 2}
+    assert snapshot_service.write_snapshot(directorio) == {
+        "certificados": 0, "inspecciones": 0, "mediciones": 0
+    }
+
+    # Date filters prune partitions and rows
+    feb = _ids("inspecciones", directorio, desde="2024-02-01", hasta="2024-02-29")
+    assert second in feb and first not in feb
+
+    # Deleted rows stay until a rebuild
+    delete_inspection(second)
+    assert second in _ids("inspecciones", directorio)
+    snapshot_service.write_snapshot(directorio, rebuild=True)
+    assert second not in _ids("inspecciones", directorio)
+    assert first in _ids("inspecciones", directorio)
+
+
+def test_orphan_files_from_an_interrupted_run_are_removed(fresh_db, tmp_path):
+    """
+    Test that files written after the last saved state are discarded instead of duplicated.
+    """
+    directorio = str(tmp_path)
+    create_inspection("SNAP-O", "2024-03-01", None, "1", "A", {"W": 300.0}, None)
+    snapshot_service.write_snapshot(directorio, tablas=("inspecciones",))
+    total = len(_ids("inspecciones", directorio))
+
+    # Simulate a run that wrote its files but died before saving _estado.json
+    estado = (tmp_path / "_estado.json").read_text()
+    create_inspection("SNAP-P", "2024-03-02", None, "1", "A", {"W": 300.0}, None)
+    create_inspection("SNAP-Q", "2024-03-03", None, "1", "A", {"W": 300.0}, None)
+    snapshot_service.write_snapshot(directorio, tablas=("inspecciones",), batch=1)
+    (tmp_path / "_estado.json").write_text(estado)
+
+    # The retry uses other batch boundaries, so the second file is an orphan
+    assert snapshot_service.write_snapshot(directorio, tablas=("inspecciones",)) == {"inspecciones": 2}
+    assert len(_ids("inspecciones", directorio)) == total + 2
+
+    with pytest.raises(ValueError):
+        snapshot_service.write_snapshot(directorio, tablas=("usuarios",))
+
+
+def test_spc_report_from_snapshot_matches_database(fresh_db, tmp_path, monkeypatch, new_id):
+    """
+    Test that the SPC report over the snapshot equals the one computed from SQLite.
+    """
+    equipo = new_id()
+    for day, value in enumerate([300.0, 310.0, 290.0, 305.0, 295.0], start=1):
+        create_inspection("SNAP-S", f"2024-06-{day:02d}", equipo, "1", "A", {"W": value}, None)
+    monkeypatch.setattr(snapshot_service, "SNAPSHOT_DIR", str(tmp_path))
+    snapshot_service.write_snapshot()
+
+    kwargs = dict(id_equipo=equipo, desde="2024-06-01", hasta="2024-06-30", subgrupo=1)
+    assert statistics_service.spc_report("W", snapshot=True, **kwargs) == \
+        statistics_service.spc_report("W", **kwargs)
+
+
+def test_edited_measurements_are_not_counted_twice(fresh_db, tmp_path, new_id):
+    """
+    Test that an edited inspection's rewritten parameters replace the copied ones.
+    """
+    equipo, nuevo = new_id(), new_id()
+    directorio = str(tmp_path)
+    kept = create_inspection("SNAP-E", "2024-07-01", equipo, "1", "A", {"W": 290.0}, None)
+    edited = create_inspection("SNAP-E", "2024-07-02", equipo, "1", "A", {"W": 300.0, "P": 80.0}, None)
+    snapshot_service.write_snapshot(directorio)
+
+    # New value, new equipment and a parameter without a number
+    update_inspection(edited, "SNAP-E", "2024-07-02", nuevo, "1", {"W": 100.0, "P": "n/d"}, "A", None)
+    snapshot_service.write_snapshot(directorio)
+
+    def valores(id_equipo):
+        return {
+            clave: serie.tolist()
+            for clave, serie in snapshot_service.load_measurements(id_equipo=id_equipo, directorio=directorio)
+        }
+
+    assert valores(equipo) == {("W", equipo): [290.0]}
+    assert valores(nuevo) == {("W", nuevo): [100.0]}
+    for id_equipo in (equipo, nuevo):
+        assert valores(id_equipo) == {
+            clave: serie.tolist()
+            for clave, serie in statistics_service.load_measurements(id_equipo=id_equipo)
+        }
+
+    table = snapshot_service.load_table(
+        "mediciones", directorio=directorio, filtro=pa.dataset.field("id_inspeccion").isin([kept, edited])
+    )
+    assert sorted(zip(table.column("parametro").to_pylist(), table.column("valor").to_pylist()),
+                  key=str) == sorted([("W", 290.0), ("W", 100.0), ("P", None)], key=str)
+
+
+def test_unsent_certificates_go_to_the_undated_partition(fresh_db, tmp_path):
+    """
+    Test that a certificate without fecha_envio is written to anio=0/mes=0 and reads back.
+    """
+    directorio = str(tmp_path)
+    id_inspeccion = create_inspection("SNAP-U", "2024-08-01", None, "1", "A", {"W": 300.0}, None)
+    cursor = fresh_db.cursor()
+    cursor.execute(
+        "INSERT INTO CERTIFICADO_CALIDAD (id_cliente, id_inspeccion, fecha_envio) VALUES (1, ?, NULL)",
+        (id_inspeccion,),
+    )
+    unsent = cursor.lastrowid
+    cursor.execute(
+        "INSERT INTO CERTIFICADO_CALIDAD (id_cliente, id_inspeccion, fecha_envio) VALUES (1, ?, ?)",
+        (id_inspeccion, "2024-08-02"),
+    )
+    sent = cursor.lastrowid
+    fresh_db.commit()
+
+    snapshot_service.write_snapshot(directorio, tablas=("certificados",))
+
+    assert os.path.isdir(tmp_path / "certificados" / "anio=0" / "mes=0")
+    assert {unsent, sent} <= set(_ids("certificados", directorio))
+    aug = _ids("certificados", directorio, desde="2024-08-01", hasta="2024-08-31")
+    assert sent in aug and unsent not in aug
@@ -0,0 +1,133 @@
+# tests/test_statistics.py
+import statistics
+
+import pytest
+from services import statistics_service
+from services.inspection_service import create_inspection
+
+
+def test_basic_metrics_and_capability():
+    """
+    Test mean, std and Cp/Cpk/Pp/Ppk against hand-computed values.
+    """
+    values = [10.0, 12.0, 11.0, 13.0, 9.0, 11.0, 10.0, 12.0, 11.0, 11.0]
+    r = statistics_service.spc_metrics(values, 5.0, 17.0, subgrupo=2)
+
+    assert r["n"] == 10
+    assert r["media"] == pytest.approx(statistics.mean(values))
+    assert r["desviacion"] == pytest.approx(statistics.stdev(values))
+
+    # Subgroups of two: ranges 2, 2, 2, 2, 0 -> R̄ = 1.6, σ_within = R̄ / d2
+    sigma = 1.6 / 1.128
+    assert r["sigma_dentro"] == pytest.approx(sigma)
+    assert r["cp"] == pytest.approx(12.0 / (6 * sigma))
+    assert r["cpk"] == pytest.approx((r["media"] - 5.0) / (3 * sigma))
+    assert r["pp"] == pytest.approx(12.0 / (6 * r["desviacion"]))
+
+    chart = r["xbar_r"]
+    assert chart["puntos"] == 5
+    assert chart["ucl"] == pytest.approx(chart["centro"] + 1.880 * 1.6)
+    assert chart["r_ucl"] == pytest.approx(3.267 * 1.6)
+
+
+def test_one_sided_spec_and_empty_input():
+    """
+    Test that a missing limit only drops Cp, and that empty series return just n.
+    """
+    r = statistics_service.spc_metrics([1.0, 2.0, 3.0, 2.0], None, 5.0, subgrupo=1)
+    assert r["cp"] is None and r["pp"] is None
+    assert r["cpk"] == pytest.approx((5.0 - 2.0) / (3 * r["sigma_dentro"]))
+
+    assert statistics_service.spc_metrics([], 1.0, 2.0) == {"n": 0, "lsl": 1.0, "usl": 2.0}
+    with pytest.raises(ValueError):
+        statistics_service.spc_metrics([1.0, 2.0], subgrupo=11)
+
+
+def test_ewma_matches_recursive_definition():
+    """
+    Test the blocked EWMA against the textbook recursion, across block boundaries.
+    """
+    import numpy as np
+
+    x = np.random.default_rng(7).normal(50, 5, 3000)
+    for lam in (0.05, 0.2, 0.9):
+        expected, z = [], 40.0
+        for v in x:
+            z = lam * v + (1 - lam) * z
+            expected.append(z)
+        assert np.allclose(statistics_service.ewma(x, lam, inicio=40.0), expected)
+
+
+def test_western_electric_rules():
+    """
+    Test each Western Electric rule on a chart with center 0 and sigma 1.
+    """
+    def rules(points):
+        result = statistics_service.western_electric(points, 0.0, 1.0)
+        return {name: r["puntos"] for name, r in result.items()}
+
+    assert rules([0.5, -0.5, 3.5, 0.0])["regla_1"] == [2]
+    assert rules([0.0, 2.5, 0.1, 2.2, -0.3])["regla_2"] == [3]
+    assert rules([1.5, 1.2, 0.0, 1.8, 1.1, -0.5])["regla_3"] == [4]
+    assert rules([0.2] * 8 + [-0.1])["regla_4"] == [7]
+    assert rules([0.2, -0.2] * 10) == {f"regla_{n}": [] for n in (1, 2, 3, 4)}
+
+
+def test_report_from_parameter_table(fresh_db, new_id):
+    """
+    Test the per parameter/equipment report read from PARAMETRO_ANALISIS, in date order.
+    """
+    equipo = new_id()
+    values = [300.0, 310.0, 290.0, 305.0, 295.0, 500.0]
+    for day, value in enumerate(values, start=1):
+        create_inspection(
+            "SPC", f"2024-05-{day:02d}", equipo, "A", "Rutina", {"W": value, "P": 90.0}, None
+        )
+
+    report = statistics_service.spc_report("W", id_equipo=equipo, subgrupo=1)
+    assert len(report) == 1
+    grupo = report[0]
+    assert (grupo["parametro"], grupo["id_equipo"], grupo["n"]) == ("W", equipo, 6)
+    assert (grupo["lsl"], grupo["usl"]) == (180, 350)  # parametros_default.json
+    assert grupo["maximo"] == 500.0
+    assert grupo["media"] == pytest.approx(sum(values) / len(values))
+
+    both = statistics_service.spc_report(id_equipo=equipo, desde="2024-05-02", hasta="2024-05-05")
+    assert [(g["parametro"], g["n"]) for g in both] == [("P", 4), ("W", 4)]
+
+
+def test_counts_and_values_come_from_one_snapshot(fresh_db, new_id):
+    """
+    Test that a measurement committed between the count and value queries is not mixed in.
+    """
+    equipo = new_id()
+    import db
+
+    for day, value in enumerate((100.0, 200.0, 300.0), start=1):
+        create_inspection("SPC", f"2024-06-{day:02d}", equipo, "A", "Rutina", {"W": value}, None)
+
+    class WriterInBetween:
+        """Connection proxy that commits a new, earlier measurement after the GROUP BY query."""
+
+        def __init__(self, conn):
+            self._conn = conn
+
+        def __getattr__(self, name):
+            return getattr(self._conn, name)
+
+        def execute(self, sql, params=()):
+            result = self._conn.execute(sql, params)
+            if "GROUP BY" in sql:
+                create_inspection("SPC", "2024-05-31", equipo, "A", "Rutina", {"W": 1.0}, None)
+            return result
+
+    with db.db_connection() as conn:
+        grupos = statistics_service.load_measurements(
+            "W", id_equipo=equipo, conn=WriterInBetween(conn)
+        )
+    assert [(key, serie.tolist()) for key, serie in grupos] == [
+        (("W", equipo), [100.0, 200.0, 300.0])
+    ]
+    assert statistics_service.load_measurements("W", id_equipo=equipo)[0][1].tolist() == [
+        1.0, 100.0, 200.0, 300.0
+    ]
@@ -88,3 +88,76 @@ def test_list_users(fresh_db):
     user_count = cursor.fetchone()[0]  # Fetch count
 
     assert user_count >= 2  # Ensure at least two users exist in the table
+
+
+def test_cached_user_loader(fresh_db):
+    """
+    Test that repeated lookups are served from the cache and updates invalidate it.
+    """
+    import services.user_service as us
+
+    user_id = create_user("cache@example.com", "pw", "Laboratorista", "Cache User")
+    us.invalidate_user_cache()
+
+    before = us.user_cache_stats()
+    assert us.get_user_cached(user_id)["rol"] == "Laboratorista"
+    assert us.get_user_cached(str(user_id))["rol"] == "Laboratorista"  # Flask-Login passes str
+    after = us.user_cache_stats()
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+
+    update_user(user_id, "cache@example.com", "pw", "Admin", "Cache User")
+    assert us.get_user_cached(user_id)["rol"] == "Admin"
+
+    delete_user(user_id)
+    assert us.get_user_cached(user_id) is None
+    assert us.get_user_cached("not-a-number") is None
+
+
+def test_cached_user_sees_changes_from_other_workers(fresh_db, monkeypatch):
+    """
+    Test that a role change written by another process is picked up via the version stamp.
+    """
+    import services.user_service as us
+
+    monkeypatch.setattr(us, "USER_CACHE_CHECK_INTERVAL", 0)
+    user_id = create_user("worker@example.com", "pw", "Laboratorista", "Worker")
+    assert us.get_user_cached(user_id)["rol"] == "Laboratorista"
+
+    # Simulate another worker: write directly, bypassing this process's invalidation
+    fresh_db.execute("UPDATE USUARIO SET rol = 'Admin' WHERE id_usuario = ?", (user_id,))
+    fresh_db.commit()
+
+    assert us.get_user_cached(user_id)["rol"] == "Admin"
+
+
+def test_cached_user_expires(fresh_db, monkeypatch):
+    """
+    Test that entries are refreshed once their TTL has passed.
+    """
+    import services.user_service as us
+
+    monkeypatch.setattr(us, "USER_CACHE_TTL", 0)
+    user_id = create_user("ttl@example.com", "pw", "Laboratorista", "TTL")
+    us.get_user_cached(user_id)
+    before = us.user_cache_stats()["misses"]
+    us.get_user_cached(user_id)
+    assert us.user_cache_stats()["misses"] == before + 1
+
+
+def test_cached_and_listed_users_omit_password(fresh_db):
+    """
+    Test that the session cache and the users page never carry the password.
+    """
+    import services.user_service as us
+
+    user_id = create_user("nopw@example.com", "secret", "Laboratorista", "No PW")
+    us.invalidate_user_cache()
+
+    assert "contrasena" not in us.get_user_cached(user_id)
+    assert all("contrasena" not in u for u in us.list_users_page(limit=1000)["items"])
+
+    # An empty password on edit keeps the current one
+    update_user(user_id, "nopw@example.com", None, "Admin", "No PW")
+    assert get_user(user_id)["contrasena"] == "secret"
+    assert us.authenticate_user("nopw@example.com", "secret") is not None